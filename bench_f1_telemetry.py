@@ -0,0 +1,321 @@
+"""Benchmark della pipeline di telemetria su sessioni sintetiche (headless, Agg).
+
+Esempi:
+    python bench_f1_telemetry.py --output bench_results.json
+    python bench_f1_telemetry.py --startup-only --baseline bench_baseline.json
+    python bench_f1_telemetry.py --save-baseline bench_baseline.json
+    python bench_f1_telemetry.py --baseline bench_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import fastf1
+import pandas as pd
+
+from f1_align import distance_time_gaps, nearest_row, telemetry_time_seconds, time_distance_gaps
+from f1_model import TelemetryService
+from f1_synthetic import SyntheticSession
+
+
+COLORS = ["#4fc3f7", "#ffb74d", "#ce93d8"]
+
+# moduli che non devono essere importati dall'avvio dell'app
+HEAVY_MODULES = ("fastf1", "matplotlib", "pandas", "numpy", "scipy", "requests")
+
+
+def measure(func, repeat: int):
+    """Esegue ``func`` ``repeat`` volte (tempi) e una volta sotto tracemalloc (picco)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = {
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "runs": repeat,
+        "peak_mb": peak / 1e6,
+    }
+    return stats, result
+
+
+def lap_telemetry(lap):
+    # Equivalente di Lap.get_telemetry() senza il calcolo del pilota davanti,
+    # che richiede la sessione completa di FastF1
+    pos_data = lap.get_pos_data(pad=1, pad_side="both")
+    car_data = lap.get_car_data(pad=1, pad_side="both")
+    car_data = car_data.add_distance().add_relative_distance()
+    merged = pos_data.merge_channels(car_data)
+    return merged.slice_by_lap(lap, interpolate_edges=True)
+
+
+def sample_laps(session, n_laps: int):
+    laps = session.laps.dropna(subset=["LapTime"])
+    step = max(1, len(laps) // n_laps)
+    return [laps.iloc[i] for i in range(0, len(laps), step)][:n_laps]
+
+
+def build_axes():
+    fig = Figure(figsize=(10, 7), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax_speed = fig.add_subplot(611)
+    axes = [ax_speed] + [fig.add_subplot(612 + i, sharex=ax_speed) for i in range(5)]
+    return fig, canvas, axes
+
+
+def plot_laps(axes, telemetries, gap_data):
+    ax_speed, ax_throttle, ax_brake, ax_gear, ax_drs, ax_gap = axes
+    for ax in axes:
+        ax.clear()
+    for tel, color in zip(telemetries, COLORS):
+        x = tel["Distance"]
+        ax_speed.plot(x, tel["Speed"], color=color)
+        ax_throttle.plot(x, tel["Throttle"], color=color)
+        ax_brake.plot(x, tel["Brake"], color=color)
+        ax_gear.plot(x, tel["nGear"], color=color)
+        ax_drs.step(x, tel["DRS"], where="post", color=color)
+    dist_common, gaps = gap_data
+    for gap, color in zip(gaps, COLORS):
+        ax_gap.plot(dist_common, gap, color=color)
+
+
+def import_time(module: str, repeat: int):
+    """Tempo di import cumulativo di ``module`` misurato con ``-X importtime``."""
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    durations = []
+    heavy = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).resolve().parent,
+            check=True,
+        )
+        heavy = [m for m in proc.stdout.strip().split(",") if m]
+        for line in proc.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+                durations.append(int(parts[1]) / 1e6)
+
+    return {
+        "median_s": statistics.median(durations),
+        "min_s": min(durations),
+        "runs": repeat,
+        "peak_mb": 0.0,
+        "heavy_modules": heavy,
+    }
+
+
+def run_startup(args):
+    return {"startup_import": import_time("f1_telemetry", args.repeat)}
+
+
+def run(args):
+    results = run_startup(args)
+    if args.startup_only:
+        return results
+
+    stats, session = measure(
+        lambda: SyntheticSession(n_drivers=args.drivers, n_laps=args.laps, seed=args.seed),
+        repeat=1,
+    )
+    results["synthetic_session"] = stats
+
+    laps = sample_laps(session, args.telemetry_laps)
+
+    stats, merged = measure(lambda: [lap_telemetry(lap) for lap in laps], args.repeat)
+    results["get_telemetry"] = {**stats, "laps": len(laps)}
+
+    stats, telemetries = measure(lambda: [tel.add_distance() for tel in merged], args.repeat)
+    results["add_distance"] = {**stats, "laps": len(laps)}
+
+    # confronto a tre: giro più veloce dei primi tre piloti
+    compare = []
+    for drv in session.drivers[:3]:
+        fastest = session.laps.pick_drivers(drv).pick_fastest()
+        compare.append(lap_telemetry(fastest).add_distance())
+
+    def gap_stage():
+        entries = [
+            {"distance": tel["Distance"].values, "time": telemetry_time_seconds(tel)}
+            for tel in compare
+        ]
+        return distance_time_gaps(entries)
+
+    stats, gap_data = measure(gap_stage, args.repeat * 10)
+    results["time_gap"] = stats
+
+    def ghost_stage():
+        entries = [
+            {"distance": tel["Distance"].values, "time": telemetry_time_seconds(tel)}
+            for tel in compare
+        ]
+        return time_distance_gaps(entries)
+
+    stats, _ = measure(ghost_stage, args.repeat * 10)
+    results["distance_gap"] = stats
+
+    # stessa pipeline della GUI attraverso il TelemetryService (cache vuote a ogni giro)
+    compare_refs = [
+        (drv, int(session.laps.pick_drivers(drv).pick_fastest()["LapNumber"])) for drv in session.drivers[:3]
+    ]
+
+    def service_stage():
+        service = TelemetryService(loader=lambda *key: session, telemetry_fn=lap_telemetry)
+        key = service.load(2024, session.event["EventName"], session.name)
+        for drv, lap in compare_refs:
+            service.lap_events(drv, lap)
+        return service.time_gaps([(key, drv, lap) for drv, lap in compare_refs])
+
+    stats, _ = measure(service_stage, args.repeat)
+    results["service_pipeline"] = {**stats, "laps": len(compare_refs)}
+
+    hover_x = np.linspace(0, float(compare[0]["Distance"].max()), args.hover_events)
+
+    def hover_stage():
+        for x in hover_x:
+            for tel in compare:
+                nearest_row(tel, x)
+
+    stats, _ = measure(hover_stage, args.repeat)
+    results["hover_lookup"] = {**stats, "events": len(hover_x)}
+
+    fig, canvas, axes = build_axes()
+
+    def full_redraw():
+        plot_laps(axes, compare, gap_data)
+        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        canvas.draw()
+
+    stats, _ = measure(full_redraw, args.repeat)
+    results["redraw_full"] = stats
+
+    x_max = float(compare[0]["Distance"].max())
+
+    def zoom_redraw():
+        for ax in axes:
+            ax.set_xlim(x_max * 0.25, x_max * 0.5)
+        canvas.draw()
+
+    stats, _ = measure(zoom_redraw, args.repeat)
+    results["redraw_zoom"] = stats
+
+    return results
+
+
+def collect(args):
+    results = run(args)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "matplotlib": matplotlib.__version__,
+            "fastf1": fastf1.__version__,
+            "drivers": args.drivers,
+            "laps": args.laps,
+            "seed": args.seed,
+        },
+        "stages": results,
+    }
+
+
+def compare_with_baseline(current: dict, baseline: dict, tolerance: float):
+    for key in ("drivers", "laps", "seed"):
+        if baseline.get("meta", {}).get(key) != current["meta"][key]:
+            print(f"Attenzione: la baseline usa {key}={baseline.get('meta', {}).get(key)}")
+
+    regressions = []
+    heavy = current["stages"].get("startup_import", {}).get("heavy_modules")
+    if heavy:
+        regressions.append("startup_import")
+        print(f"Import pesanti all'avvio: {', '.join(heavy)}")
+
+    for name, base in baseline.get("stages", {}).items():
+        cur = current["stages"].get(name)
+        if cur is None:
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] > 0 else 1.0
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append(name)
+            flag = "  <-- REGRESSIONE"
+        print(f"{name:<20} {base['median_s'] * 1000:10.2f} ms -> {cur['median_s'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def print_results(data: dict):
+    for name, stats in data["stages"].items():
+        print(
+            f"{name:<20} median {stats['median_s'] * 1000:10.2f} ms   "
+            f"min {stats['min_s'] * 1000:10.2f} ms   peak {stats['peak_mb']:8.1f} MB"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline telemetria F1 (dati sintetici)")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=70)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--telemetry-laps", type=int, default=40, help="giri campionati per get_telemetry/add_distance")
+    parser.add_argument("--hover-events", type=int, default=200)
+    parser.add_argument("--startup-only", action="store_true", help="misura solo il tempo di import dell'app")
+    parser.add_argument("--output", help="scrive i risultati in JSON")
+    parser.add_argument("--save-baseline", help="salva i risultati come baseline JSON")
+    parser.add_argument("--baseline", help="confronta con una baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="rallentamento relativo tollerato")
+    args = parser.parse_args(argv)
+
+    matplotlib.use("Agg")
+    warnings.simplefilter("ignore", FutureWarning)
+
+    data = collect(args)
+    print_results(data)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print()
+        regressions = compare_with_baseline(data, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressioni oltre il {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
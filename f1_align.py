@@ -0,0 +1,107 @@
+"""Calcoli puri di allineamento della telemetria (nessuna dipendenza da Tk)."""
+
+import numpy as np
+
+
+def telemetry_time_seconds(tel):
+    if "Time" in tel.columns:
+        time_series = tel["Time"]
+    elif "SessionTime" in tel.columns:
+        time_series = tel["SessionTime"]
+    else:
+        return None
+
+    try:
+        time_seconds = (time_series - time_series.iloc[0]).dt.total_seconds()
+    except Exception:
+        try:
+            time_seconds = time_series - time_series.iloc[0]
+        except Exception:
+            return None
+    return np.asarray(time_seconds, dtype=float)
+
+
+def common_distance_range(entries) -> float:
+    """Distanza massima coperta da tutte le entry (fine della griglia comune)."""
+    return float(min(np.max(entry["distance"]) for entry in entries))
+
+
+def resample_channel(grid, distance, values, step: bool = False):
+    """Valori di un canale sulla griglia di distanza.
+
+    I canali discreti (marcia, DRS, freno) usano l'ultimo campione precedente
+    invece dell'interpolazione lineare, che inventerebbe valori intermedi.
+    """
+    values = np.asarray(values, dtype=float)
+    if not step:
+        return np.interp(grid, distance, values)
+    idx = np.searchsorted(distance, grid, side="right") - 1
+    return values[np.clip(idx, 0, len(values) - 1)]
+
+
+def distance_time_gaps(entries, num_points: int = 1000):
+    """Gap di tempo rispetto alla prima entry su una griglia di distanza comune.
+
+    ``entries`` è una lista di dict con array "distance" e "time" (secondi).
+    Restituisce la griglia e la lista dei gap, uno per entry.
+    """
+    d_max = common_distance_range(entries)
+    dist_common = np.linspace(0, d_max, num=num_points)
+
+    # Usa il primo pilota selezionato come riferimento per il calcolo del gap
+    reference_entry = entries[0]
+    t_ref = np.interp(dist_common, reference_entry["distance"], reference_entry["time"])
+
+    gaps = []
+    for entry in entries:
+        t_interp = np.interp(dist_common, entry["distance"], entry["time"])
+        gaps.append(t_interp - t_ref)
+    return dist_common, gaps
+
+
+def time_distance_interpolants(entries, num_points: int = 1000):
+    """Distanza percorsa da ogni entry su una griglia comune di tempo trascorso.
+
+    Tempo e distanza di ogni giro vengono resi monotoni (i campioni fuori
+    ordine o con la distanza che arretra non invertono l'interpolante) e poi
+    concatenati con un offset di tempo per giro: un solo ``np.interp``
+    valuta tutti i giri insieme. Restituisce la griglia di tempo e la matrice
+    giri × punti delle distanze.
+    """
+    times = [np.maximum.accumulate(np.asarray(entry["time"], dtype=float)) for entry in entries]
+    distances = [np.maximum.accumulate(np.asarray(entry["distance"], dtype=float)) for entry in entries]
+    t_max = float(min(t[-1] for t in times))
+    time_common = np.linspace(0, t_max, num=num_points)
+
+    # ogni giro occupa un intervallo di tempo disgiunto dai precedenti
+    spans = np.array([t[-1] for t in times]) + 1.0
+    offsets = np.r_[0.0, np.cumsum(spans[:-1])]
+    t_all = np.concatenate([t + offset for t, offset in zip(times, offsets)])
+    d_all = np.concatenate(distances)
+    distance = np.interp(offsets[:, None] + time_common[None, :], t_all, d_all)
+    return time_common, distance
+
+
+def time_distance_gaps(entries, num_points: int = 1000):
+    """Distacco in metri rispetto alla prima entry a parità di tempo trascorso.
+
+    Restituisce la distanza del riferimento sulla griglia di tempo (asse x
+    confrontabile con i grafici sulla distanza) e la lista dei distacchi,
+    positivi quando il giro è davanti al riferimento.
+    """
+    _, distance = time_distance_interpolants(entries, num_points=num_points)
+    gaps = distance - distance[0]
+    return distance[0], list(gaps)
+
+
+def ghost_distances(time_common, distance, reference_distance: float):
+    """Distanza di ogni giro nell'istante in cui il riferimento è a ``reference_distance``."""
+    t = np.interp(reference_distance, distance[0], time_common)
+    i = int(np.clip(np.searchsorted(time_common, t, side="right") - 1, 0, len(time_common) - 2))
+    frac = (t - time_common[i]) / max(time_common[i + 1] - time_common[i], 1e-12)
+    return float(t), distance[:, i] * (1 - frac) + distance[:, i + 1] * frac
+
+
+def nearest_row(tel, distance: float):
+    idx = (tel["Distance"] - distance).abs().idxmin()
+    return tel.loc[idx]
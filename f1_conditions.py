@@ -0,0 +1,154 @@
+"""Meteo e stato pista (bandiere, SC, VSC) allineati al tempo sessione dei giri.
+
+``session.track_status`` e ``session.weather_data`` vengono convertiti una
+volta in array ordinati sul tempo sessione; inizio e fine di ogni giro (o i
+campioni di telemetria) vengono poi collocati con ``np.searchsorted``.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+GREEN = "1"
+# codici di session.track_status di FastF1
+TRACK_STATUS = {
+    "1": "Pista libera",
+    "2": "Bandiera gialla",
+    "4": "Safety Car",
+    "5": "Bandiera rossa",
+    "6": "VSC",
+    "7": "Fine VSC",
+}
+STATUS_SHORT = {"2": "GIALLA", "4": "SC", "5": "ROSSA", "6": "VSC", "7": "VSC"}
+STATUS_COLORS = {"2": "#fdd835", "4": "#ff9800", "5": "#e53935", "6": "#ffb74d", "7": "#ffcc80"}
+
+
+class TrackConditions(NamedTuple):
+    status_time: np.ndarray    # s sessione dei cambi di stato, ordinati
+    status_code: np.ndarray    # codice valido fino al cambio successivo
+    weather_time: np.ndarray   # s sessione dei campioni meteo, ordinati
+    track_temp: np.ndarray
+    air_temp: np.ndarray
+    rainfall: np.ndarray
+
+
+class LapConditions(NamedTuple):
+    status: str                # sigle degli stati non verdi durante il giro ("" = giro pulito)
+    spans: list                # (inizio, fine, codice) in s dall'inizio del giro
+    track_temp: float
+    air_temp: float
+    rain: bool
+
+
+def _frame(session, attr):
+    # le proprietà di FastF1 sollevano un'eccezione se il dato non è stato caricato
+    try:
+        return getattr(session, attr)
+    except Exception:
+        return None
+
+
+def _seconds(frame, column="Time"):
+    return frame[column].dt.total_seconds().to_numpy(dtype=float, na_value=np.nan)
+
+
+def _sorted_by_time(frame, columns: dict):
+    """(tempi sessione ordinati, {colonna: valori}) delle righe con Time valido."""
+    if frame is None or len(frame) == 0 or "Time" not in frame.columns:
+        times = np.array([])
+        order = np.array([], dtype=int)
+    else:
+        times = _seconds(frame)
+        keep = np.flatnonzero(~np.isnan(times))
+        order = keep[np.argsort(times[keep], kind="stable")]
+    values = {}
+    for column, kind in columns.items():
+        if frame is None or column not in frame.columns:
+            values[column] = np.full(len(order), np.nan) if kind is float else np.zeros(len(order), dtype=kind)
+        elif kind is str:
+            values[column] = frame[column].astype(str).to_numpy()[order]
+        elif kind is bool:
+            values[column] = frame[column].to_numpy(dtype=float, na_value=0.0)[order] > 0
+        else:
+            values[column] = frame[column].to_numpy(dtype=float, na_value=np.nan)[order]
+    return times[order], values
+
+
+def track_conditions(session) -> TrackConditions:
+    status_time, status = _sorted_by_time(_frame(session, "track_status"), {"Status": str})
+    weather_time, weather = _sorted_by_time(
+        _frame(session, "weather_data"), {"TrackTemp": float, "AirTemp": float, "Rainfall": bool}
+    )
+    return TrackConditions(
+        status_time, status["Status"], weather_time, weather["TrackTemp"], weather["AirTemp"], weather["Rainfall"]
+    )
+
+
+def _status_spans(conditions: TrackConditions, start: float, end: float) -> list:
+    t, codes = conditions.status_time, conditions.status_code
+    first = np.searchsorted(t, start, side="right") - 1
+    last = np.searchsorted(t, end, side="left")
+    spans = []
+    for i in range(max(first, 0), last):
+        if codes[i] == GREEN:
+            continue
+        s0 = max(t[i], start)
+        s1 = min(t[i + 1], end) if i + 1 < len(t) else end
+        if s1 > s0:
+            spans.append((s0 - start, s1 - start, codes[i]))
+    return spans
+
+
+def lap_conditions(conditions: TrackConditions, starts, ends) -> list:
+    """LapConditions per giri con inizio/fine ``starts``/``ends`` (s sessione)."""
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+    n = len(starts)
+
+    # stato non verde all'inizio del giro o cambi verso stati non verdi durante il giro
+    flagged = np.zeros(n, dtype=bool)
+    t = conditions.status_time
+    if len(t):
+        not_green = conditions.status_code != GREEN
+        cum = np.r_[0, np.cumsum(not_green)]
+        first = np.searchsorted(t, starts, side="right")
+        last = np.maximum(np.searchsorted(t, ends, side="left"), first)
+        at_start = (first > 0) & not_green[np.maximum(first - 1, 0)]
+        flagged = valid & (at_start | (cum[last] - cum[first] > 0))
+
+    track_temp = np.full(n, np.nan)
+    air_temp = np.full(n, np.nan)
+    rain = np.zeros(n, dtype=bool)
+    wt = conditions.weather_time
+    if len(wt):
+        # campione meteo in vigore all'inizio del giro (o il primo disponibile)
+        first = np.searchsorted(wt, starts, side="right")
+        at_start = np.clip(first - 1, 0, len(wt) - 1)
+        track_temp = np.where(valid, conditions.track_temp[at_start], np.nan)
+        air_temp = np.where(valid, conditions.air_temp[at_start], np.nan)
+        wet = conditions.rainfall
+        cum = np.r_[0, np.cumsum(wet)]
+        last = np.maximum(np.searchsorted(wt, ends, side="right"), first)
+        rain = valid & (wet[at_start] | (cum[last] - cum[first] > 0))
+
+    result = []
+    for i in range(n):
+        spans = _status_spans(conditions, starts[i], ends[i]) if flagged[i] else []
+        labels = dict.fromkeys(STATUS_SHORT.get(code, code) for _, _, code in spans)
+        result.append(LapConditions(" ".join(labels), spans, float(track_temp[i]), float(air_temp[i]), bool(rain[i])))
+    return result
+
+
+def describe(conditions: LapConditions) -> str:
+    parts = []
+    if not np.isnan(conditions.track_temp):
+        parts.append(f"pista {conditions.track_temp:.1f} °C")
+    if not np.isnan(conditions.air_temp):
+        parts.append(f"aria {conditions.air_temp:.1f} °C")
+    if conditions.rain:
+        parts.append("pioggia")
+    if conditions.status:
+        parts.append(conditions.status)
+    return ", ".join(parts)
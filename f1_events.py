@@ -0,0 +1,155 @@
+"""Rilevamento vettoriale di frenate, apici, ripresa del gas e cambi marcia.
+
+Le curve sono individuate dalle zone di frenata: inizio frenata, velocità
+minima (apice) prima della frenata successiva e primo campione dopo l'apice
+con acceleratore sopra soglia. Nessun ciclo Python sui campioni.
+"""
+
+import numpy as np
+
+
+MERGE_GAP_M = 20.0        # rilasci del freno più brevi vengono uniti alla stessa zona
+MIN_SPEED_DROP = 15.0     # km/h persi in frenata perché la zona conti come curva
+PICKUP_THROTTLE = 10.0    # % di acceleratore che segna la ripresa del gas
+MATCH_DISTANCE_M = 150.0  # distanza massima tra apici per considerarli la stessa curva
+
+
+def _column(tel, name, fill=0.0):
+    if name not in tel.columns:
+        return None
+    values = np.asarray(tel[name].to_numpy(dtype=float, na_value=np.nan))
+    return np.where(np.isnan(values), fill, values)
+
+
+def _points(idx, channels) -> dict:
+    return {"idx": idx, **{name: values[idx] for name, values in channels.items()}}
+
+
+def _segment_argmin(values, starts):
+    """Indice del minimo di ``values`` in ogni segmento [starts[i], starts[i + 1])."""
+    markers = np.zeros(len(values), dtype=int)
+    markers[starts] = 1
+    seg = np.cumsum(markers) - 1          # -1 prima del primo segmento
+    inside = np.flatnonzero(seg >= 0)
+    order = inside[np.lexsort((values[inside], seg[inside]))]
+    first = np.searchsorted(seg[order], np.arange(len(starts)))
+    return order[first]
+
+
+def detect_lap_events(tel) -> dict:
+    """Eventi del giro come array: "brake", "apex", "pickup" (allineati per curva),
+    "upshift" e "downshift" (con la marcia inserita)."""
+    distance = _column(tel, "Distance")
+    speed = _column(tel, "Speed")
+    if distance is None or speed is None or len(distance) < 3:
+        raise ValueError("Telemetria senza Distance/Speed")
+    n = len(distance)
+
+    throttle = _column(tel, "Throttle")
+    brake = _column(tel, "Brake")
+    gear = _column(tel, "nGear")
+    channels = {"distance": distance, "speed": speed}
+    for name in ("X", "Y"):
+        values = _column(tel, name, fill=np.nan)
+        if values is not None:
+            channels[name.lower()] = values
+
+    empty = np.array([], dtype=int)
+    onsets = empty
+    apex = empty
+    pickup = empty
+    if brake is not None:
+        on = brake > 0.5
+        edges = np.diff(on.astype(np.int8))
+        onsets = np.flatnonzero(edges == 1) + 1
+        offsets = np.flatnonzero(edges == -1) + 1
+        if on[0]:
+            onsets = np.r_[0, onsets]
+        if on[-1]:
+            offsets = np.r_[offsets, n]
+
+        # unisce le zone separate da brevi rilasci del pedale
+        if len(onsets) > 1:
+            keep = distance[onsets[1:]] - distance[offsets[:-1] - 1] > MERGE_GAP_M
+            onsets = onsets[np.r_[True, keep]]
+
+        if len(onsets):
+            stops = np.r_[onsets[1:], n]
+            apex = _segment_argmin(speed, onsets)
+
+            valid = speed[onsets] - speed[apex] >= MIN_SPEED_DROP
+            onsets, apex, stops = onsets[valid], apex[valid], stops[valid]
+
+            pickup = apex.copy()
+            if throttle is not None and len(apex):
+                above = throttle >= PICKUP_THROTTLE
+                rises = np.flatnonzero(~above[:-1] & above[1:]) + 1
+                pos = np.searchsorted(rises, apex)
+                has_rise = pos < len(rises)
+                candidate = np.where(has_rise, rises[np.minimum(pos, len(rises) - 1)], apex)
+                # già in accelerazione all'apice, o nessuna ripresa prima della frenata successiva
+                use_rise = has_rise & ~above[apex] & (candidate < stops)
+                pickup = np.where(use_rise, candidate, apex)
+
+    events = {
+        "brake": _points(onsets, channels),
+        "apex": _points(apex, channels),
+        "pickup": _points(pickup, channels),
+    }
+
+    shifts = empty
+    if gear is not None:
+        g = gear.astype(int)
+        step = np.diff(g)
+        shifts = np.flatnonzero((step != 0) & (g[:-1] > 0) & (g[1:] > 0)) + 1
+        up = step[shifts - 1] > 0
+        for name, idx in (("upshift", shifts[up]), ("downshift", shifts[~up])):
+            events[name] = _points(idx, channels)
+            events[name]["gear"] = g[idx]
+    else:
+        events["upshift"] = _points(shifts, channels)
+        events["downshift"] = _points(shifts, channels)
+    return events
+
+
+def compare_corners(events_list, max_offset_m: float = MATCH_DISTANCE_M) -> list:
+    """Differenze curva per curva rispetto al primo giro.
+
+    Per ogni curva del riferimento restituisce un dict con "corner",
+    "distance" (apice del riferimento) e "laps": per ogni giro un dict con
+    i delta (None se la curva non è stata trovata in quel giro).
+    Delta frenata e ripresa positivi = più avanti del riferimento.
+    """
+    ref = events_list[0]
+    ref_apex = ref["apex"]["distance"]
+    matches = []
+    for events in events_list:
+        apex_d = events["apex"]["distance"]
+        if len(apex_d) == 0:
+            matches.append(np.full(len(ref_apex), -1))
+            continue
+        pos = np.clip(np.searchsorted(apex_d, ref_apex), 1, max(len(apex_d) - 1, 1))
+        left = np.clip(pos - 1, 0, len(apex_d) - 1)
+        right = np.clip(pos, 0, len(apex_d) - 1)
+        nearest = np.where(np.abs(apex_d[left] - ref_apex) <= np.abs(apex_d[right] - ref_apex), left, right)
+        ok = np.abs(apex_d[nearest] - ref_apex) <= max_offset_m
+        matches.append(np.where(ok, nearest, -1))
+
+    rows = []
+    for k in range(len(ref_apex)):
+        laps = []
+        for events, match in zip(events_list, matches):
+            j = match[k]
+            if j < 0:
+                laps.append(None)
+                continue
+            laps.append(
+                {
+                    "brake_delta_m": float(events["brake"]["distance"][j] - ref["brake"]["distance"][k]),
+                    "apex_speed": float(events["apex"]["speed"][j]),
+                    "apex_speed_delta": float(events["apex"]["speed"][j] - ref["apex"]["speed"][k]),
+                    "pickup_delta_m": float(events["pickup"]["distance"][j] - ref["pickup"]["distance"][k]),
+                }
+            )
+        rows.append({"corner": k + 1, "distance": float(ref_apex[k]), "laps": laps})
+    return rows
@@ -0,0 +1,204 @@
+"""Esportazione CSV/Parquet dei giri confrontati, allineati su una griglia di distanza comune.
+
+Ogni riga è un punto della griglia; per ogni giro ci sono tutti i canali, il
+tempo dal via del giro e il delta rispetto al primo giro (riferimento).
+La griglia viene generata e scritta a blocchi, senza costruire un DataFrame
+dell'intero export.
+
+Uso da riga di comando (senza GUI):
+    python f1_export.py 2024 "Bahrain Grand Prix" Q VER LEC:12 -o confronto.parquet
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+from pathlib import Path
+import sys
+
+import numpy as np
+
+from f1_align import common_distance_range, resample_channel, telemetry_time_seconds
+
+
+# canale -> True se discreto (campione precedente invece di interpolazione)
+EXPORT_CHANNELS = {
+    "Speed": False,
+    "Throttle": False,
+    "Brake": True,
+    "nGear": True,
+    "DRS": True,
+    "RPM": False,
+    "X": False,
+    "Y": False,
+    "Z": False,
+    "LongAccel": False,
+}
+
+CHUNK_ROWS = 50_000
+
+
+class ExportError(Exception):
+    pass
+
+
+def _lap_source(name: str, tel) -> dict:
+    if "Distance" not in tel.columns:
+        raise ExportError(f"{name}: telemetria senza colonna Distance")
+    time_seconds = telemetry_time_seconds(tel)
+    if time_seconds is None:
+        raise ExportError(f"{name}: telemetria senza colonna temporale")
+
+    channels = {}
+    for ch, step in EXPORT_CHANNELS.items():
+        if ch in tel.columns:
+            channels[ch] = (np.asarray(tel[ch].to_numpy(dtype=float, na_value=np.nan)), step)
+    return {
+        "name": name,
+        "distance": np.asarray(tel["Distance"].to_numpy(dtype=float)),
+        "time": time_seconds,
+        "channels": channels,
+    }
+
+
+def aligned_chunks(laps, step_m: float = 1.0, chunk_rows: int = CHUNK_ROWS):
+    """Genera blocchi ``{colonna: array}`` della tabella allineata.
+
+    ``laps`` è una lista di dict con "name" (prefisso delle colonne) e
+    "telemetry"; il primo giro è il riferimento per il delta.
+    """
+    if not laps:
+        raise ExportError("Nessun giro da esportare")
+    if step_m <= 0:
+        raise ExportError("Il passo della griglia deve essere positivo")
+
+    # validazione subito, prima che il writer apra il file
+    sources = [_lap_source(lap["name"], lap["telemetry"]) for lap in laps]
+    return _iter_chunks(sources, step_m, chunk_rows)
+
+
+def _iter_chunks(sources, step_m, chunk_rows):
+    n_rows = int(common_distance_range(sources) // step_m) + 1
+    for start in range(0, n_rows, chunk_rows):
+        grid = np.arange(start, min(start + chunk_rows, n_rows)) * step_m
+        columns = {"Distance": grid}
+        t_ref = None
+        for src in sources:
+            t = np.interp(grid, src["distance"], src["time"])
+            if t_ref is None:
+                t_ref = t
+            prefix = src["name"]
+            columns[f"{prefix}_Time"] = t
+            columns[f"{prefix}_Delta"] = t - t_ref
+            for ch, (values, step) in src["channels"].items():
+                columns[f"{prefix}_{ch}"] = resample_channel(grid, src["distance"], values, step=step)
+        yield columns
+
+
+def write_csv(path, chunks) -> int:
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        header_written = False
+        for columns in chunks:
+            if not header_written:
+                csv.writer(fh).writerow(columns.keys())
+                header_written = True
+            block = np.column_stack(list(columns.values()))
+            np.savetxt(fh, block, delimiter=",", fmt="%.9g")
+            rows += len(block)
+    return rows
+
+
+def parquet_available() -> bool:
+    # pyarrow è opzionale: senza, l'export è solo CSV
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def write_parquet(path, chunks, metadata: dict | None = None) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportError("Per l'export Parquet serve pyarrow (pip install pyarrow)") from e
+
+    rows = 0
+    writer = None
+    try:
+        for columns in chunks:
+            table = pa.table(columns)
+            if writer is None:
+                schema = table.schema
+                if metadata:
+                    schema = schema.with_metadata({"f1_telemetry": json.dumps(metadata)})
+                writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_aligned(path, laps, step_m: float = 1.0, metadata: dict | None = None, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Scrive l'export in CSV o Parquet (dall'estensione); restituisce le righe scritte."""
+    chunks = aligned_chunks(laps, step_m=step_m, chunk_rows=chunk_rows)
+    if Path(path).suffix.lower() in (".parquet", ".pq"):
+        return write_parquet(path, chunks, metadata)
+    return write_csv(path, chunks)
+
+
+def parse_lap_spec(text: str):
+    """"VER" -> ("VER", None) (giro più veloce); "LEC:12" -> ("LEC", 12)."""
+    driver, _, lap = text.partition(":")
+    return driver.strip().upper(), int(lap) if lap.strip() else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export CSV/Parquet di giri allineati sulla distanza")
+    parser.add_argument("year", type=int)
+    parser.add_argument("event")
+    parser.add_argument("session")
+    parser.add_argument("laps", nargs="+", help="PILOTA (giro più veloce) o PILOTA:GIRO; il primo è il riferimento")
+    parser.add_argument("-o", "--output", required=True, help="file .csv o .parquet")
+    parser.add_argument("--step", type=float, default=1.0, help="passo della griglia in metri")
+    parser.add_argument("--cache", help="cartella cache FastF1")
+    args = parser.parse_args(argv)
+
+    import fastf1
+    from f1_sessions import default_loader
+
+    if args.cache:
+        Path(args.cache).mkdir(parents=True, exist_ok=True)
+        fastf1.Cache.enable_cache(args.cache)
+
+    session = default_loader(args.year, args.event, args.session)
+    laps = []
+    lap_meta = []
+    for spec in args.laps:
+        driver, lap_number = parse_lap_spec(spec)
+        driver_laps = session.laps.pick_drivers(driver)
+        selected = driver_laps.pick_fastest() if lap_number is None else driver_laps.pick_laps(lap_number)
+        if selected is None or len(selected) == 0:
+            print(f"Errore: nessun giro valido per {spec}", file=sys.stderr)
+            return 1
+        lap = selected if lap_number is None else selected.iloc[0]
+        lap_number = int(lap["LapNumber"])
+        laps.append({"name": f"{driver}_L{lap_number}", "telemetry": lap.get_telemetry().add_distance()})
+        lap_meta.append({"driver": driver, "lap": lap_number})
+
+    metadata = {
+        "session": [args.year, session.event["EventName"], args.session],
+        "laps": lap_meta,
+        "step_m": args.step,
+    }
+    try:
+        rows = export_aligned(args.output, laps, step_m=args.step, metadata=metadata)
+    except ExportError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+    print(f"{rows} righe scritte in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
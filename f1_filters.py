@@ -0,0 +1,194 @@
+"""Ricampionamento su griglia uniforme e filtri del segnale per i giri di telemetria.
+
+La telemetria unita di FastF1 alterna campioni car data (~4 Hz) e position
+data interpolati: la velocità ha gradini e le derivate sono rumorose. Questo
+stadio porta ogni giro su una griglia uniforme (distanza o tempo), applica un
+filtro opzionale (Savitzky–Golay o media mobile, convoluzione NumPy) e
+aggiunge l'accelerazione longitudinale derivata.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from f1_align import resample_channel, telemetry_time_seconds
+
+
+# canale -> True se discreto (campione precedente, mai filtrato)
+PROCESS_CHANNELS = {
+    "Speed": False,
+    "Throttle": False,
+    "RPM": False,
+    "X": False,
+    "Y": False,
+    "Z": False,
+    "Brake": True,
+    "nGear": True,
+    "DRS": True,
+}
+FILTERED_CHANNELS = ("Speed", "Throttle", "RPM")
+
+GRIDS = ("raw", "distance", "time")
+FILTERS = ("none", "savgol", "moving_average")
+
+# passo di default per griglia: 2 m o 0.1 s (10 Hz, più fitto dei car data a ~4 Hz)
+DEFAULT_STEPS = {"distance": 2.0, "time": 0.1}
+
+# Di default i dati restano quelli di FastF1: ricampionamento e filtro sono opzionali
+DEFAULT_CONFIG = {
+    "grid": "raw",
+    "step": None,        # m sulla griglia di distanza, s su quella di tempo; None = DEFAULT_STEPS
+    "filter": "none",
+    "window": 11,        # campioni (dispari per Savitzky–Golay)
+    "order": 3,
+}
+
+G = 9.80665
+
+
+def config_key(config: dict) -> tuple:
+    return tuple(sorted(config.items()))
+
+
+def validate_config(config: dict) -> dict:
+    config = {**DEFAULT_CONFIG, **config}
+    if config["grid"] not in GRIDS:
+        raise ValueError(f"Griglia sconosciuta: {config['grid']}")
+    if config["filter"] not in FILTERS:
+        raise ValueError(f"Filtro sconosciuto: {config['filter']}")
+    if config["step"] in (None, ""):
+        config["step"] = DEFAULT_STEPS.get(config["grid"], DEFAULT_STEPS["distance"])
+    config["step"] = float(config["step"])
+    config["window"] = int(config["window"])
+    config["order"] = int(config["order"])
+    if config["step"] <= 0:
+        raise ValueError("Il passo della griglia deve essere positivo")
+    if config["filter"] != "none" and config["window"] < 2:
+        raise ValueError("La finestra del filtro deve essere di almeno 2 campioni")
+    if config["filter"] == "savgol":
+        if config["window"] % 2 == 0:
+            raise ValueError("La finestra Savitzky–Golay deve essere dispari")
+        if not 0 <= config["order"] < config["window"]:
+            raise ValueError("L'ordine del polinomio deve essere minore della finestra")
+    return config
+
+
+def savgol_coeffs(window: int, order: int, deriv: int = 0, delta: float = 1.0):
+    """Coefficienti di convoluzione Savitzky–Golay (minimi quadrati locali)."""
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=float)
+    vandermonde = offsets[:, None] ** np.arange(order + 1)
+    coeffs = np.linalg.pinv(vandermonde)[deriv]
+    return coeffs * math.factorial(deriv) / delta ** deriv
+
+
+def _convolve_same(values, kernel):
+    # bordi riflessi: niente cadute verso zero all'inizio e alla fine del giro
+    half = len(kernel) // 2
+    if len(values) <= half:
+        return values.copy()
+    padded = np.pad(values, half, mode="reflect")
+    return np.convolve(padded, kernel[::-1], mode="valid")
+
+
+def savgol_filter(values, window: int, order: int, deriv: int = 0, delta: float = 1.0):
+    return _convolve_same(np.asarray(values, dtype=float), savgol_coeffs(window, order, deriv, delta))
+
+
+def moving_average(values, window: int):
+    window = window | 1  # finestra centrata
+    return _convolve_same(np.asarray(values, dtype=float), np.full(window, 1.0 / window))
+
+
+def _smooth(values, config):
+    if config["filter"] == "savgol":
+        return savgol_filter(values, config["window"], config["order"])
+    if config["filter"] == "moving_average":
+        return moving_average(values, config["window"])
+    return values
+
+
+def process_lap(tel, config: dict) -> pd.DataFrame:
+    """Giro ricampionato e filtrato secondo ``config`` (vedi DEFAULT_CONFIG).
+
+    Con griglia "raw" e nessun filtro la telemetria viene restituita così
+    com'è; con un filtro si lavora sui campioni originali (vedi _filter_raw).
+    """
+    config = validate_config(config)
+    if config["grid"] == "raw":
+        if config["filter"] == "none":
+            return tel
+        return _filter_raw(tel, config)
+
+    time_s = telemetry_time_seconds(tel)
+    if time_s is None or "Distance" not in tel.columns:
+        raise ValueError("Telemetria senza Distance o tempo")
+    distance = tel["Distance"].to_numpy(dtype=float)
+
+    step = config["step"]
+    if config["grid"] == "distance":
+        axis = distance
+        grid = np.arange(0.0, distance[-1] + 1e-9, step)
+        grid_distance = grid
+        grid_time = np.interp(grid, distance, time_s)
+    else:
+        axis = time_s
+        grid = np.arange(0.0, time_s[-1] + 1e-9, step)
+        grid_time = grid
+        grid_distance = np.interp(grid, time_s, distance)
+
+    data = {"Time": pd.to_timedelta(grid_time, unit="s"), "Distance": grid_distance}
+    for ch, discrete in PROCESS_CHANNELS.items():
+        if ch not in tel.columns:
+            continue
+        values = tel[ch].to_numpy(dtype=float, na_value=np.nan)
+        resampled = resample_channel(grid, axis, values, step=discrete)
+        if ch in FILTERED_CHANNELS:
+            resampled = _smooth(resampled, config)
+        data[ch] = resampled.astype(bool) if ch == "Brake" else resampled
+
+    if "Speed" in data:
+        data["LongAccel"] = longitudinal_accel(data["Speed"], config)
+    return pd.DataFrame(data)
+
+
+def _filter_raw(tel, config: dict) -> pd.DataFrame:
+    """Filtro sui campioni originali, senza griglia uniforme.
+
+    La finestra è in campioni come sulle griglie. I campioni car/pos uniti
+    possono distare pochi ms: l'accelerazione si calcola su una griglia di
+    tempo ausiliaria e si riporta sui tempi originali.
+    """
+    time_s = telemetry_time_seconds(tel)
+    if time_s is None:
+        raise ValueError("Telemetria senza tempo")
+    out = tel.copy()
+    for ch in FILTERED_CHANNELS:
+        if ch in out.columns:
+            out[ch] = _smooth(out[ch].to_numpy(dtype=float, na_value=np.nan), config)
+    if "Speed" in out.columns:
+        time_config = dict(config, grid="time", step=DEFAULT_STEPS["time"])
+        grid = np.arange(0.0, time_s[-1] + 1e-9, time_config["step"])
+        speed = _smooth(resample_channel(grid, time_s, tel["Speed"].to_numpy(dtype=float)), time_config)
+        out["LongAccel"] = np.interp(time_s, grid, longitudinal_accel(speed, time_config))
+    return out
+
+
+def longitudinal_accel(speed_kmh, config: dict):
+    """Accelerazione longitudinale in g dalla velocità sulla griglia uniforme.
+
+    Su griglia di distanza a = v dv/ds; su griglia di tempo a = dv/dt.
+    La derivata usa Savitzky–Golay quando scelto, altrimenti differenze centrali.
+    """
+    v = np.asarray(speed_kmh, dtype=float) / 3.6
+    step = config["step"]
+    if config["filter"] == "savgol" and config["order"] >= 1 and len(v) > config["window"]:
+        dv = savgol_filter(v, config["window"], config["order"], deriv=1, delta=step)
+    elif len(v) > 1:
+        dv = np.gradient(v, step)
+    else:
+        dv = np.zeros_like(v)
+    if config["grid"] == "distance":
+        return v * dv / G
+    return dv / G
@@ -0,0 +1,260 @@
+"""Indice SQLite dei giri più veloci per stagione/evento/sessione/pilota.
+
+Popolato in blocco dalle sessioni già presenti nella cache di FastF1, permette
+query come "VER vs LEC, giro più veloce in Q a ogni evento 2024" in pochi ms.
+Ogni riga punta (``telemetry_ref``) alla traccia compatta nel TraceStore,
+se già elaborata.
+"""
+
+from pathlib import Path
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from f1_schedule import cached_sessions
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fastest_laps (
+    year INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    round INTEGER,
+    session TEXT NOT NULL,
+    driver TEXT NOT NULL,
+    driver_number TEXT,
+    team TEXT,
+    lap_number INTEGER NOT NULL,
+    lap_time_s REAL,
+    sector1_s REAL,
+    sector2_s REAL,
+    sector3_s REAL,
+    compound TEXT,
+    speed_i1 REAL,
+    speed_i2 REAL,
+    speed_fl REAL,
+    speed_st REAL,
+    telemetry_ref TEXT,
+    PRIMARY KEY (year, event, session, driver)
+);
+CREATE INDEX IF NOT EXISTS idx_fastest_driver ON fastest_laps (driver, session, year);
+CREATE INDEX IF NOT EXISTS idx_fastest_session ON fastest_laps (year, session, event);
+"""
+
+COLUMNS = (
+    "year", "event", "round", "session", "driver", "driver_number", "team",
+    "lap_number", "lap_time_s", "sector1_s", "sector2_s", "sector3_s",
+    "compound", "speed_i1", "speed_i2", "speed_fl", "speed_st", "telemetry_ref",
+)
+
+
+def telemetry_ref(year: int, event: str, session_name: str, driver: str, lap_number: int) -> str:
+    return f"{year}/{event}/{session_name}/{driver}/{int(lap_number)}"
+
+
+def _seconds(series):
+    if series is None:
+        return None
+    return series.dt.total_seconds()
+
+
+def fastest_laps_frame(laps) -> pd.DataFrame:
+    """Giro più veloce per pilota, calcolato in blocco con groupby.
+
+    Come ``Laps.pick_fastest``: si considerano solo i giri marcati come
+    personal best, quindi un pilota senza personal best (per esempio con i
+    soli giri cancellati per track limits) non ha riga. I giri ``Deleted``
+    sono esclusi anche quando manca la colonna ``IsPersonalBest``.
+    """
+    df = pd.DataFrame(laps)
+    if df.empty or "LapTime" not in df.columns:
+        return df.iloc[0:0]
+
+    valid = df["LapTime"].notna()
+    if "Deleted" in df.columns:
+        valid &= df["Deleted"] != True  # noqa: E712
+    if "IsPersonalBest" in df.columns:
+        valid &= df["IsPersonalBest"] == True  # noqa: E712
+    valid = df[valid]
+    if valid.empty:
+        return valid
+    return valid.loc[valid.groupby("Driver")["LapTime"].idxmin()]
+
+
+class LapIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        # una connessione condivisa da GUI, indicizzazione e thread del server:
+        # sqlite3 non la serializza da sé, ogni uso passa dal lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def index_session(self, year: int, event: str, session_name: str, session, round_number=None, trace_store=None) -> int:
+        best = fastest_laps_frame(session.laps)
+        if best.empty:
+            return 0
+
+        def col(name):
+            return best[name] if name in best.columns else pd.Series([None] * len(best), index=best.index)
+
+        lap_numbers = best["LapNumber"].astype(int)
+        refs = [telemetry_ref(year, event, session_name, drv, lap) for drv, lap in zip(best["Driver"], lap_numbers)]
+        if trace_store is not None:
+            refs = [ref if trace_store.has(ref) else None for ref in refs]
+
+        frame = pd.DataFrame(
+            {
+                "year": int(year),
+                "event": event,
+                "round": round_number,
+                "session": session_name,
+                "driver": best["Driver"],
+                "driver_number": col("DriverNumber"),
+                "team": col("Team"),
+                "lap_number": lap_numbers,
+                "lap_time_s": _seconds(best["LapTime"]),
+                "sector1_s": _seconds(best["Sector1Time"]) if "Sector1Time" in best.columns else None,
+                "sector2_s": _seconds(best["Sector2Time"]) if "Sector2Time" in best.columns else None,
+                "sector3_s": _seconds(best["Sector3Time"]) if "Sector3Time" in best.columns else None,
+                "compound": col("Compound"),
+                "speed_i1": col("SpeedI1"),
+                "speed_i2": col("SpeedI2"),
+                "speed_fl": col("SpeedFL"),
+                "speed_st": col("SpeedST"),
+                "telemetry_ref": refs,
+            },
+            columns=COLUMNS,
+        )
+        # NaN/NaT -> NULL
+        rows = [
+            tuple(None if pd.isna(v) else (v.item() if isinstance(v, np.generic) else v) for v in row)
+            for row in frame.itertuples(index=False, name=None)
+        ]
+
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO fastest_laps ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                rows,
+            )
+        return len(rows)
+
+    def populate_from_cache(self, years, cache_dir, session_names=("Q", "R"), trace_store=None, progress=None) -> int:
+        """Indicizza le sessioni già presenti nella cache FastF1 in ``cache_dir``.
+
+        Le sessioni senza dati su disco vengono saltate invece di forzare
+        ``Cache.offline_mode``, che è globale e renderebbe offline anche i
+        caricamenti avviati nel frattempo dalla GUI.
+        """
+        import fastf1
+
+        total = 0
+        for year in years:
+            try:
+                schedule = fastf1.get_event_schedule(year, include_testing=False)
+            except Exception:
+                continue
+            for _, event_row in schedule.iterrows():
+                event_name = event_row["EventName"]
+                on_disk = cached_sessions(cache_dir, year, event_name)
+                for session_name in session_names:
+                    try:
+                        if event_row.get_session_name(session_name) not in on_disk:
+                            continue
+                        session = fastf1.get_session(year, event_name, session_name)
+                        session.load(laps=True, telemetry=False, weather=False, messages=False)
+                        n = self.index_session(
+                            year,
+                            event_name,
+                            session_name,
+                            session,
+                            round_number=int(event_row["RoundNumber"]),
+                            trace_store=trace_store,
+                        )
+                    except Exception:
+                        continue
+                    total += n
+                    if progress is not None:
+                        progress(year, event_name, session_name, n)
+        return total
+
+    def set_telemetry_ref(self, year: int, event: str, session_name: str, driver: str, ref: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE fastest_laps SET telemetry_ref = ? WHERE year = ? AND event = ? AND session = ? AND driver = ?",
+                (ref, int(year), event, session_name, driver),
+            )
+
+    def fastest_lap(self, year: int, event: str, session_name: str, driver: str):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT * FROM fastest_laps WHERE year = ? AND event = ? AND session = ? AND driver = ?",
+                (int(year), event, session_name, driver),
+            ).fetchone()
+
+    def query(self, drivers=None, year=None, session_name=None, event=None):
+        clauses = []
+        params = []
+        if drivers:
+            clauses.append(f"driver IN ({', '.join('?' for _ in drivers)})")
+            params.extend(drivers)
+        if year is not None:
+            clauses.append("year = ?")
+            params.append(int(year))
+        if session_name:
+            clauses.append("session = ?")
+            params.append(session_name)
+        if event:
+            clauses.append("event = ?")
+            params.append(event)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT * FROM fastest_laps {where} ORDER BY year, round, event, session, lap_time_s",
+                params,
+            ).fetchall()
+
+    def head_to_head(self, year: int, session_name: str, drivers):
+        """Una riga per evento in cui tutti i piloti hanno un giro valido."""
+        rows = self.query(drivers=drivers, year=year, session_name=session_name)
+        by_event = {}
+        for row in rows:
+            by_event.setdefault(row["event"], {})[row["driver"]] = row
+        return [
+            (event, [laps[drv] for drv in drivers])
+            for event, laps in by_event.items()
+            if all(drv in laps for drv in drivers)
+        ]
+
+
+class TraceStore:
+    """Archivio su disco delle tracce compatte elaborate (un .npz per giro)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, ref: str) -> Path:
+        safe = [part.replace(" ", "_") for part in ref.split("/")]
+        return self.root.joinpath(*safe[:-1], f"lap{safe[-1]}.npz")
+
+    def has(self, ref: str) -> bool:
+        return self._path(ref).exists()
+
+    def save(self, ref: str, arrays: dict):
+        path = self._path(ref)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **arrays)
+
+    def load(self, ref: str):
+        path = self._path(ref)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
@@ -0,0 +1,580 @@
+"""Modello dati e servizio di telemetria, indipendenti da Tk.
+
+``TelemetryService`` contiene lo stato della sessione corrente e tutti i
+calcoli (caricamento, piloti, giri, telemetria grezza ed elaborata, eventi,
+gap, layout del circuito) con cache esplicite. La GUI, il server locale e il
+benchmark lo usano allo stesso modo; gli errori sono ``TelemetryError`` e la
+presentazione (messagebox, status bar) resta al chiamante.
+"""
+
+import threading
+from typing import NamedTuple
+
+from f1_perf import count, span, timed
+from f1_sessions import LapCache, SessionPool, default_loader, frame_bytes
+
+
+MAX_CACHED_PROFILES = 20
+
+
+def profiles_bytes(profiles) -> int:
+    return sum(int(getattr(array, "nbytes", 0)) for array in profiles)
+
+
+class TelemetryError(Exception):
+    pass
+
+
+class DriverInfo(NamedTuple):
+    number: str
+    abbreviation: str
+    surname: str
+
+
+class LapInfo(NamedTuple):
+    number: int
+    lap_time: object    # pd.Timedelta o NaT
+    compound: str
+    conditions: object = None   # f1_conditions.LapConditions, None se meteo/stato pista mancano
+
+
+class LapRef(NamedTuple):
+    """Chiave di cache di un giro: uguale alla tupla (sessione, pilota, giro)."""
+    session_key: tuple
+    driver: str
+    lap: int
+
+
+class GapResult(NamedTuple):
+    distance: object    # griglia di distanza comune (np.ndarray)
+    gaps: list          # un array di gap [s] per giro, il primo è il riferimento
+    refs: list          # LapRef dei giri usati, nello stesso ordine
+    indices: list       # posizione di ogni giro usato nei ``refs`` richiesti
+
+
+class TimeAlignment(NamedTuple):
+    time: object        # griglia di tempo trascorso comune [s]
+    distance: object    # giri × punti: distanza percorsa a ogni istante [m]
+    refs: list          # LapRef dei giri usati, il primo è il riferimento
+    indices: list       # posizione di ogni giro usato nei ``refs`` richiesti
+
+    @property
+    def gaps(self):
+        """Distacco in metri dal riferimento a parità di tempo (positivo = davanti)."""
+        return self.distance - self.distance[0]
+
+
+class CircuitLayout(NamedTuple):
+    x: object
+    y: object
+    title: str
+
+
+COORDINATE_COLUMNS = (("X", "Y"), ("PositionX", "PositionY"), ("posX", "posY"), ("PosX", "PosY"))
+
+
+def coordinate_columns(telemetry):
+    for cand_x, cand_y in COORDINATE_COLUMNS:
+        if cand_x in telemetry.columns and cand_y in telemetry.columns:
+            return cand_x, cand_y
+    return None, None
+
+
+def default_telemetry(lap):
+    return lap.get_telemetry()
+
+
+class TelemetryService:
+    """Sessione corrente, pool di sessioni e cache dei giri.
+
+    Le cache sono mappature qualsiasi (passabili dal chiamante per
+    condividerle o limitarle); ``telemetry_hooks`` sono funzioni
+    ``hook(ref, telemetry)`` chiamate dopo ogni telemetria calcolata da FastF1.
+    """
+
+    def __init__(
+        self,
+        loader=default_loader,
+        session_pool=None,
+        telemetry_fn=default_telemetry,
+        telemetry_cache=None,
+        processed_cache=None,
+        events_cache=None,
+    ):
+        self.session_pool = session_pool if session_pool is not None else SessionPool(loader=loader)
+        self.telemetry_fn = telemetry_fn
+        # Un solo lock per le cache dei giri: le scrivono anche i thread del server
+        self.cache_lock = threading.RLock()
+        self.telemetry_cache = (     # LapRef -> telemetria, LRU
+            telemetry_cache if telemetry_cache is not None else LapCache(sizeof=frame_bytes, lock=self.cache_lock)
+        )
+        self.processed_cache = (     # (LapRef, filtro) -> telemetria, LRU
+            processed_cache if processed_cache is not None else LapCache(sizeof=frame_bytes, lock=self.cache_lock)
+        )
+        self.events_cache = events_cache if events_cache is not None else LapCache(lock=self.cache_lock)  # (LapRef, filtro) -> eventi
+        self.overview_cache = {}                                                         # chiave sessione -> RaceOverview
+        self.conditions_cache = {}                                                       # chiave sessione -> TrackConditions
+        self.profile_cache = LapCache(                                                   # (sessione, pilota) -> LapProfiles
+            max_items=MAX_CACHED_PROFILES, sizeof=profiles_bytes, lock=self.cache_lock
+        )
+        self.telemetry_hooks = []
+        self.session_pool.evict_hooks.append(self._drop_session_caches)
+        # le tracce contano nel budget della memoria; si liberano prima le derivate
+        self.session_pool.caches.extend(
+            cache for cache in (self.processed_cache, self.profile_cache, self.telemetry_cache)
+            if isinstance(cache, LapCache)
+        )
+
+        self.session = None
+        self.session_key = None       # (anno, evento canonico, sessione)
+        self.filter_config = None     # None = f1_filters.DEFAULT_CONFIG
+        self.lap_index = None
+        self.trace_store = None
+
+    # ------------------------------------------------------------------
+    # SESSIONI
+    # ------------------------------------------------------------------
+    def attach_index(self, lap_index, trace_store):
+        self.lap_index = lap_index
+        self.trace_store = trace_store
+        self.telemetry_hooks.append(self._store_fastest_trace)
+
+    def load(self, year: int, event: str, session_name: str) -> tuple:
+        """Carica (o riprende dal pool) la sessione e la rende corrente."""
+        try:
+            key, session = self.session_pool.get(year, event, session_name)
+        except Exception as e:
+            raise TelemetryError(f"Impossibile caricare la sessione:\n{e}") from e
+
+        self.session = session
+        self.session_key = key
+        self.session_pool.pinned = {key}
+        # la sessione precedente non è più fissata: può cedere i dati grezzi
+        self.session_pool.trim()
+
+        if self.lap_index is not None:
+            import sqlite3
+
+            try:
+                with span("lap_index.index_session"):
+                    self.lap_index.index_session(*key, session, trace_store=self.trace_store)
+            except (sqlite3.Error, KeyError, ValueError):
+                pass
+        return key
+
+    def open_offline(self, key):
+        """Sessione corrente senza dati FastF1 (tracce da workspace o archivio)."""
+        self.session = None
+        self.session_key = tuple(key)
+        self.session_pool.pinned = set()
+        self.session_pool.trim()
+
+    def get_session(self, year: int, event: str, session_name: str):
+        """(chiave, sessione) di una sessione qualsiasi, senza cambiare la corrente."""
+        try:
+            return self.session_pool.get(year, event, session_name)
+        except Exception as e:
+            raise TelemetryError(f"Impossibile caricare la sessione {year} {event} {session_name}:\n{e}") from e
+
+    def session_for(self, session_key=None):
+        if session_key is None or session_key == self.session_key:
+            if self.session is None:
+                raise TelemetryError("Nessuna sessione FastF1 caricata")
+            return self.session
+        found = self.session_pool.lookup(*session_key)
+        if found is not None:
+            return found[1]
+        return self.get_session(*session_key)[1]
+
+    def _raw_session(self, session_key=None):
+        """Sessione con car/pos data, ricaricata se il pool li ha liberati."""
+        key = session_key or self.session_key
+        session = self.session_for(key)
+        if key in self.session_pool.released:
+            session = self.session_pool.reload(key)
+            if key == self.session_key:
+                self.session = session
+        return session
+
+    def _drop_session_caches(self, key):
+        # le tracce FastF1 tengono un riferimento alla sessione: vanno tolte con lei
+        if key == self.session_key:
+            return
+        with self.cache_lock:
+            for cache, session_of in (
+                (self.telemetry_cache, lambda k: k[0]),          # LapRef
+                (self.processed_cache, lambda k: k[0][0]),       # (LapRef, filtro)
+                (self.events_cache, lambda k: k[0][0]),
+                (self.profile_cache, lambda k: k[0]),            # (sessione, pilota)
+            ):
+                for cache_key in [k for k in cache if session_of(k) == key]:
+                    del cache[cache_key]
+            self.overview_cache.pop(key, None)
+            self.conditions_cache.pop(key, None)
+
+    def _enforce_budget(self):
+        # dopo ogni nuova traccia: il pool libera prima le tracce meno usate
+        pool = self.session_pool
+        if pool.used_bytes > pool.max_bytes:
+            pool.trim()
+
+    def memory_usage(self) -> dict:
+        """Byte stimati delle sessioni nel pool e delle tracce in cache."""
+        with self.cache_lock:
+            # le stesse cache che il pool conta nel budget (byte tenuti a ogni inserimento)
+            traces = self.session_pool.cache_bytes
+            n_traces = len(self.telemetry_cache)
+        return {
+            "sessions": self.session_pool.total_bytes,
+            "traces": traces,
+            "n_traces": n_traces,
+            "budget": self.session_pool.max_bytes,
+            "n_sessions": len(self.session_pool),
+            "n_released": len(self.session_pool.released),
+        }
+
+    def lap_ref(self, driver: str, lap: int, session_key=None) -> LapRef:
+        return LapRef(session_key or self.session_key, driver, int(lap))
+
+    # ------------------------------------------------------------------
+    # PILOTI E GIRI
+    # ------------------------------------------------------------------
+    def drivers(self, session_key=None) -> list:
+        session = self.session_for(session_key)
+        result = []
+        for drv_num in session.drivers:
+            info = session.get_driver(drv_num)
+            surname = (
+                info.get("Surname")
+                or info.get("LastName")
+                or info.get("FamilyName")
+                or info.get("FullName")
+                or info.get("BroadcastName")
+                or str(drv_num)
+            )
+            result.append(DriverInfo(str(drv_num), info["Abbreviation"], surname))
+        return result
+
+    def driver_laps(self, driver: str, session_key=None):
+        try:
+            return self.session_for(session_key).laps.pick_drivers(driver)
+        except TelemetryError:
+            raise
+        except Exception as e:
+            raise TelemetryError(f"Impossibile recuperare i giri di {driver}:\n{e}") from e
+
+    def laps(self, driver: str, session_key=None) -> list:
+        laps = self.driver_laps(driver, session_key)
+        compounds = laps["Compound"] if "Compound" in laps.columns else [""] * len(laps)
+        conditions = self._laps_conditions(laps, session_key) or [None] * len(laps)
+        return [
+            LapInfo(int(number), lap_time, compound if isinstance(compound, str) else "", lap_conditions)
+            for number, lap_time, compound, lap_conditions in zip(
+                laps["LapNumber"], laps["LapTime"], compounds, conditions
+            )
+        ]
+
+    @timed("lap_profiles")
+    def lap_profiles(self, driver: str, session_key=None):
+        """Velocità di tutti i giri del pilota su una griglia di distanza comune."""
+        from f1_thumbnails import lap_speed_profiles
+
+        key = (session_key or self.session_key, driver)
+        profiles = self.profile_cache.get(key)
+        if profiles is not None:
+            return profiles
+
+        laps = self.driver_laps(driver, session_key)
+        if len(laps) == 0:
+            raise TelemetryError(f"Nessun giro disponibile per {driver}")
+        session = self._raw_session(session_key)
+        try:
+            car_data = session.car_data[str(laps["DriverNumber"].iloc[0])]
+            profiles = lap_speed_profiles(
+                car_data,
+                laps["LapNumber"].to_numpy(dtype=float),
+                laps["LapStartTime"].dt.total_seconds().to_numpy(dtype=float, na_value=float("nan")),
+                laps["Time"].dt.total_seconds().to_numpy(dtype=float, na_value=float("nan")),
+            )
+        except Exception as e:
+            raise TelemetryError(f"Impossibile calcolare le miniature di {driver}:\n{e}") from e
+        self.profile_cache[key] = profiles
+        self._enforce_budget()
+        return profiles
+
+    # ------------------------------------------------------------------
+    # METEO E STATO PISTA
+    # ------------------------------------------------------------------
+    def track_conditions(self, session_key=None):
+        """Stato pista e meteo della sessione come array ordinati (f1_conditions)."""
+        from f1_conditions import track_conditions
+
+        key = session_key or self.session_key
+        conditions = self.conditions_cache.get(key)
+        if conditions is None:
+            conditions = track_conditions(self.session_for(key))
+            self.conditions_cache[key] = conditions
+        return conditions
+
+    def _laps_conditions(self, laps, session_key=None):
+        from f1_conditions import lap_conditions
+
+        if "LapStartTime" not in laps.columns or "Time" not in laps.columns:
+            return None
+        with span("lap_conditions", laps=len(laps)):
+            return lap_conditions(
+                self.track_conditions(session_key),
+                laps["LapStartTime"].dt.total_seconds().to_numpy(dtype=float, na_value=float("nan")),
+                laps["Time"].dt.total_seconds().to_numpy(dtype=float, na_value=float("nan")),
+            )
+
+    def lap_conditions(self, driver: str, lap: int, session_key=None):
+        """LapConditions del giro; None se la sessione non ha i tempi di inizio/fine giro."""
+        laps = self.driver_laps(driver, session_key)
+        laps = laps[laps["LapNumber"] == int(lap)]
+        if len(laps) == 0:
+            return None
+        found = self._laps_conditions(laps, session_key)
+        return found[0] if found else None
+
+    def fastest_lap(self, driver: str, session_key=None):
+        """Numero del giro più veloce: dall'indice se presente, altrimenti dai giri."""
+        session_key = session_key or self.session_key
+        if self.lap_index is not None and session_key is not None:
+            import sqlite3
+
+            try:
+                row = self.lap_index.fastest_lap(*session_key, driver)
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                count("lap_index.hits")
+                return int(row["lap_number"])
+
+        laps = self.driver_laps(driver, session_key)
+        if laps is None or len(laps) == 0:
+            return None
+        try:
+            fastest = laps.pick_fastest()
+            if fastest is not None:
+                return int(fastest["LapNumber"])
+        except Exception:
+            pass
+        try:
+            filtered = laps.dropna(subset=["LapTime"])
+            if not filtered.empty:
+                return int(filtered.loc[filtered["LapTime"].idxmin()]["LapNumber"])
+        except Exception:
+            pass
+        return None
+
+    @timed("race_overview")
+    def race_overview(self, session_key=None):
+        """Posizioni e distacchi giro per giro (f1_race.RaceOverview)."""
+        from f1_race import race_overview
+
+        key = session_key or self.session_key
+        overview = self.overview_cache.get(key)
+        if overview is None:
+            try:
+                overview = race_overview(self.session_for(key).laps)
+            except TelemetryError:
+                raise
+            except Exception as e:
+                raise TelemetryError(f"Panoramica gara non disponibile:\n{e}") from e
+            self.overview_cache[key] = overview
+        return overview
+
+    # ------------------------------------------------------------------
+    # TELEMETRIA
+    # ------------------------------------------------------------------
+    @timed("_get_lap_telemetry")
+    def lap_telemetry(self, driver: str, lap: int, session_key=None):
+        ref = self.lap_ref(driver, lap, session_key)
+        cached = self.telemetry_cache.get(ref)
+        if cached is not None:
+            count("telemetry.cache_hits")
+            return cached
+
+        try:
+            laps = self._raw_session(ref.session_key).laps.pick_drivers(driver)
+            selected = laps.pick_laps(ref.lap)
+            if len(selected) == 0:
+                raise TelemetryError(f"{driver} non ha il giro {ref.lap}")
+            with span("get_telemetry.add_distance"):
+                tel = self.telemetry_fn(selected.iloc[0]).add_distance()
+        except TelemetryError:
+            raise
+        except Exception as e:
+            raise TelemetryError(f"Impossibile ottenere la telemetria di {driver} giro {ref.lap}:\n{e}") from e
+
+        count("telemetry.laps")
+        count("telemetry.samples", len(tel))
+        self.telemetry_cache[ref] = tel
+        for hook in self.telemetry_hooks:
+            hook(ref, tel)
+        self._enforce_budget()
+        return tel
+
+    def put_telemetry(self, ref, telemetry):
+        """Inserisce una traccia già pronta (workspace, archivio) e invalida i derivati."""
+        ref = LapRef(*ref)
+        with self.cache_lock:
+            self.telemetry_cache[ref] = telemetry
+            for cache in (self.processed_cache, self.events_cache):
+                for key in [key for key in cache if key[0] == ref]:
+                    del cache[key]
+        self._enforce_budget()
+
+    def clear_derived(self):
+        with self.cache_lock:
+            self.processed_cache.clear()
+            self.events_cache.clear()
+
+    def set_filter(self, config: dict):
+        from f1_filters import validate_config
+
+        self.filter_config = validate_config(config)
+
+    def filter_key(self, config=None) -> tuple:
+        from f1_filters import config_key
+
+        return config_key(self._filter_for(config))
+
+    def _filter_for(self, config=None) -> dict:
+        """``config`` validata, o quella corrente della GUI se None."""
+        from f1_filters import DEFAULT_CONFIG, validate_config
+
+        if config is not None:
+            return validate_config(config)
+        return self.filter_config or DEFAULT_CONFIG
+
+    def processed_telemetry(self, driver: str, lap: int, session_key=None, config=None):
+        """Telemetria ricampionata/filtrata secondo ``config`` (default ``filter_config``)."""
+        from f1_filters import config_key, process_lap
+
+        # letta una volta: la GUI può cambiare filter_config mentre il server calcola
+        config = self._filter_for(config)
+        ref = self.lap_ref(driver, lap, session_key)
+        raw = self.lap_telemetry(driver, ref.lap, ref.session_key)
+        cache_key = (ref, config_key(config))
+        processed = self.processed_cache.get(cache_key)
+        if processed is None:
+            try:
+                with span("process_lap", grid=config["grid"]):
+                    processed = process_lap(raw, config)
+            except ValueError:
+                processed = raw
+            if isinstance(self.processed_cache, LapCache):
+                # con griglia "raw" è la stessa traccia della telemetry_cache: non va contata due volte
+                self.processed_cache.put(cache_key, processed, nbytes=0 if processed is raw else None)
+            else:
+                self.processed_cache[cache_key] = processed
+            self._enforce_budget()
+        return processed
+
+    def lap_events(self, driver: str, lap: int, session_key=None):
+        """Frenate, apici, ripresa del gas e cambi marcia; None se non calcolabili."""
+        from f1_events import detect_lap_events
+
+        ref = self.lap_ref(driver, lap, session_key)
+        cache_key = (ref, self.filter_key())
+        events = self.events_cache.get(cache_key)
+        if events is None:
+            try:
+                with span("detect_lap_events"):
+                    events = detect_lap_events(self.processed_telemetry(driver, ref.lap, ref.session_key))
+            except ValueError:
+                return None
+            self.events_cache[cache_key] = events
+        return events
+
+    def _gap_entries(self, refs, config=None):
+        from f1_align import telemetry_time_seconds
+
+        config = self._filter_for(config)
+        entries = []
+        used = []
+        indices = []
+        for i, ref in enumerate(refs):
+            ref = LapRef(*ref)
+            tel = self.processed_telemetry(ref.driver, ref.lap, ref.session_key, config)
+            if "Distance" not in tel.columns:
+                continue
+            time_seconds = telemetry_time_seconds(tel)
+            if time_seconds is None:
+                continue
+            entries.append({"distance": tel["Distance"].values, "time": time_seconds})
+            used.append(ref)
+            indices.append(i)
+
+        if len(entries) < 2:
+            raise TelemetryError("Gap disponibile solo con dati completi")
+        return entries, used, indices
+
+    @timed("time_gaps")
+    def time_gaps(self, refs, num_points: int = 1000, config=None) -> GapResult:
+        """Gap di tempo sulla distanza rispetto al primo giro di ``refs``."""
+        from f1_align import distance_time_gaps
+
+        entries, used, indices = self._gap_entries(refs, config)
+        dist_common, gaps = distance_time_gaps(entries, num_points=num_points)
+        return GapResult(dist_common, gaps, used, indices)
+
+    @timed("time_alignment")
+    def time_alignment(self, refs, num_points: int = 1000, config=None) -> TimeAlignment:
+        """Distanza percorsa dai giri di ``refs`` a parità di tempo trascorso."""
+        from f1_align import time_distance_interpolants
+
+        entries, used, indices = self._gap_entries(refs, config)
+        time_common, distance = time_distance_interpolants(entries, num_points=num_points)
+        return TimeAlignment(time_common, distance, used, indices)
+
+    def circuit_layout(self, session_key=None) -> CircuitLayout:
+        """Layout del circuito dal giro più veloce del primo pilota."""
+        session = self._raw_session(session_key)
+        drivers = list(session.drivers)
+        if not drivers:
+            raise TelemetryError("Nessun pilota disponibile nella sessione.")
+
+        laps = session.laps.pick_drivers(drivers[0])
+        if laps is None or len(laps) == 0:
+            raise TelemetryError("Nessun giro disponibile per il pilota selezionato per il layout.")
+        lap = laps.pick_fastest()
+        if lap is None:
+            raise TelemetryError("Impossibile individuare un giro valido per il layout.")
+
+        try:
+            tel = self.telemetry_fn(lap)
+        except Exception as e:
+            raise TelemetryError(f"Telemetria del giro non disponibile: {e}") from e
+        if tel is None or tel.empty:
+            raise TelemetryError("Telemetria del giro non disponibile.")
+
+        x_col, y_col = coordinate_columns(tel)
+        if x_col is None:
+            raise TelemetryError("Telemetria priva di coordinate X/Y per il layout.")
+
+        try:
+            title = session.event.get("EventName") or session.event.get("OfficialEventName")
+        except Exception:
+            title = None
+        return CircuitLayout(tel[x_col].to_numpy(), tel[y_col].to_numpy(), title or "Layout circuito")
+
+    def _store_fastest_trace(self, ref: LapRef, telemetry):
+        # Conserva su disco solo le tracce dei giri più veloci indicizzati
+        if ref.session_key is None:
+            return
+        import sqlite3
+        from f1_lapindex import telemetry_ref
+        from f1_workspace import compact_trace
+
+        try:
+            row = self.lap_index.fastest_lap(*ref.session_key, ref.driver)
+            if row is None or int(row["lap_number"]) != ref.lap or row["telemetry_ref"]:
+                return
+            trace_ref = telemetry_ref(*ref.session_key, ref.driver, ref.lap)
+            self.trace_store.save(trace_ref, compact_trace(telemetry))
+            self.lap_index.set_telemetry_ref(*ref.session_key, ref.driver, trace_ref)
+        except (sqlite3.Error, OSError):
+            pass
@@ -0,0 +1,168 @@
+"""Strumentazione leggera per misurare i tempi delle azioni della GUI.
+
+Ogni azione è uno "span" con tempo monotono, annidamento e contatori.
+Gli span radice (azioni complete) vengono conservati in un buffer circolare
+ed esportabili in formato Chrome trace (chrome://tracing, Perfetto).
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import json
+import os
+import threading
+import time
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "depth", "children", "counters", "args", "tid")
+
+    def __init__(self, name: str, depth: int, tid: int, args: dict | None = None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.depth = depth
+        self.children = []
+        self.counters = {}
+        self.args = args or {}
+        self.tid = tid
+
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def iter_spans(self):
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+
+
+class Profiler:
+    def __init__(self, max_actions: int = 50, enabled: bool = True):
+        self.enabled = enabled
+        self.actions = deque(maxlen=max_actions)
+        self.trace_spans = deque(maxlen=20000)
+        self.counters = {}
+        self.version = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    @contextmanager
+    def span(self, name: str, **args):
+        if not self.enabled:
+            yield None
+            return
+
+        stack = self._stack()
+        current = Span(name, len(stack), threading.get_ident(), args)
+        if stack:
+            stack[-1].children.append(current)
+        stack.append(current)
+        try:
+            yield current
+        finally:
+            current.end = time.perf_counter()
+            stack.pop()
+            with self._lock:
+                self.trace_spans.append(current)
+                if not stack:
+                    self.actions.append(current)
+                self.version += 1
+
+    def timed(self, name: str | None = None):
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        stack = self._stack()
+        if stack:
+            counters = stack[-1].counters
+            counters[name] = counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.actions.clear()
+            self.trace_spans.clear()
+            self.counters.clear()
+            self.version += 1
+
+    # ------------------------------------------------------------------
+    # REPORT
+    # ------------------------------------------------------------------
+    def format_action(self, action: Span) -> str:
+        lines = []
+        for sp in action.iter_spans():
+            indent = "  " * (sp.depth - action.depth)
+            line = f"{indent}{sp.name}: {sp.duration * 1000:.1f} ms"
+            if sp.counters:
+                counters = ", ".join(f"{k}={v}" for k, v in sorted(sp.counters.items()))
+                line += f" [{counters}]"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def format_recent(self, n: int = 10) -> str:
+        with self._lock:
+            actions = list(self.actions)[-n:]
+        if not actions:
+            return "Nessuna azione registrata."
+        blocks = [self.format_action(action) for action in reversed(actions)]
+        return "\n\n".join(blocks)
+
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.trace_spans)
+            counters = dict(self.counters)
+
+        events = []
+        for sp in spans:
+            if sp.end is None:
+                continue
+            events.append(
+                {
+                    "name": sp.name,
+                    "ph": "X",
+                    "ts": (sp.start - self._origin) * 1e6,
+                    "dur": (sp.end - sp.start) * 1e6,
+                    "pid": pid,
+                    "tid": sp.tid,
+                    "args": {**{k: str(v) for k, v in sp.args.items()}, **sp.counters},
+                }
+            )
+        events.sort(key=lambda ev: ev["ts"])
+        return {"traceEvents": events, "otherData": {"counters": counters}}
+
+    def export_chrome_trace(self, path) -> int:
+        trace = self.to_chrome_trace()
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(trace, fh)
+        return len(trace["traceEvents"])
+
+
+# Profiler globale usato dall'applicazione
+profiler = Profiler(enabled=os.environ.get("F1_TELEMETRY_PROFILE", "1") != "0")
+span = profiler.span
+timed = profiler.timed
+count = profiler.count
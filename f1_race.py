@@ -0,0 +1,108 @@
+"""Panoramica gara: tempo cumulato, posizione e distacchi per ogni pilota e giro.
+
+I giri di ``session.laps`` vengono disposti una sola volta in matrici
+piloti × giri; tempi di gara, classifica e distacchi si ottengono con somme
+cumulative, ordinamenti e ricerche per colonna, senza cicli sui giri.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+RACE_SESSIONS = ("Race", "Sprint")
+
+
+class RaceOverview(NamedTuple):
+    drivers: list             # sigle, in ordine di classifica finale
+    lap_numbers: np.ndarray   # 1..N
+    race_time: np.ndarray     # s dal via a fine giro (piloti × giri), NaN se non completato
+    position: np.ndarray      # posizione a fine giro, NaN se non completato
+    gap_leader: np.ndarray    # s dal leader sul traguardo dello stesso giro
+    gap_ahead: np.ndarray     # s dalla vettura che precede
+    laps_down: np.ndarray     # giri di ritardo dal leader (0 = a pieni giri)
+    pit: np.ndarray           # True sui giri di ingresso/uscita box
+
+
+def _seconds(laps, column):
+    if column not in laps.columns:
+        return np.full(len(laps), np.nan)
+    return laps[column].dt.total_seconds().to_numpy(dtype=float, na_value=np.nan)
+
+
+def race_overview(laps) -> RaceOverview:
+    """Posizioni e distacchi giro per giro da un oggetto ``Laps`` di FastF1."""
+    lap_no = laps["LapNumber"].to_numpy(dtype=float, na_value=np.nan)
+    valid = lap_no >= 1
+    if not valid.any():
+        raise ValueError("Nessun giro disponibile per la panoramica gara")
+    names, row = np.unique(laps["Driver"].astype(str).to_numpy()[valid], return_inverse=True)
+    col = lap_no[valid].astype(int) - 1
+    shape = (len(names), int(col.max()) + 1)
+
+    def matrix(values, fill=np.nan, dtype=float):
+        out = np.full(shape, fill, dtype=dtype)
+        out[row, col] = values[valid]
+        return out
+
+    # LapTime manca su alcuni giri (via, box, interruzioni): fine giro - inizio giro
+    end = _seconds(laps, "Time")
+    duration = _seconds(laps, "LapTime")
+    duration = np.where(np.isnan(duration), end - _seconds(laps, "LapStartTime"), duration)
+    race_time = np.cumsum(matrix(duration), axis=1)
+
+    # dopo un giro senza durata la somma resta NaN: si riparte dal tempo sessione a fine giro
+    start = np.nanmin(_seconds(laps, "LapStartTime")[valid & (lap_no == 1)], initial=np.inf)
+    if np.isfinite(start):
+        race_time = np.where(np.isnan(race_time), matrix(end) - start, race_time)
+
+    pit = matrix(
+        laps["PitInTime"].notna().to_numpy() if "PitInTime" in laps.columns else np.zeros(len(laps), bool),
+        fill=False,
+        dtype=bool,
+    )
+    if "PitOutTime" in laps.columns:
+        pit |= matrix(laps["PitOutTime"].notna().to_numpy(), fill=False, dtype=bool)
+
+    # classifica finale: più giri completati, poi tempo all'ultimo giro
+    completed = ~np.isnan(race_time)
+    n_completed = completed.sum(axis=1)
+    last = np.take_along_axis(race_time, np.maximum(n_completed - 1, 0)[:, None], axis=1)[:, 0]
+    final = np.lexsort((last, -n_completed))
+    names, race_time, pit, completed = names[final], race_time[final], pit[final], completed[final]
+
+    order = np.argsort(race_time, axis=0)             # NaN (giro non completato) in fondo
+    ranks = np.broadcast_to(np.arange(1, shape[0] + 1, dtype=float)[:, None], shape)
+    position = np.empty(shape)
+    np.put_along_axis(position, order, ranks, axis=0)
+    position[~completed] = np.nan
+
+    ordered = np.take_along_axis(race_time, order, axis=0)
+    leader = ordered[0]
+    gap_leader = race_time - leader
+    gap_ahead = np.empty(shape)
+    np.put_along_axis(gap_ahead, order, np.diff(ordered, axis=0, prepend=ordered[:1]), axis=0)
+
+    # giri completati dal leader quando il pilota chiude il suo giro k
+    leader_laps = np.searchsorted(leader, race_time.ravel(), side="right").reshape(shape)
+    laps_down = np.where(completed, leader_laps - np.arange(1, shape[1] + 1), np.nan)
+    laps_down = np.maximum(laps_down, 0)
+
+    return RaceOverview(
+        drivers=[str(name) for name in names],
+        lap_numbers=np.arange(1, shape[1] + 1),
+        race_time=race_time,
+        position=position,
+        gap_leader=gap_leader,
+        gap_ahead=gap_ahead,
+        laps_down=laps_down,
+        pit=pit,
+    )
+
+
+def nearest_driver(values, lap_number: int, y: float):
+    """Indice del pilota la cui curva è più vicina a ``y`` al giro ``lap_number``."""
+    column = values[:, lap_number - 1]
+    if np.isnan(column).all():
+        return None
+    return int(np.nanargmin(np.abs(column - y)))
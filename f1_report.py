@@ -0,0 +1,134 @@
+"""Report multipagina dei confronti di telemetria, renderizzati in processi separati.
+
+Ogni pagina (sei grafici di telemetria + layout del circuito) viene disegnata
+su una ``Figure`` Agg in un processo worker a partire da tracce compatte
+(dict di array NumPy, vedi ``f1_workspace.compact_trace``), quindi senza
+toccare il canvas interattivo né bloccare la GUI.
+
+Una pagina è un dict:
+    {"title": str,
+     "traces": [{"name": str, "lap": int, "color": str, "arrays": dict}, ...],
+     "circuit": (x, y) oppure None}
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import io
+import multiprocessing
+import os
+from pathlib import Path
+
+
+PAGE_SIZE = (11.69, 8.27)  # A4 orizzontale, pollici
+DPI = 150
+
+
+def render_page(page: dict, dpi: int = DPI) -> bytes:
+    """Disegna una pagina e restituisce il PNG (eseguita nei worker)."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from f1_align import distance_time_gaps
+
+    fig = Figure(figsize=PAGE_SIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    grid = fig.add_gridspec(6, 3, hspace=0.15, wspace=0.25)
+    ax_speed = fig.add_subplot(grid[0, :2])
+    axes = [ax_speed] + [fig.add_subplot(grid[i, :2], sharex=ax_speed) for i in range(1, 6)]
+    ax_speed, ax_throttle, ax_brake, ax_gear, ax_drs, ax_gap = axes
+    ax_circuit = fig.add_subplot(grid[:, 2])
+
+    gap_entries = []
+    for trace in page["traces"]:
+        arrays = trace["arrays"]
+        x = arrays["Distance"]
+        label = f"{trace['name']} Lap {trace['lap']}"
+        ax_speed.plot(x, arrays["Speed"], color=trace["color"], linewidth=0.9, label=label)
+        ax_throttle.plot(x, arrays["Throttle"], color=trace["color"], linewidth=0.9)
+        ax_brake.plot(x, arrays["Brake"], color=trace["color"], linewidth=0.9)
+        ax_gear.plot(x, arrays["nGear"], color=trace["color"], linewidth=0.9)
+        ax_drs.step(x, arrays["DRS"], where="post", color=trace["color"], linewidth=0.9)
+        if "Time" in arrays:
+            gap_entries.append({"distance": x, "time": arrays["Time"], "color": trace["color"]})
+
+    if len(gap_entries) >= 2:
+        dist_common, gaps = distance_time_gaps(gap_entries)
+        for entry, gap in zip(gap_entries, gaps):
+            ax_gap.plot(dist_common, gap, color=entry["color"], linewidth=0.9)
+        ax_gap.axhline(0, color="0.6", linestyle="--", linewidth=0.8)
+
+    for ax, label in zip(
+        axes,
+        ("Velocità\n[km/h]", "Acceleratore\n[%]", "Freno", "Marcia", "DRS", "Gap tempo\n[s]"),
+    ):
+        ax.set_ylabel(label, fontsize=7)
+        ax.tick_params(labelsize=6)
+        ax.grid(True, linewidth=0.3)
+        if ax is not ax_gap:
+            ax.tick_params(labelbottom=False)
+    ax_gap.set_xlabel("Distanza [m]", fontsize=7)
+    ax_speed.legend(loc="lower right", fontsize=6)
+
+    if page.get("circuit") is not None:
+        cx, cy = page["circuit"]
+        ax_circuit.plot(cx, cy, color="0.3", linewidth=1.2)
+    ax_circuit.set_aspect("equal", adjustable="datalim")
+    ax_circuit.axis("off")
+
+    fig.suptitle(page["title"], fontsize=11)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    return buf.getvalue()
+
+
+def _write_pdf(path, images, dpi):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+    import matplotlib.image as mpimg
+
+    with PdfPages(path) as pdf:
+        for png in images:
+            image = mpimg.imread(io.BytesIO(png), format="png")
+            height, width = image.shape[:2]
+            fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+            fig.figimage(image, 0, 0)
+            pdf.savefig(fig, dpi=dpi)
+
+
+def render_report(path, pages, workers=None, dpi: int = DPI, progress=None) -> list:
+    """Renderizza ``pages`` in parallelo e le scrive in ``path``.
+
+    ``path`` .pdf -> un PDF con una pagina per voce; altrimenti un PNG per
+    pagina (``nome_001.png``, ...). ``progress(fatte, totali)`` viene chiamata
+    dal thread che esegue la funzione. Restituisce i file scritti.
+    """
+    if not pages:
+        raise ValueError("Nessuna pagina da renderizzare")
+    path = Path(path)
+    workers = workers or min(len(pages), os.cpu_count() or 1)
+
+    images = [None] * len(pages)
+    # spawn: il chiamante ha thread attivi (Tk, warm-up, server) e connessioni
+    # sqlite, un fork potrebbe ereditare lock già acquisiti e bloccare i worker
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(render_page, page, dpi): i for i, page in enumerate(pages)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            images[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(pages))
+
+    if path.suffix.lower() == ".pdf":
+        _write_pdf(path, images, dpi)
+        return [path]
+
+    written = []
+    for i, png in enumerate(images, start=1):
+        page_path = path.with_name(f"{path.stem}_{i:03d}.png")
+        page_path.write_bytes(png)
+        written.append(page_path)
+    return written
@@ -0,0 +1,169 @@
+"""Calendario eventi per stagione, salvato su disco, con ricerca approssimata.
+
+Il calendario viene scaricato una sola volta con ``fastf1.get_event_schedule``
+e salvato in JSON; le ricerche e la verifica delle sessioni già presenti nella
+cache FastF1 sono locali e istantanee.
+"""
+
+import difflib
+import json
+from pathlib import Path
+import threading
+
+
+# Nome sessione FastF1 -> identificativo breve accettato da fastf1.get_session
+SESSION_SHORT_NAMES = {
+    "Practice 1": "FP1",
+    "Practice 2": "FP2",
+    "Practice 3": "FP3",
+    "Qualifying": "Q",
+    "Sprint": "S",
+    "Sprint Qualifying": "SQ",
+    "Sprint Shootout": "SS",
+    "Race": "R",
+}
+
+
+def build_schedule(year: int) -> list:
+    import fastf1
+    import pandas as pd
+
+    schedule = fastf1.get_event_schedule(year, include_testing=False)
+    events = []
+    for _, row in schedule.iterrows():
+        sessions = []
+        for i in range(1, 6):
+            name = row.get(f"Session{i}")
+            if not name or pd.isna(name):
+                continue
+            date = row.get(f"Session{i}Date")
+            sessions.append(
+                {
+                    "name": name,
+                    "short": SESSION_SHORT_NAMES.get(name, name),
+                    "date": None if date is None or pd.isna(date) else pd.Timestamp(date).isoformat(),
+                }
+            )
+        event_date = row.get("EventDate")
+        events.append(
+            {
+                "round": int(row["RoundNumber"]),
+                "name": row["EventName"],
+                "official": row.get("OfficialEventName", ""),
+                "country": row.get("Country", ""),
+                "location": row.get("Location", ""),
+                "date": None if event_date is None or pd.isna(event_date) else pd.Timestamp(event_date).date().isoformat(),
+                "sessions": sessions,
+            }
+        )
+    return events
+
+
+def match_events(events: list, query: str, limit: int = 10) -> list:
+    """Eventi ordinati per somiglianza con ``query`` (nome, paese, località)."""
+    query = query.strip().casefold()
+    if not query:
+        return list(events)
+
+    scored = []
+    for event in events:
+        best = 0.0
+        for field in (event["name"], event.get("country", ""), event.get("location", "")):
+            text = (field or "").casefold()
+            if not text:
+                continue
+            if text.startswith(query):
+                score = 2.0
+            elif query in text:
+                score = 1.5
+            else:
+                score = difflib.SequenceMatcher(None, query, text).ratio()
+            best = max(best, score)
+        if best >= 0.5:
+            scored.append((best, event["round"], event))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [event for _, _, event in scored[:limit]]
+
+
+def exact_events(events: list, text: str) -> list:
+    """Eventi con nome, paese o località uguale a ``text`` (senza maiuscole).
+
+    Il nome dell'evento ha la precedenza; paese e località possono invece
+    corrispondere a più eventi (es. "Italy": Imola e Monza).
+    """
+    text = text.strip().casefold()
+    by_name = [event for event in events if event["name"].casefold() == text]
+    if by_name:
+        return by_name
+    return [
+        event for event in events
+        if text in ((event.get("country") or "").casefold(), (event.get("location") or "").casefold())
+    ]
+
+
+def find_event(events: list, text: str):
+    """Evento indicato senza ambiguità da ``text``, altrimenti None."""
+    matches = exact_events(events, text)
+    return matches[0] if len(matches) == 1 else None
+
+
+def find_session(event: dict, text: str):
+    text = text.strip().casefold()
+    for session in event["sessions"]:
+        if text in (session["name"].casefold(), session["short"].casefold()):
+            return session
+    return None
+
+
+def cached_sessions(cache_dir, year: int, event_name: str) -> set:
+    """Nomi delle sessioni dell'evento già presenti nella cache FastF1 su disco."""
+    year_dir = Path(cache_dir) / str(year)
+    if not year_dir.is_dir():
+        return set()
+    found = set()
+    for event_dir in year_dir.glob(f"*_{event_name.replace(' ', '_')}"):
+        for session_dir in event_dir.iterdir():
+            if not session_dir.is_dir() or not any(session_dir.glob("*.ff1pkl")):
+                continue
+            # "<data>_<nome sessione>"
+            found.add(session_dir.name.split("_", 1)[-1].replace("_", " "))
+    return found
+
+
+class ScheduleCache:
+    def __init__(self, root, builder=build_schedule):
+        self.root = Path(root)
+        self.builder = builder
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, year: int) -> Path:
+        return self.root / f"{int(year)}.json"
+
+    def load(self, year: int):
+        """Calendario dalla memoria o dal disco, senza accesso alla rete."""
+        year = int(year)
+        with self._lock:
+            if year in self._memory:
+                return self._memory[year]
+        path = self._path(year)
+        if not path.exists():
+            return None
+        try:
+            events = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memory[year] = events
+        return events
+
+    def get(self, year: int) -> list:
+        events = self.load(year)
+        if events is not None:
+            return events
+        events = self.builder(int(year))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._path(year).write_text(json.dumps(events, indent=1), encoding="utf-8")
+        with self._lock:
+            self._memory[int(year)] = events
+        return events
@@ -0,0 +1,372 @@
+"""Server HTTP locale (solo 127.0.0.1) per giri, telemetria allineata e gap.
+
+Notebook e dashboard interrogano le sessioni già caricate invece di rifare
+ognuno il proprio caricamento FastF1. Le richieste sono gestite con asyncio;
+i calcoli girano in un pool di thread sopra un ``TelemetryService`` (lo stesso
+della GUI, se avviato da lì), quindi sessioni e giri vengono caricati una
+sola volta.
+
+Endpoint (GET, parametri in query string):
+    /sessions                                    sessioni caricate (JSON)
+    /laps?year=&event=&session=                  elenco giri
+    /telemetry?...&driver=VER[&lap=12]           traccia compatta del giro
+    /aligned?...&laps=VER,LEC:12[&step=1]        giri allineati sulla distanza
+    /gaps?...&laps=VER,LEC[&points=1000]         gap rispetto al primo giro
+          [&align=time]                          distacco in metri a pari tempo
+
+/telemetry, /aligned e /gaps usano la telemetria elaborata del servizio:
+``grid``, ``filter``, ``filter_step``, ``window`` e ``order`` (come
+f1_filters.DEFAULT_CONFIG) scelgono l'elaborazione; senza nessuno di questi
+vale quella corrente della GUI.
+
+``format=npz`` (default per gli array), ``arrow`` (pyarrow IPC stream) o
+``json``. Senza year/event/session si usa la sessione corrente.
+
+Esempio da notebook:
+    import io, numpy as np, urllib.request
+    raw = urllib.request.urlopen("http://127.0.0.1:8765/gaps?laps=VER,LEC").read()
+    data = np.load(io.BytesIO(raw))
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import sys
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from f1_model import TelemetryError
+from f1_perf import count, span
+
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# parametro in query string -> chiave di f1_filters.DEFAULT_CONFIG ("step" è già il passo di /aligned)
+FILTER_PARAMS = {"grid": "grid", "filter": "filter", "filter_step": "step", "window": "window", "order": "order"}
+
+LAP_COLUMNS = ("LapNumber", "LapTime", "Sector1Time", "Sector2Time", "Sector3Time", "Compound", "IsPersonalBest", "Stint")
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class TelemetryProvider:
+    """Endpoint HTTP sopra un TelemetryService condiviso tra richieste concorrenti."""
+
+    def __init__(self, service):
+        self.service = service
+        self._load_lock = threading.Lock()
+
+    def session(self, params):
+        year, event, name = params.get("year"), params.get("event"), params.get("session")
+        if not (year and event and name):
+            key = self.service.session_key
+            if key is None:
+                raise RequestError(400, "Specifica year, event e session (nessuna sessione corrente)")
+            year, event, name = key
+        try:
+            year = int(year)
+        except ValueError:
+            raise RequestError(400, "year deve essere un intero") from None
+
+        found = self.service.session_pool.lookup(year, event, name)
+        if found is None:
+            # un solo caricamento anche con più richieste contemporanee
+            with self._load_lock:
+                try:
+                    found = self.service.get_session(year, event, name)
+                except TelemetryError as e:
+                    raise RequestError(404, str(e)) from None
+        return found
+
+    def laps(self, params) -> dict:
+        key, session = self.session(params)
+        laps = session.laps
+        columns = {"Driver": laps["Driver"].astype(str).to_numpy()}
+        for col in LAP_COLUMNS:
+            if col not in laps.columns:
+                continue
+            values = laps[col]
+            if col.endswith("Time"):
+                columns[col + "_s"] = values.dt.total_seconds().to_numpy(dtype=float, na_value=np.nan)
+            elif col in ("Compound",):
+                columns[col] = values.fillna("").astype(str).to_numpy()
+            else:
+                columns[col] = values.to_numpy(dtype=float, na_value=np.nan)
+        return columns
+
+    def filter_config(self, params):
+        """Elaborazione richiesta in query string, None per quella corrente."""
+        config = {key: params[name] for name, key in FILTER_PARAMS.items() if params.get(name)}
+        if not config:
+            return None
+        from f1_filters import validate_config
+
+        return validate_config(config)
+
+    def lap_ref(self, key, driver: str, lap_number=None):
+        driver = driver.upper()
+        if lap_number is None:
+            try:
+                lap_number = self.service.fastest_lap(driver, key)
+            except TelemetryError as e:
+                raise RequestError(404, str(e)) from None
+            if lap_number is None:
+                raise RequestError(404, f"Nessun giro valido per {driver}")
+        return self.service.lap_ref(driver, lap_number, key)
+
+    def lap_telemetry(self, ref, config=None):
+        try:
+            with span("server.lap_telemetry", driver=ref.driver, lap=ref.lap):
+                return self.service.processed_telemetry(ref.driver, ref.lap, ref.session_key, config)
+        except TelemetryError as e:
+            raise RequestError(404, str(e)) from None
+
+    def _lap_refs(self, key, params):
+        from f1_export import parse_lap_spec
+
+        text = params.get("laps", "")
+        specs = [parse_lap_spec(part) for part in text.split(",") if part.strip()]
+        if not specs:
+            raise RequestError(400, "Parametro laps mancante (es. laps=VER,LEC:12)")
+        return [self.lap_ref(key, driver, lap) for driver, lap in specs]
+
+    def telemetry(self, params) -> dict:
+        from f1_workspace import compact_trace
+
+        key, _ = self.session(params)
+        if not params.get("driver"):
+            raise RequestError(400, "Parametro driver mancante")
+        lap = int(params["lap"]) if params.get("lap") else None
+        tel = self.lap_telemetry(self.lap_ref(key, params["driver"], lap), self.filter_config(params))
+        trace = compact_trace(tel)
+        if "LongAccel" in tel.columns:
+            trace["LongAccel"] = tel["LongAccel"].to_numpy(dtype=np.float32)
+        return trace
+
+    def aligned(self, params) -> dict:
+        from f1_export import aligned_chunks
+
+        key, _ = self.session(params)
+        config = self.filter_config(params)
+        laps = [
+            {"name": f"{ref.driver}_L{ref.lap}", "telemetry": self.lap_telemetry(ref, config)}
+            for ref in self._lap_refs(key, params)
+        ]
+        chunks = list(aligned_chunks(laps, step_m=float(params.get("step", 1.0))))
+        return {col: np.concatenate([chunk[col] for chunk in chunks]) for col in chunks[0]}
+
+    def gaps(self, params) -> dict:
+        key, _ = self.session(params)
+        refs = self._lap_refs(key, params)
+        points = int(params.get("points", 1000))
+        config = self.filter_config(params)
+        try:
+            if params.get("align") == "time":
+                alignment = self.service.time_alignment(refs, num_points=points, config=config)
+                names = [f"{ref.driver}_L{ref.lap}" for ref in alignment.refs]
+                return {"Distance": alignment.distance[0], **{f"{name}_GapM": gap for name, gap in zip(names, alignment.gaps)}}
+            result = self.service.time_gaps(refs, num_points=points, config=config)
+        except TelemetryError as e:
+            raise RequestError(404, str(e)) from None
+        names = [f"{ref.driver}_L{ref.lap}" for ref in result.refs]
+        return {"Distance": result.distance, **{f"{name}_Gap": gap for name, gap in zip(names, result.gaps)}}
+
+    def sessions(self, params) -> list:
+        return [list(key) for key in self.service.session_pool.keys()]
+
+
+def encode(payload, fmt: str):
+    """(content type, bytes) del payload nel formato richiesto."""
+    if isinstance(payload, list) or fmt == "json":
+        if isinstance(payload, dict):
+            payload = {k: np.asarray(v).tolist() for k, v in payload.items()}
+        # NaN non è JSON valido: diventa null
+        text = json.dumps(_nan_to_none(payload), default=str)
+        return "application/json", text.encode("utf-8")
+    if fmt == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RequestError(501, "Formato arrow non disponibile: pyarrow non installato") from None
+        table = pa.table(payload)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "application/vnd.apache.arrow.stream", sink.getvalue()
+    if fmt == "npz":
+        buf = io.BytesIO()
+        np.savez(buf, **payload)
+        return "application/x-npz", buf.getvalue()
+    raise RequestError(400, f"Formato sconosciuto: {fmt}")
+
+
+def _nan_to_none(value):
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 501: "Not Implemented"}
+
+
+class TelemetryServer:
+    def __init__(self, provider: TelemetryProvider, port: int = DEFAULT_PORT, workers: int = 4):
+        self.provider = provider
+        self.port = port
+        self.routes = {
+            "/sessions": provider.sessions,
+            "/laps": provider.laps,
+            "/telemetry": provider.telemetry,
+            "/aligned": provider.aligned,
+            "/gaps": provider.gaps,
+        }
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="f1-server")
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # header ignorati
+            status, content_type, body = await self._respond(request_line.decode("latin-1").split())
+        except Exception as e:
+            status, content_type, body = 500, "application/json", json.dumps({"error": str(e)}).encode()
+
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, parts):
+        if len(parts) < 2:
+            return 400, "application/json", b'{"error": "richiesta non valida"}'
+        method, target = parts[0], parts[1]
+        if method != "GET":
+            return 405, "application/json", b'{"error": "solo GET"}'
+
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return 404, "application/json", json.dumps({"error": f"endpoint sconosciuto: {url.path}", "endpoints": sorted(self.routes)}).encode()
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        fmt = params.pop("format", "json" if url.path in ("/sessions", "/laps") else "npz")
+
+        count("server.requests")
+        loop = asyncio.get_running_loop()
+
+        def work():
+            with span(f"server{url.path}"):
+                return encode(handler(params), fmt)
+
+        try:
+            content_type, body = await loop.run_in_executor(self.executor, work)
+        except RequestError as e:
+            return e.status, "application/json", json.dumps({"error": str(e)}).encode()
+        except (KeyError, ValueError) as e:
+            return 400, "application/json", json.dumps({"error": str(e)}).encode()
+        return 200, content_type, body
+
+    async def serve(self):
+        self.server = await asyncio.start_server(self._handle, HOST, self.port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start_in_thread(self):
+        """Avvia il server su un event loop dedicato (uso dalla GUI)."""
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, HOST, self.port))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            try:
+                self.loop.run_forever()
+            finally:
+                self.server.close()
+                self.loop.run_until_complete(self.server.wait_closed())
+                self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="f1-server-loop", daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server locale di telemetria F1")
+    parser.add_argument("year", type=int, nargs="?")
+    parser.add_argument("event", nargs="?")
+    parser.add_argument("session", nargs="?")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache", help="cartella cache FastF1")
+    parser.add_argument("--memory-mb", type=float, help="budget di memoria delle sessioni caricate (MB)")
+    args = parser.parse_args(argv)
+
+    from pathlib import Path
+    import fastf1
+    from f1_model import TelemetryService
+    from f1_sessions import DEFAULT_MEMORY_BUDGET, SessionPool
+
+    if args.cache:
+        Path(args.cache).mkdir(parents=True, exist_ok=True)
+        fastf1.Cache.enable_cache(args.cache)
+
+    budget = int(args.memory_mb * 1024 ** 2) if args.memory_mb else DEFAULT_MEMORY_BUDGET
+    service = TelemetryService(session_pool=SessionPool(max_bytes=budget))
+    if args.year and args.event and args.session:
+        # caricata una volta sola all'avvio e usata come sessione predefinita
+        try:
+            service.load(args.year, args.event, args.session)
+        except TelemetryError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    provider = TelemetryProvider(service)
+    server = TelemetryServer(provider, port=args.port)
+    print(f"Server in ascolto su http://{HOST}:{args.port}")
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
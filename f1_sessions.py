@@ -0,0 +1,323 @@
+"""Pool di sessioni FastF1 caricate contemporaneamente, con politica LRU.
+
+Permette di confrontare giri di sessioni diverse (altri anni o altre sessioni
+dello stesso circuito) senza ricaricarle a ogni confronto. Il pool è limitato
+sia nel numero di sessioni sia nell'occupazione di memoria stimata, che
+comprende anche le tracce nelle cache dei giri: oltre il budget vengono prima
+liberati car/pos data delle sessioni non in uso (le tracce già estratte
+restano nelle cache), poi le tracce meno usate, poi le sessioni meno usate.
+"""
+
+from collections import OrderedDict
+import threading
+
+from f1_perf import count, span
+
+
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+
+
+def default_loader(year: int, event: str, session_name: str):
+    import fastf1
+
+    with span("fastf1.get_session"):
+        session = fastf1.get_session(year, event, session_name)
+    with span("session.load"):
+        session.load()
+    return session
+
+
+def session_footprint(session) -> int:
+    """Stima in byte dei DataFrame principali della sessione."""
+    frames = []
+    for attr in ("laps", "weather_data", "track_status", "race_control_messages", "results"):
+        try:
+            frames.append(getattr(session, attr))
+        except Exception:
+            continue
+    for attr in ("car_data", "pos_data"):
+        try:
+            frames.extend(getattr(session, attr).values())
+        except Exception:
+            continue
+
+    total = 0
+    for frame in frames:
+        try:
+            total += int(frame.memory_usage(index=True, deep=False).sum())
+        except Exception:
+            continue
+    return total
+
+
+def release_raw_data(session) -> bool:
+    """Svuota car_data e pos_data della sessione (la parte più pesante)."""
+    released = False
+    for name in ("car_data", "pos_data"):
+        # in FastF1 sono proprietà sopra _car_data/_pos_data
+        attr = f"_{name}" if isinstance(getattr(type(session), name, None), property) else name
+        if getattr(session, attr, None):
+            setattr(session, attr, {})
+            released = True
+    return released
+
+
+def canonical_key(year: int, event: str, session_name: str, session=None):
+    # Nome evento canonico di FastF1 se disponibile (es. "Monza" -> "Italian Grand Prix")
+    if session is not None:
+        try:
+            event = session.event.get("EventName") or event
+        except Exception:
+            pass
+    return (int(year), event, session_name)
+
+
+def parse_session_ref(text: str):
+    """"2023, Monza, Q" -> (2023, "Monza", "Q"); stringa vuota -> None."""
+    parts = [part.strip() for part in text.split(",")]
+    if not text.strip():
+        return None
+    if len(parts) != 3 or not all(parts):
+        raise ValueError("Formato atteso: anno, evento, sessione")
+    return int(parts[0]), parts[1], parts[2]
+
+
+MAX_CACHED_LAPS = 60
+
+
+def frame_bytes(frame) -> int:
+    try:
+        return int(frame.memory_usage(index=True, deep=False).sum())
+    except Exception:
+        return 0
+
+
+class LapCache(OrderedDict):
+    """Cache LRU della telemetria per giro, limitata nel numero di giri.
+
+    Con il pool le chiavi includono la sessione e non vengono più svuotate a
+    ogni caricamento: senza limite crescerebbe per tutta la vita dell'app.
+    Tiene anche i byte stimati delle voci (``sizeof``), così il pool può
+    contarle nel budget di memoria e liberare le meno usate (``shrink``).
+    Il lock può essere condiviso tra più cache (vedi ``TelemetryService``).
+    """
+
+    def __init__(self, max_items: int = MAX_CACHED_LAPS, sizeof=None, lock=None):
+        super().__init__()
+        self.max_items = max_items
+        self.sizeof = sizeof
+        self.lock = lock if lock is not None else threading.RLock()
+        self.sizes = {}
+        self.nbytes = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return self[key]
+
+    def put(self, key, value, nbytes=None):
+        """Come ``cache[key] = value``, con i byte indicati dal chiamante."""
+        with self.lock:
+            if key in self:
+                del self[key]
+            super().__setitem__(key, value)
+            size = nbytes if nbytes is not None else (self.sizeof(value) if self.sizeof is not None else 0)
+            self.sizes[key] = size
+            self.nbytes += size
+            while len(self) > self.max_items:
+                del self[next(iter(self))]
+                count("lap_cache.evictions")
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            super().__delitem__(key)
+            self.nbytes -= self.sizes.pop(key, 0)
+
+    def pop(self, key, *default):
+        with self.lock:
+            if key not in self:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            value = super().__getitem__(key)
+            del self[key]
+            return value
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+    def drop(self, predicate) -> int:
+        """Rimuove le voci la cui chiave soddisfa ``predicate``."""
+        with self.lock:
+            keys = [key for key in self if predicate(key)]
+            for key in keys:
+                del self[key]
+        return len(keys)
+
+    def shrink(self, nbytes: int) -> int:
+        """Libera almeno ``nbytes`` dalle voci meno usate; restituisce i byte liberati."""
+        freed = 0
+        with self.lock:
+            while self and freed < nbytes:
+                key = next(iter(self))
+                freed += self.sizes.get(key, 0)
+                del self[key]
+                count("lap_cache.evictions")
+        return freed
+
+
+class SessionPool:
+    def __init__(self, loader=default_loader, max_sessions: int = 3, max_bytes: int = DEFAULT_MEMORY_BUDGET):
+        self.loader = loader
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.pinned = set()
+        self.released = set()           # chiavi con car/pos data già liberati
+        self.evict_hooks = []           # hook(chiave) chiamati dopo la rimozione di una sessione
+        self.caches = []                # LapCache delle tracce, contate nel budget
+        self._entries = OrderedDict()   # chiave canonica -> (sessione, byte stimati)
+        self._aliases = {}              # chiave richiesta normalizzata -> chiave canonica
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _normalize(year, event, session_name):
+        return (int(year), str(event).strip().casefold(), str(session_name).strip().casefold())
+
+    def __contains__(self, key) -> bool:
+        return self.lookup(*key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    @property
+    def cache_bytes(self) -> int:
+        return sum(cache.nbytes for cache in self.caches)
+
+    @property
+    def used_bytes(self) -> int:
+        """Sessioni più tracce in cache: è questo il valore confrontato col budget."""
+        return self.total_bytes + self.cache_bytes
+
+    def keys(self):
+        return list(self._entries)
+
+    def footprint(self) -> dict:
+        """Byte stimati per sessione, dalla meno alla più recente."""
+        with self._lock:
+            return {key: nbytes for key, (_, nbytes) in self._entries.items()}
+
+    def lookup(self, year, event, session_name):
+        with self._lock:
+            key = self._aliases.get(self._normalize(year, event, session_name))
+            if key is None or key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            count("session_pool.hits")
+            return key, self._entries[key][0]
+
+    def get(self, year, event, session_name):
+        """Restituisce (chiave canonica, sessione), caricandola se necessario."""
+        found = self.lookup(year, event, session_name)
+        if found is not None:
+            return found
+
+        count("session_pool.misses")
+        with span("session_pool.load", year=year, event=event, session=session_name):
+            session = self.loader(year, event, session_name)
+        key = canonical_key(year, event, session_name, session)
+        self.put(key, session, aliases=[(year, event, session_name)])
+        return key, session
+
+    def put(self, key, session, aliases=()):
+        with self._lock:
+            nbytes = session_footprint(session)
+            self._entries[key] = (session, nbytes)
+            self._entries.move_to_end(key)
+            self._aliases[self._normalize(*key)] = key
+            for alias in aliases:
+                self._aliases[self._normalize(*alias)] = key
+            self._evict(keep=key)
+
+    def reload(self, key):
+        """Ricarica una sessione i cui dati grezzi sono stati liberati."""
+        count("session_pool.reloads")
+        with span("session_pool.reload", year=key[0], event=key[1], session=key[2]):
+            session = self.loader(*key)
+        with self._lock:
+            self.released.discard(key)
+            self.put(key, session)
+        return session
+
+    def remove(self, key):
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            self.released.discard(key)
+            self._aliases = {alias: k for alias, k in self._aliases.items() if k != key}
+        if removed:
+            for hook in self.evict_hooks:
+                hook(key)
+
+    def release_raw(self, key) -> int:
+        """Libera car/pos data di una sessione; restituisce i byte stimati liberati."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or key in self.released:
+                return 0
+            session, before = entry
+            release_raw_data(session)
+            after = session_footprint(session)
+            self._entries[key] = (session, after)
+            self.released.add(key)
+        count("session_pool.raw_released")
+        return before - after
+
+    def set_budget(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.trim()
+
+    def trim(self):
+        """Riapplica il budget (es. dopo aver cambiato le sessioni fissate)."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self, keep=None):
+        # Ordine: dati grezzi delle sessioni non in uso, tracce in cache meno
+        # usate, sessioni intere. La sessione corrente (fissata) tiene car/pos
+        # data: ogni nuovo giro visualizzato li richiede, e liberarli vorrebbe
+        # dire ricaricarla da FastF1 a ogni clic. Il resto del budget resta
+        # comunque rispettato togliendo le altre sessioni e le tracce.
+        for key in list(self._entries):
+            if self.used_bytes <= self.max_bytes:
+                break
+            if key != keep and key not in self.pinned:
+                self.release_raw(key)
+
+        for cache in self.caches:
+            excess = self.used_bytes - self.max_bytes
+            if excess <= 0:
+                break
+            cache.shrink(excess)
+
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_sessions or self.used_bytes > self.max_bytes
+        ):
+            victim = next(
+                (k for k in self._entries if k != keep and k not in self.pinned),
+                None,
+            )
+            if victim is None:
+                break
+            count("session_pool.evictions")
+            self.remove(victim)
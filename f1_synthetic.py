@@ -0,0 +1,299 @@
+"""Generatore di sessioni sintetiche compatibili con FastF1.
+
+Produce dati auto/posizione a frequenze realistiche (~4 Hz) per più piloti
+e più giri, così da poter misurare e provare la pipeline di telemetria
+senza accesso alla rete.
+"""
+
+import numpy as np
+import pandas as pd
+
+from fastf1.core import Laps, Telemetry
+
+
+SYNTHETIC_DRIVERS = [
+    ("1", "VER", "Max", "Verstappen"),
+    ("11", "PER", "Sergio", "Perez"),
+    ("16", "LEC", "Charles", "Leclerc"),
+    ("55", "SAI", "Carlos", "Sainz"),
+    ("44", "HAM", "Lewis", "Hamilton"),
+    ("63", "RUS", "George", "Russell"),
+    ("4", "NOR", "Lando", "Norris"),
+    ("81", "PIA", "Oscar", "Piastri"),
+    ("14", "ALO", "Fernando", "Alonso"),
+    ("18", "STR", "Lance", "Stroll"),
+    ("10", "GAS", "Pierre", "Gasly"),
+    ("31", "OCO", "Esteban", "Ocon"),
+    ("23", "ALB", "Alexander", "Albon"),
+    ("2", "SAR", "Logan", "Sargeant"),
+    ("22", "TSU", "Yuki", "Tsunoda"),
+    ("3", "RIC", "Daniel", "Ricciardo"),
+    ("77", "BOT", "Valtteri", "Bottas"),
+    ("24", "ZHO", "Guanyu", "Zhou"),
+    ("20", "MAG", "Kevin", "Magnussen"),
+    ("27", "HUL", "Nico", "Hulkenberg"),
+]
+
+CAR_RATE_HZ = 3.7
+POS_RATE_HZ = 4.4
+SESSION_START = pd.Timestamp("2024-03-02 15:00:00")
+
+
+def synthetic_circuit(length_m: float = 5000.0, seed: int = 0):
+    """Tracciato chiuso con profilo di velocità limitato da curvatura,
+    accelerazione e frenata (passo di 1 m)."""
+    rng = np.random.default_rng(seed)
+    n = int(length_m)
+    theta = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    p1, p2 = rng.uniform(0, 2 * np.pi, size=2)
+    radius = (
+        1.0
+        + 0.25 * np.sin(3 * theta + p1)
+        + 0.12 * np.cos(5 * theta + p2)
+        + 0.05 * np.sin(11 * theta + p2)
+        + 0.025 * np.cos(17 * theta + p1)
+    )
+    x = radius * np.cos(theta)
+    y = radius * np.sin(theta)
+
+    seg = np.hypot(np.diff(x, append=x[0]), np.diff(y, append=y[0]))
+    scale = length_m / seg.sum()
+    x *= scale
+    y *= scale
+    ds = seg * scale
+    s = np.concatenate(([0.0], np.cumsum(ds)[:-1]))
+
+    dx = np.gradient(x)
+    dy = np.gradient(y)
+    ddx = np.gradient(dx)
+    ddy = np.gradient(dy)
+    curvature = np.abs(dx * ddy - dy * ddx) / np.maximum((dx ** 2 + dy ** 2) ** 1.5, 1e-9)
+
+    # velocità massima in curva (a_lat ~ 4g), poi vincoli di accelerazione/frenata
+    v = np.minimum(np.sqrt(39.0 / np.maximum(curvature, 1e-6)), 340 / 3.6)
+    for i in range(1, 2 * n):
+        j, k = i % n, (i - 1) % n
+        v[j] = min(v[j], np.sqrt(v[k] ** 2 + 2 * 9.0 * ds[k]))
+    for i in range(2 * n - 2, -1, -1):
+        j, k = i % n, (i + 1) % n
+        v[j] = min(v[j], np.sqrt(v[k] ** 2 + 2 * 38.0 * ds[j]))
+
+    return {"s": s, "ds": ds, "x": x, "y": y, "speed": v * 3.6, "length": length_m}
+
+
+def _channels_at(circuit, s_samples, pace: float, drs_enabled: bool):
+    s_mod = np.mod(s_samples, circuit["length"])
+    speed = np.interp(s_mod, circuit["s"], circuit["speed"]) * pace
+    accel = np.gradient(np.interp(s_mod, circuit["s"], circuit["speed"]))
+
+    throttle = np.where(accel > 0.05, 100.0, np.where(accel < -0.2, 0.0, 60.0))
+    throttle = np.where(speed > 300 * pace, 100.0, throttle)
+    brake = accel < -0.2
+    gear = np.digitize(speed, [0, 90, 130, 165, 200, 235, 270, 300]).astype(int)
+    gear = np.clip(gear, 1, 8)
+    rpm = 10500 + 1500 * np.sin(speed / 35.0) ** 2
+    drs = np.where(drs_enabled & (s_mod < 0.12 * circuit["length"]), 12, 1)
+    return speed, throttle, brake, gear, rpm, drs
+
+
+def _lap_time_profile(circuit, pace: float):
+    # tempo cumulato in funzione della distanza percorsa nel giro
+    dt = circuit["ds"] / (circuit["speed"] / 3.6 * pace)
+    return np.concatenate(([0.0], np.cumsum(dt)))
+
+
+class SyntheticSession:
+    """Sessione fittizia con l'interfaccia usata dall'app (drivers, get_driver,
+    laps, car_data, pos_data, event, session_info)."""
+
+    def __init__(
+        self,
+        n_drivers: int = 20,
+        n_laps: int = 70,
+        length_m: float = 5000.0,
+        seed: int = 0,
+        pit_laps: tuple = (22, 45),
+    ):
+        self.rng = np.random.default_rng(seed)
+        self.circuit = synthetic_circuit(length_m, seed)
+        self.n_laps = n_laps
+        self.pit_laps = pit_laps
+        self.event = pd.Series({"EventName": "Synthetic Grand Prix", "OfficialEventName": "Synthetic Grand Prix"})
+        self.name = "Race"
+        self.date = SESSION_START
+        self.t0_date = SESSION_START
+        self.session_start_time = pd.Timedelta(0)
+        self.session_info = {"Meeting": {"Name": "Synthetic"}}
+
+        entries = SYNTHETIC_DRIVERS[:n_drivers]
+        self.drivers = [num for num, _, _, _ in entries]
+        self._driver_info = {
+            num: {
+                "DriverNumber": num,
+                "Abbreviation": abbrev,
+                "FirstName": first,
+                "LastName": last,
+                "FullName": f"{first} {last}",
+                "BroadcastName": f"{first[0]} {last.upper()}",
+            }
+            for num, abbrev, first, last in entries
+        }
+
+        self.car_data = {}
+        self.pos_data = {}
+        lap_frames = []
+        for rank, num in enumerate(self.drivers):
+            car, pos, laps = self._generate_driver(num, rank)
+            self.car_data[num] = car
+            self.pos_data[num] = pos
+            lap_frames.append(laps)
+
+        self.laps = Laps(pd.concat(lap_frames, ignore_index=True), session=self)
+        self.weather_data = self._generate_weather()
+        self.track_status = pd.DataFrame(
+            {"Time": [pd.Timedelta(0)], "Status": ["1"], "Message": ["AllClear"]}
+        )
+
+    def get_driver(self, identifier):
+        identifier = str(identifier)
+        for num, info in self._driver_info.items():
+            if identifier in (num, info["Abbreviation"]):
+                return pd.Series(info)
+        raise ValueError(f"Invalid driver identifier '{identifier}'")
+
+    def load(self, *args, **kwargs):
+        return None
+
+    def _generate_driver(self, num: str, rank: int):
+        rng = self.rng
+        circuit = self.circuit
+        length = circuit["length"]
+        base_pace = 1.0 - 0.002 * rank
+
+        car_parts = []
+        pos_parts = []
+        lap_rows = []
+        t_lap_start = 0.0
+        s_offset = 0.0
+        best = None
+
+        for lap_number in range(1, self.n_laps + 1):
+            pace = base_pace * (1 + rng.normal(0, 0.003)) * (1 - 0.0004 * (lap_number % 23))
+            t_profile = _lap_time_profile(circuit, pace)
+            s_profile = np.append(circuit["s"], length)
+            pit_loss = 20.0 if lap_number in self.pit_laps else 0.0
+            lap_time = t_profile[-1] + pit_loss
+
+            # tempi di campionamento con jitter, tipici dei flussi F1 live timing
+            car_t = self._sample_times(lap_time, CAR_RATE_HZ)
+            pos_t = self._sample_times(lap_time, POS_RATE_HZ)
+
+            # durante la sosta ai box (fine giro) la vettura resta ferma
+            s_car = s_offset + np.interp(car_t, t_profile, s_profile)
+            s_pos = s_offset + np.interp(pos_t, t_profile, s_profile)
+            speed, throttle, brake, gear, rpm, drs = _channels_at(
+                circuit, s_car, pace, drs_enabled=lap_number > 2
+            )
+            stopped = car_t > t_profile[-1]
+            speed = np.where(stopped, 0.0, speed)
+            throttle = np.where(stopped, 0.0, throttle)
+            s_pos_mod = np.mod(s_pos, length)
+            x_pos = np.interp(s_pos_mod, circuit["s"], circuit["x"]) * 10
+            y_pos = np.interp(s_pos_mod, circuit["s"], circuit["y"]) * 10
+
+            session_car = pd.to_timedelta(t_lap_start + car_t, unit="s")
+            session_pos = pd.to_timedelta(t_lap_start + pos_t, unit="s")
+            car_parts.append(
+                pd.DataFrame(
+                    {
+                        "Date": self.t0_date + session_car,
+                        "SessionTime": session_car,
+                        "RPM": rpm,
+                        "Speed": speed,
+                        "nGear": gear,
+                        "Throttle": throttle,
+                        "Brake": brake,
+                        "DRS": drs,
+                        "Source": "car",
+                    }
+                )
+            )
+            pos_parts.append(
+                pd.DataFrame(
+                    {
+                        "Date": self.t0_date + session_pos,
+                        "SessionTime": session_pos,
+                        "Status": "OnTrack",
+                        "X": x_pos,
+                        "Y": y_pos,
+                        "Z": np.zeros_like(x_pos),
+                        "Source": "pos",
+                    }
+                )
+            )
+
+            sectors = np.array([0.31, 0.37, 0.32]) * (lap_time - pit_loss)
+            sectors[-1] += pit_loss
+            lap_td = pd.Timedelta(seconds=lap_time)
+            is_best = best is None or lap_time < best
+            best = lap_time if is_best else best
+            lap_rows.append(
+                {
+                    "Time": pd.Timedelta(seconds=t_lap_start + lap_time),
+                    "Driver": self._driver_info[num]["Abbreviation"],
+                    "DriverNumber": num,
+                    "LapTime": lap_td,
+                    "LapNumber": float(lap_number),
+                    "Stint": float(1 + sum(lap_number > p for p in self.pit_laps)),
+                    "PitOutTime": pd.Timedelta(seconds=t_lap_start) if lap_number - 1 in self.pit_laps else pd.NaT,
+                    "PitInTime": pd.Timedelta(seconds=t_lap_start + lap_time - 5) if pit_loss else pd.NaT,
+                    "Sector1Time": pd.Timedelta(seconds=sectors[0]),
+                    "Sector2Time": pd.Timedelta(seconds=sectors[1]),
+                    "Sector3Time": pd.Timedelta(seconds=sectors[2]),
+                    "SpeedI1": float(speed.max() * 0.9),
+                    "SpeedI2": float(speed.max() * 0.85),
+                    "SpeedFL": float(speed[-1]),
+                    "SpeedST": float(speed.max()),
+                    "IsPersonalBest": is_best,
+                    "Compound": "MEDIUM" if lap_number <= self.pit_laps[0] else "HARD",
+                    "TyreLife": float(lap_number),
+                    "Team": "Synthetic",
+                    "LapStartTime": pd.Timedelta(seconds=t_lap_start),
+                    "LapStartDate": self.t0_date + pd.Timedelta(seconds=t_lap_start),
+                    "TrackStatus": "1",
+                    "Position": float(rank + 1),
+                    "Deleted": False,
+                    "IsAccurate": True,
+                }
+            )
+
+            t_lap_start += lap_time
+            s_offset += length
+
+        car = Telemetry(pd.concat(car_parts, ignore_index=True), session=self, driver=num)
+        pos = Telemetry(pd.concat(pos_parts, ignore_index=True), session=self, driver=num)
+        car["Time"] = car["SessionTime"]
+        pos["Time"] = pos["SessionTime"]
+        return car, pos, pd.DataFrame(lap_rows)
+
+    def _sample_times(self, duration: float, rate_hz: float):
+        n = int(duration * rate_hz) + 1
+        steps = self.rng.uniform(0.8, 1.2, size=n) / rate_hz
+        t = np.cumsum(steps) - steps[0]
+        return t[t < duration]
+
+    def _generate_weather(self):
+        end = max(float(self.laps["Time"].max().total_seconds()), 60.0)
+        times = np.arange(0, end, 60.0)
+        return pd.DataFrame(
+            {
+                "Time": pd.to_timedelta(times, unit="s"),
+                "AirTemp": 24 + 0.5 * np.sin(times / 900),
+                "TrackTemp": 38 + 2.0 * np.sin(times / 1200),
+                "Humidity": np.full_like(times, 45.0),
+                "Pressure": np.full_like(times, 1012.0),
+                "Rainfall": np.zeros_like(times, dtype=bool),
+                "WindDirection": np.full_like(times, 180.0),
+                "WindSpeed": np.full_like(times, 1.5),
+            }
+        )
@@ -1,22 +1,85 @@
+from datetime import date
 from pathlib import Path
 import math
-
-import fastf1
-from fastf1 import plotting
-import numpy as np
+import os
+import queue
+import sqlite3
+import threading
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# Solo moduli leggeri all'avvio: FastF1, matplotlib, pandas e i moduli che li
+# usano vengono importati da warm_up() in background o al primo utilizzo.
+from f1_perf import profiler, span, timed
+from f1_schedule import ScheduleCache, cached_sessions, exact_events, find_session, match_events
+from f1_model import TelemetryError, TelemetryService, coordinate_columns
+from f1_sessions import DEFAULT_MEMORY_BUDGET, LapCache, SessionPool, parse_session_ref
 
 
-# Abilita la cache locale di FastF1
+# Cache locale di FastF1 (abilitata in warm_up)
 CACHE_DIR = Path(r"X:\fastf1_cache")
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-fastf1.Cache.enable_cache(CACHE_DIR)
-plotting.setup_mpl()  # opzionale, migliora lo stile dei grafici
+
+# Budget di memoria delle sessioni caricate (MB), configurabile da ambiente
+MEMORY_BUDGET_ENV = "F1_MEMORY_BUDGET_MB"
+
+# Etichette dei controlli di elaborazione -> valori di f1_filters
+FILTER_GRIDS = {"Grezza": "raw", "Distanza": "distance", "Tempo": "time"}
+FILTER_KINDS = {"Nessuno": "none", "Savitzky–Golay": "savgol", "Media mobile": "moving_average"}
+# passo di default per griglia, come f1_filters.DEFAULT_STEPS (la griglia grezza non ne usa)
+FILTER_STEPS = {"Distanza": "2", "Tempo": "0.1"}
+THUMB_COLUMNS = 3
+THUMB_DRIVERS = 8      # piloti con miniature tenute in memoria (LRU)
+
+
+def memory_budget() -> int:
+    try:
+        return int(float(os.environ[MEMORY_BUDGET_ENV]) * 1024 ** 2)
+    except (KeyError, ValueError):
+        return DEFAULT_MEMORY_BUDGET
+
+
+def default_filter_step(grid_label: str) -> str:
+    return FILTER_STEPS.get(grid_label, "")
+
+
+def format_bytes(nbytes: float) -> str:
+    if nbytes < 1024 ** 2:
+        return f"{nbytes / 1024:.0f} KB"
+    if nbytes < 1024 ** 3:
+        return f"{nbytes / 1024 ** 2:.0f} MB"
+    return f"{nbytes / 1024 ** 3:.2f} GB"
+
+
+def warm_up():
+    """Import pesanti e inizializzazione della cache, eseguiti fuori dal thread UI."""
+    with span("startup.warm_up"):
+        with span("import.fastf1"):
+            import fastf1
+            from fastf1 import plotting
+        with span("import.matplotlib"):
+            import matplotlib.figure  # noqa: F401
+            import matplotlib.backends.backend_tkagg  # noqa: F401
+        with span("import.app_modules"):
+            import f1_align  # noqa: F401
+            import f1_lapindex  # noqa: F401
+            import f1_workspace  # noqa: F401
+        with span("fastf1.cache_init"):
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fastf1.Cache.enable_cache(CACHE_DIR)
+        plotting.setup_mpl()  # opzionale, migliora lo stile dei grafici
+
+
+def timed_canvas_class():
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    class TimedFigureCanvas(FigureCanvasTkAgg):
+        # Misura anche i draw differiti (draw_idle) come azioni separate
+        def draw(self):
+            with span("canvas.draw"):
+                super().draw()
+
+    return TimedFigureCanvas
 
 
 class F1TelemetryApp:
@@ -35,14 +98,51 @@ class F1TelemetryApp:
         # Colori confronto piloti (anche indicatori UI)
         self.slot_colors = ["#4fc3f7", "#ffb74d", "#ce93d8"]
 
-        # Oggetti FastF1
-        self.session = None
-        self.drivers = []
-        self.driver_map = {}   # indice listbox -> (driver_num, abbrev, nome)
-        self.laps = None       # Laps del pilota selezionato
+        # Sessione, pool di sessioni e cache dei giri: tutto in f1_model, senza Tk
+        self.service = TelemetryService(session_pool=SessionPool(max_bytes=memory_budget()))
+        self.driver_map = {}   # indice listbox -> DriverInfo
+        self.laps = None       # LapInfo del pilota selezionato
         self.selected_driver_abbrev = None
         self.current_telemetry = []
         self.multi_telemetry = []
+        self.circuit_layout = None     # (x, y, titolo) del layout disegnato
+        self.ghost = None              # (TimeAlignment, item) del confronto per il marker fantasma
+
+        # Indice dei giri più veloci e archivio tracce elaborate (creati dopo il warm-up)
+        self.lap_index_path = CACHE_DIR / "lap_index.sqlite"
+        self.lap_index = None
+        self.trace_store = None
+        self.index_window = None
+        self.corner_window = None
+        self.race_window = None
+        self.race_data = None          # RaceOverview mostrata nella finestra panoramica
+        self.thumb_window = None
+        self.thumb_canvas = None
+        self.thumb_images = LapCache(max_items=THUMB_DRIVERS)  # (sessione, pilota) -> miniature in PhotoImage
+        self.thumb_pending = set()
+        self.thumb_key = None          # (sessione, pilota) mostrato nella finestra miniature
+        self.report_thread = None
+
+        # Calendario eventi per l'autocompletamento (JSON su disco, rete solo la prima volta)
+        self.schedule_cache = ScheduleCache(CACHE_DIR / "schedules")
+        self.schedule_year = None
+        self.schedule_events = None
+
+        # Avvio rapido: la finestra appare subito, i moduli pesanti arrivano in background
+        self.ready = False
+        self.warm_up_done = threading.Event()
+        self.warm_up_error = None
+        self.pending_actions = []
+        # Risultati dei thread di lavoro, consegnati al thread Tk da _poll_ui_queue
+        self.ui_queue = queue.Queue()
+
+        # Server locale per notebook e dashboard (opzionale)
+        self.telemetry_server = None
+
+        # Pannello prestazioni (opzionale)
+        self.perf_window = None
+        self.perf_text = None
+        self.perf_version = -1
 
         self.point_detail_var = tk.StringVar(
             value="Clicca sul grafico della velocità per vedere il dettaglio."
@@ -54,6 +154,8 @@ class F1TelemetryApp:
         # Costruisci interfaccia
         self._setup_theme()
         self._build_ui()
+        self._start_warm_up()
+        self.on_year_changed()
 
     # ------------------------------------------------------------------
     # UI
@@ -137,19 +239,51 @@ class F1TelemetryApp:
 
         ttk.Label(session_frame, text="Anno (es. 2024):").grid(row=0, column=0, sticky="w")
         self.year_var = tk.StringVar(value="2024")
-        ttk.Entry(session_frame, textvariable=self.year_var, width=10).grid(row=0, column=1, sticky="ew")
+        self.year_combo = ttk.Combobox(
+            session_frame,
+            textvariable=self.year_var,
+            width=10,
+            values=[str(y) for y in range(date.today().year, 2017, -1)],
+        )
+        self.year_combo.grid(row=0, column=1, sticky="ew")
+        for sequence in ("<<ComboboxSelected>>", "<FocusOut>", "<Return>"):
+            self.year_combo.bind(sequence, self.on_year_changed)
 
         ttk.Label(session_frame, text="Evento (es. Bahrain Grand Prix):").grid(row=1, column=0, sticky="w")
         self.event_var = tk.StringVar()
-        ttk.Entry(session_frame, textvariable=self.event_var).grid(row=1, column=1, sticky="ew")
+        self.event_combo = ttk.Combobox(session_frame, textvariable=self.event_var)
+        self.event_combo.grid(row=1, column=1, sticky="ew")
+        self.event_combo.bind("<KeyRelease>", self.on_event_typed)
+        for sequence in ("<<ComboboxSelected>>", "<FocusOut>", "<Return>"):
+            self.event_combo.bind(sequence, self.on_event_chosen)
 
         ttk.Label(session_frame, text="Sessione (es. FP1, FP2, FP3, Q, R, S):").grid(row=2, column=0, sticky="w")
         self.session_var = tk.StringVar(value="R")
-        ttk.Entry(session_frame, textvariable=self.session_var, width=10).grid(row=2, column=1, sticky="ew")
+        self.session_combo = ttk.Combobox(session_frame, textvariable=self.session_var, width=10)
+        self.session_combo.grid(row=2, column=1, sticky="ew")
 
         load_btn = ttk.Button(session_frame, text="Carica Sessione", command=self.load_session)
         load_btn.grid(row=3, column=0, columnspan=2, sticky="ew", pady=(5, 0))
 
+        save_ws_btn = ttk.Button(session_frame, text="Salva workspace", command=self.save_workspace)
+        save_ws_btn.grid(row=4, column=0, sticky="ew", pady=(5, 0), padx=(0, 3))
+        open_ws_btn = ttk.Button(session_frame, text="Apri workspace", command=self.open_workspace)
+        open_ws_btn.grid(row=4, column=1, sticky="ew", pady=(5, 0))
+
+        index_btn = ttk.Button(session_frame, text="Database giri veloci", command=self.open_lap_index)
+        index_btn.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
+        perf_btn = ttk.Button(session_frame, text="Pannello prestazioni (F12)", command=self.toggle_perf_panel)
+        perf_btn.grid(row=6, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.root.bind("<F12>", lambda event: self.toggle_perf_panel())
+
+        self.server_btn_var = tk.StringVar(value="Avvia server locale")
+        server_btn = ttk.Button(session_frame, textvariable=self.server_btn_var, command=self.toggle_server)
+        server_btn.grid(row=7, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
+        race_btn = ttk.Button(session_frame, text="Panoramica gara (posizioni e distacchi)", command=self.open_race_overview)
+        race_btn.grid(row=8, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+
         # -------------------- ANALISI PILOTA SINGOLO --------------------
         single_frame = ttk.LabelFrame(left_frame, text="Analisi singolo pilota", padding=10)
         single_frame.grid(row=1, column=0, sticky="ew", pady=(0, 10))
@@ -204,6 +338,9 @@ class F1TelemetryApp:
         fastest_btn = ttk.Button(laps_frame, text="Mostra giro più veloce", command=self.show_fastest_lap)
         fastest_btn.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(6, 0))
 
+        thumbs_btn = ttk.Button(laps_frame, text="Miniature di tutti i giri", command=self.open_thumbnail_strip)
+        thumbs_btn.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(6, 0))
+
         # -------------------- CONFRONTO PILOTI --------------------
         compare_frame = ttk.LabelFrame(left_frame, text="Confronto piloti (max 3)", padding=10)
         compare_frame.grid(row=2, column=0, sticky="nsew")
@@ -223,7 +360,8 @@ class F1TelemetryApp:
 
             ttk.Label(slot_frame, text="Pilota").grid(row=0, column=0, sticky="w")
             driver_var = tk.StringVar()
-            driver_combo = ttk.Combobox(slot_frame, textvariable=driver_var, state="readonly")
+            # editabile: per altre sessioni si può digitare la sigla del pilota
+            driver_combo = ttk.Combobox(slot_frame, textvariable=driver_var)
             driver_combo.grid(row=0, column=1, sticky="ew", columnspan=2)
 
             ttk.Label(slot_frame, text="Giro n°").grid(row=1, column=0, sticky="w")
@@ -235,9 +373,17 @@ class F1TelemetryApp:
             fastest_check = ttk.Checkbutton(slot_frame, text="Usa giro più veloce", variable=fastest_var)
             fastest_check.grid(row=1, column=2, sticky="w", padx=(5, 0))
 
+            ttk.Label(slot_frame, text="Sessione").grid(row=2, column=0, sticky="w")
+            session_ref_var = tk.StringVar()
+            session_ref_entry = ttk.Entry(slot_frame, textvariable=session_ref_var)
+            session_ref_entry.grid(row=2, column=1, columnspan=2, sticky="ew")
+            ttk.Label(slot_frame, text="anno, evento, sess. (vuoto = corrente)").grid(
+                row=3, column=1, columnspan=3, sticky="w"
+            )
+
             color = self.slot_colors[slot_idx]
             color_indicator = tk.Label(slot_frame, text=" ", width=2, background=color, relief="groove")
-            color_indicator.grid(row=0, column=3, rowspan=2, sticky="nswe", padx=(6, 0))
+            color_indicator.grid(row=0, column=3, rowspan=3, sticky="nswe", padx=(6, 0))
 
             self.compare_slots.append(
                 {
@@ -245,6 +391,7 @@ class F1TelemetryApp:
                     "driver_combo": driver_combo,
                     "lap_var": lap_var,
                     "fastest_var": fastest_var,
+                    "session_ref_var": session_ref_var,
                     "color": color,
                 }
             )
@@ -252,25 +399,89 @@ class F1TelemetryApp:
         compare_btn = ttk.Button(compare_frame, text="Confronta telemetria", command=self.compare_telemetry)
         compare_btn.grid(row=3, column=0, sticky="ew")
 
+        # -------------------- ELABORAZIONE SEGNALE --------------------
+        filter_frame = ttk.LabelFrame(left_frame, text="Elaborazione segnale", padding=10)
+        filter_frame.grid(row=3, column=0, sticky="ew", pady=(10, 0))
+        for c in range(4):
+            filter_frame.columnconfigure(c, weight=1)
+
+        ttk.Label(filter_frame, text="Griglia").grid(row=0, column=0, sticky="w")
+        self.filter_grid_var = tk.StringVar(value="Grezza")
+        grid_combo = ttk.Combobox(
+            filter_frame, textvariable=self.filter_grid_var, values=list(FILTER_GRIDS), state="readonly", width=10
+        )
+        grid_combo.grid(row=0, column=1, sticky="ew")
+        grid_combo.bind("<<ComboboxSelected>>", self.on_filter_grid_changed)
+        ttk.Label(filter_frame, text="Passo (m / s)").grid(row=0, column=2, sticky="w", padx=(6, 0))
+        self.filter_step_var = tk.StringVar(value=default_filter_step("Grezza"))
+        ttk.Entry(filter_frame, textvariable=self.filter_step_var, width=6).grid(row=0, column=3, sticky="ew")
+
+        ttk.Label(filter_frame, text="Filtro").grid(row=1, column=0, sticky="w")
+        self.filter_kind_var = tk.StringVar(value="Nessuno")
+        ttk.Combobox(
+            filter_frame, textvariable=self.filter_kind_var, values=list(FILTER_KINDS), state="readonly", width=14
+        ).grid(row=1, column=1, sticky="ew")
+        ttk.Label(filter_frame, text="Finestra / ordine").grid(row=1, column=2, sticky="w", padx=(6, 0))
+        window_frame = ttk.Frame(filter_frame)
+        window_frame.grid(row=1, column=3, sticky="ew")
+        self.filter_window_var = tk.StringVar(value="11")
+        ttk.Entry(window_frame, textvariable=self.filter_window_var, width=4).grid(row=0, column=0)
+        self.filter_order_var = tk.StringVar(value="3")
+        ttk.Entry(window_frame, textvariable=self.filter_order_var, width=3).grid(row=0, column=1, padx=(3, 0))
+
+        ttk.Button(filter_frame, text="Applica", command=self.apply_filter_config).grid(
+            row=2, column=0, columnspan=4, sticky="ew", pady=(6, 0)
+        )
+
+        export_btn = ttk.Button(
+            compare_frame, text="Esporta dati allineati (CSV/Parquet)", command=self.export_aligned_telemetry
+        )
+        export_btn.grid(row=4, column=0, sticky="ew", pady=(6, 0))
+
+        events_frame = ttk.Frame(compare_frame)
+        events_frame.grid(row=5, column=0, sticky="ew", pady=(6, 0))
+        events_frame.columnconfigure(1, weight=1)
+        self.show_events_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            events_frame,
+            text="Mostra frenate/apici",
+            variable=self.show_events_var,
+            command=self.on_toggle_events,
+        ).grid(row=0, column=0, sticky="w")
+        ttk.Button(events_frame, text="Differenze curve", command=self.open_corner_table).grid(
+            row=0, column=1, sticky="e"
+        )
+        self.show_status_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            events_frame,
+            text="Mostra bandiere/SC/VSC",
+            variable=self.show_status_var,
+            command=self.on_toggle_track_status,
+        ).grid(row=1, column=0, sticky="w")
+        gap_mode_frame = ttk.Frame(events_frame)
+        gap_mode_frame.grid(row=2, column=0, columnspan=2, sticky="w")
+        ttk.Label(gap_mode_frame, text="Gap:").grid(row=0, column=0, sticky="w", padx=(0, 4))
+        self.gap_mode_var = tk.StringVar(value="distance")
+        for col, (text, value) in enumerate(
+            (("tempo a pari distanza [s]", "distance"), ("metri a pari tempo (fantasma)", "time")), start=1
+        ):
+            ttk.Radiobutton(
+                gap_mode_frame, text=text, value=value, variable=self.gap_mode_var, command=self.on_gap_mode_changed
+            ).grid(row=0, column=col, sticky="w")
+
+        report_btn = ttk.Button(compare_frame, text="Genera report (PDF/PNG)", command=self.generate_report)
+        report_btn.grid(row=6, column=0, sticky="ew", pady=(6, 0))
+
         # ----------------------- AREA GRAFICO ---------------------------
         graph_frame = ttk.LabelFrame(right_frame, text="Telemetria", padding=5)
         graph_frame.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
         graph_frame.rowconfigure(0, weight=1)
         graph_frame.columnconfigure(0, weight=1)
+        self.graph_frame = graph_frame
 
-        # Figura matplotlib con 6 sottoplot
-        self.fig = Figure(figsize=(10, 7), dpi=100)
-        self.fig.patch.set_facecolor(self.bg_color)
-        self.ax_speed = self.fig.add_subplot(611)
-        self.ax_throttle = self.fig.add_subplot(612, sharex=self.ax_speed)
-        self.ax_brake = self.fig.add_subplot(613, sharex=self.ax_speed)
-        self.ax_gear = self.fig.add_subplot(614, sharex=self.ax_speed)
-        self.ax_drs = self.fig.add_subplot(615, sharex=self.ax_speed)
-        self.ax_gap = self.fig.add_subplot(616, sharex=self.ax_speed)
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=graph_frame)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.grid(row=0, column=0, sticky="nsew")
+        # Segnaposto finché matplotlib non è pronto (vedi _build_figures)
+        self.graph_placeholder = ttk.Label(graph_frame, text="Inizializzazione grafici...", anchor="center")
+        self.graph_placeholder.grid(row=0, column=0, sticky="nsew")
 
         detail_frame = ttk.LabelFrame(
             graph_frame,
@@ -293,15 +504,7 @@ class F1TelemetryApp:
         circuit_frame.grid(row=1, column=0, sticky="nsew")
         circuit_frame.rowconfigure(0, weight=1)
         circuit_frame.columnconfigure(0, weight=1)
-
-        self.circuit_fig = Figure(figsize=(10, 3.5), dpi=100)
-        self.circuit_fig.patch.set_facecolor(self.bg_color)
-        self.ax_circuit = self.circuit_fig.add_subplot(111)
-        self._apply_circuit_axes_style()
-
-        self.circuit_canvas = FigureCanvasTkAgg(self.circuit_fig, master=circuit_frame)
-        self.circuit_canvas_widget = self.circuit_canvas.get_tk_widget()
-        self.circuit_canvas_widget.grid(row=0, column=0, sticky="nsew")
+        self.circuit_frame = circuit_frame
 
         hover_frame = ttk.LabelFrame(
             graph_frame,
@@ -319,10 +522,51 @@ class F1TelemetryApp:
         )
         hover_label.grid(row=0, column=0, sticky="ew")
 
-        # Label info in basso (facoltativa)
+        # Label info in basso (facoltativa) e indicatore di memoria
+        status_bar = ttk.Frame(self.root)
+        status_bar.grid(row=1, column=0, columnspan=2, sticky="ew")
+        status_bar.columnconfigure(0, weight=1)
         self.status_var = tk.StringVar(value="Carica una sessione per iniziare.")
-        status_label = ttk.Label(self.root, textvariable=self.status_var, anchor="w", padding=(10, 2))
-        status_label.grid(row=1, column=0, columnspan=2, sticky="ew")
+        status_label = ttk.Label(status_bar, textvariable=self.status_var, anchor="w", padding=(10, 2))
+        status_label.grid(row=0, column=0, sticky="ew")
+        self.memory_var = tk.StringVar()
+        self.memory_label = ttk.Label(status_bar, textvariable=self.memory_var, anchor="e", padding=(10, 2))
+        self.memory_label.grid(row=0, column=1, sticky="e")
+
+        self.base_xlim = None
+        self.circuit_hover_markers = []
+        self.event_artists = []
+        self.status_artists = []
+
+    @timed("startup.build_figures")
+    def _build_figures(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.graph_placeholder.destroy()
+
+        # Figura matplotlib con 6 sottoplot
+        self.fig = Figure(figsize=(10, 7), dpi=100)
+        self.fig.patch.set_facecolor(self.bg_color)
+        self.ax_speed = self.fig.add_subplot(611)
+        self.ax_throttle = self.fig.add_subplot(612, sharex=self.ax_speed)
+        self.ax_brake = self.fig.add_subplot(613, sharex=self.ax_speed)
+        self.ax_gear = self.fig.add_subplot(614, sharex=self.ax_speed)
+        self.ax_drs = self.fig.add_subplot(615, sharex=self.ax_speed)
+        self.ax_gap = self.fig.add_subplot(616, sharex=self.ax_speed)
+
+        self.canvas = timed_canvas_class()(self.fig, master=self.graph_frame)
+        self.canvas_widget = self.canvas.get_tk_widget()
+        self.canvas_widget.grid(row=0, column=0, sticky="nsew")
+
+        self.circuit_fig = Figure(figsize=(10, 3.5), dpi=100)
+        self.circuit_fig.patch.set_facecolor(self.bg_color)
+        self.ax_circuit = self.circuit_fig.add_subplot(111)
+        self._apply_circuit_axes_style()
+
+        self.circuit_canvas = FigureCanvasTkAgg(self.circuit_fig, master=self.circuit_frame)
+        self.circuit_canvas_widget = self.circuit_canvas.get_tk_widget()
+        self.circuit_canvas_widget.grid(row=0, column=0, sticky="nsew")
 
         self.canvas.mpl_connect("scroll_event", self.on_scroll)
         self.canvas.mpl_connect("button_press_event", self.on_speed_click)
@@ -330,16 +574,88 @@ class F1TelemetryApp:
 
         self._apply_axes_style()
         self._configure_axes_labels()
-        self.base_xlim = None
-        self.circuit_hover_markers = []
+        self.canvas.draw_idle()
+
+    # ------------------------------------------------------------------
+    # AVVIO
+    # ------------------------------------------------------------------
+    def _start_warm_up(self):
+        def worker():
+            try:
+                warm_up()
+            except Exception as e:
+                self.warm_up_error = e
+            finally:
+                self.warm_up_done.set()
+
+        threading.Thread(target=worker, name="warm-up", daemon=True).start()
+        self.root.after(50, self._poll_warm_up)
+        self.root.after(50, self._poll_ui_queue)
+
+    def _post_to_ui(self, callback):
+        """Dai thread di lavoro: ``callback`` verrà eseguito nel thread Tk."""
+        self.ui_queue.put(callback)
+
+    def _poll_ui_queue(self):
+        # Tk non è thread-safe nemmeno per root.after: i worker passano dalla coda
+        try:
+            while True:
+                callback = self.ui_queue.get_nowait()
+                try:
+                    callback()
+                except Exception as e:
+                    self.status_var.set(f"Errore: {e}")
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(50, self._poll_ui_queue)
+
+    def _poll_warm_up(self):
+        # Tk va usato solo dal thread principale: controllo periodico dell'evento
+        if not self.warm_up_done.is_set():
+            self.root.after(50, self._poll_warm_up)
+            return
+
+        if self.warm_up_error is not None:
+            messagebox.showerror("Errore", f"Inizializzazione non riuscita:\n{self.warm_up_error}")
+            self.status_var.set("Errore di inizializzazione: FastF1/matplotlib non disponibili.")
+            return
+
+        from f1_lapindex import LapIndex, TraceStore
+
+        self._build_figures()
+        self.lap_index = LapIndex(self.lap_index_path)
+        self.trace_store = TraceStore(CACHE_DIR / "traces")
+        self.service.attach_index(self.lap_index, self.trace_store)
+        self.ready = True
+        self._refresh_memory_indicator()
+
+        pending, self.pending_actions = self.pending_actions, []
+        if pending:
+            for action in pending:
+                action()
+        else:
+            self.status_var.set("Pronto. Carica una sessione per iniziare.")
+
+    def _defer_until_ready(self, action) -> bool:
+        """True se l'app non è pronta: l'azione viene eseguita a warm-up completato."""
+        if self.ready:
+            return False
+        if action not in self.pending_actions:
+            self.pending_actions.append(action)
+        self.status_var.set("Inizializzazione in corso: l'operazione partirà appena pronti...")
+        return True
 
     # ------------------------------------------------------------------
     # CALLBACKS
     # ------------------------------------------------------------------
+    @timed("load_session")
     def load_session(self):
+        if self._defer_until_ready(self.load_session):
+            return
         year_str = self.year_var.get().strip()
         event = self.event_var.get().strip()
-        sess_name = self.session_var.get().strip()
+        sess_name = self._session_identifier()
 
         if not year_str or not event or not sess_name:
             messagebox.showwarning("Input mancante", "Inserisci anno, evento e sessione.")
@@ -351,23 +667,191 @@ class F1TelemetryApp:
             messagebox.showerror("Errore", "L'anno deve essere un numero intero.")
             return
 
+        # Il calendario locale serve solo a completare il nome o a suggerire:
+        # numeri di round, nomi parziali e identificativi numerici li risolve FastF1
+        hint = ""
+        events = self.schedule_cache.load(year)
+        if events is not None:
+            matches = exact_events(events, event)
+            if len(matches) == 1:
+                schedule_event = matches[0]
+                event = schedule_event["name"]
+                if find_session(schedule_event, sess_name) is None:
+                    available = ", ".join(s["short"] for s in schedule_event["sessions"])
+                    hint = f"Sessioni di {event}: {available}"
+            else:
+                candidates = matches or match_events(events, event, limit=3)
+                if candidates:
+                    hint = "Eventi corrispondenti nel calendario: " + ", ".join(e["name"] for e in candidates)
+
+        previous_key = self.service.session_key
         try:
             self.status_var.set("Caricamento sessione in corso...")
             self.root.update_idletasks()
 
-            self.session = fastf1.get_session(year, event, sess_name)
-            self.session.load()
-
-        except Exception as e:
-            messagebox.showerror("Errore", f"Impossibile caricare la sessione:\n{e}")
+            # Chiave con il nome evento canonico di FastF1, usata anche nell'indice
+            year, event, sess_name = self.service.load(year, event, sess_name)
+        except TelemetryError as e:
+            messagebox.showerror("Errore", f"{e}\n{hint}" if hint else str(e))
             self.status_var.set("Errore nel caricamento della sessione.")
             return
+        if previous_key is not None and previous_key != self.service.session_key:
+            self._release_views()
 
         # Popola lista piloti
         self.populate_drivers()
-        self.status_var.set(f"Sessione caricata: {year} - {event} - {sess_name}")
+        status = f"Sessione caricata: {year} - {event} - {sess_name}"
+        self.status_var.set(f"{status}. {hint}" if hint else status)
         self.plot_circuit_layout()
+        self._draw_race_overview()
+
+    @timed("release_views")
+    def _release_views(self):
+        """Lascia i riferimenti della sessione precedente: tracce, artisti, miniature."""
+        import gc
+
+        self.current_telemetry = []
+        self.multi_telemetry = []
+        self.race_data = None
+        self._clear_axes()
+        self._configure_axes_labels()
+        self.fig.suptitle("")
+        self.canvas.draw_idle()
+        self._clear_circuit_hover_markers()
+        current = self.service.session_key
+        self.thumb_images.drop(lambda key: key[0] != current)
+        with span("gc.collect"):
+            gc.collect()
+
+    def _refresh_memory_indicator(self):
+        try:
+            usage = self.service.memory_usage()
+            text = (
+                f"Memoria: sessioni {format_bytes(usage['sessions'])} ({usage['n_sessions']}"
+            )
+            if usage["n_released"]:
+                text += f", {usage['n_released']} senza dati grezzi"
+            text += (
+                f") + tracce {format_bytes(usage['traces'])} ({usage['n_traces']} giri)"
+                f" / {format_bytes(usage['budget'])}"
+            )
+            self.memory_var.set(text)
+            over = usage["sessions"] + usage["traces"] > 0.9 * usage["budget"]
+            self.memory_label.configure(foreground="#ffb74d" if over else self.fg_color)
+        finally:
+            # un errore non deve fermare l'indicatore per sempre
+            self.root.after(2000, self._refresh_memory_indicator)
+
+    def _session_identifier(self) -> str:
+        # Le voci del menu hanno la forma "Q - Qualifying (in cache)"
+        return self.session_var.get().split(" - ")[0].strip()
+
+    # ------------------------------------------------------------------
+    # CALENDARIO E AUTOCOMPLETAMENTO
+    # ------------------------------------------------------------------
+    def on_year_changed(self, event=None):
+        try:
+            year = int(self.year_var.get().strip())
+        except ValueError:
+            return
+        if year == self.schedule_year:
+            return
+        self.schedule_year = year
+
+        events = self.schedule_cache.load(year)
+        if events is not None:
+            self._set_schedule(year, events)
+            return
+
+        self.schedule_events = None
+        self.status_var.set(f"Scaricamento calendario {year} in background...")
+
+        def worker():
+            # La cache FastF1 viene abilitata dal warm-up
+            self.warm_up_done.wait()
+            try:
+                with span("schedule.build", year=year):
+                    events = self.schedule_cache.get(year)
+            except Exception:
+                events = None
+            self._post_to_ui(lambda: self._set_schedule(year, events))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _set_schedule(self, year: int, events):
+        if year != self.schedule_year:
+            return  # risposta di un anno non più selezionato
+        self.schedule_events = events
+        if events is None:
+            self.event_combo.config(values=[])
+            self.status_var.set(f"Calendario {year} non disponibile: inserisci l'evento a mano.")
+            return
+        self.event_combo.config(values=[e["name"] for e in events])
+        self.status_var.set(f"Calendario {year}: {len(events)} eventi.")
+        self.on_event_chosen()
 
+    def on_event_typed(self, event=None):
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Tab", "Escape"):
+            return
+        if not self.schedule_events:
+            return
+        matches = match_events(self.schedule_events, self.event_var.get())
+        self.event_combo.config(values=[e["name"] for e in matches])
+        if matches and self.event_var.get().strip():
+            names = ", ".join(e["name"] for e in matches[:3])
+            self.status_var.set(f"Suggerimenti: {names} (freccia giù per scegliere)")
+
+    def on_event_chosen(self, event=None):
+        if not self.schedule_events:
+            return
+        text = self.event_var.get().strip()
+        if not text:
+            return
+        matches = exact_events(self.schedule_events, text)
+        if len(matches) > 1:
+            # stesso paese o località per più eventi: la scelta resta all'utente
+            self.event_combo.config(values=[e["name"] for e in matches])
+            self.status_var.set(
+                f"Più eventi per '{text}': " + ", ".join(e["name"] for e in matches) + " (freccia giù per scegliere)"
+            )
+            return
+        schedule_event = matches[0] if matches else None
+        if schedule_event is None and event is not None and event.type == tk.EventType.KeyPress:
+            # Invio: completa con il suggerimento migliore
+            matches = match_events(self.schedule_events, text, limit=1)
+            schedule_event = matches[0] if matches else None
+        if schedule_event is None:
+            return
+
+        self.event_var.set(schedule_event["name"])
+        self.event_combo.config(values=[e["name"] for e in self.schedule_events])
+
+        cached = cached_sessions(CACHE_DIR, self.schedule_year, schedule_event["name"])
+        entries = []
+        for session in schedule_event["sessions"]:
+            entry = f"{session['short']} - {session['name']}"
+            if session["name"] in cached:
+                entry += " (in cache)"
+            entries.append(entry)
+        self.session_combo.config(values=entries)
+
+        current = find_session(schedule_event, self._session_identifier())
+        if current is not None:
+            self.session_var.set(entries[schedule_event["sessions"].index(current)])
+        cached_desc = ", ".join(s["short"] for s in schedule_event["sessions"] if s["name"] in cached)
+        self.status_var.set(
+            f"{schedule_event['name']}: sessioni in cache {cached_desc}" if cached_desc
+            else f"{schedule_event['name']}: nessuna sessione in cache (il caricamento scaricherà i dati)."
+        )
+
+    def _item_name(self, item) -> str:
+        # Sigla del pilota, con anno/sessione se proviene da un'altra sessione
+        key = item.get("session_key")
+        if key is None or key == self.service.session_key:
+            return item["driver"]
+        return f"{item['driver']} {key[0]} {key[2]}"
+
+    @timed("populate_drivers")
     def populate_drivers(self):
         self.drivers_listbox.delete(0, tk.END)
         self.laps_listbox.delete(0, tk.END)
@@ -378,77 +862,84 @@ class F1TelemetryApp:
         # Svuota combobox confronto
         driver_names = []
 
-        if self.session is None:
+        if self.service.session is None:
             for slot in self.compare_slots:
                 slot["driver_combo"].config(values=driver_names)
             return
 
-        # session.drivers restituisce i numeri di gara
-        self.drivers = list(self.session.drivers)
+        try:
+            drivers = self.service.drivers()
+        except TelemetryError as e:
+            messagebox.showerror("Errore", str(e))
+            drivers = []
 
-        for idx, drv_num in enumerate(self.drivers):
-            drv_info = self.session.get_driver(drv_num)
-            abbrev = drv_info['Abbreviation']
-            surname = (
-                drv_info.get('Surname')
-                or drv_info.get('LastName')
-                or drv_info.get('FamilyName')
-                or drv_info.get('FullName')
-                or drv_info.get('BroadcastName')
-                or str(drv_num)
-            )
-            name = f"{surname} ({abbrev})"
-            display = f"{drv_num:>3} - {name}"
-            self.drivers_listbox.insert(tk.END, display)
-            self.driver_map[idx] = (drv_num, abbrev, name)
-            driver_names.append(f"{abbrev} - {surname}")
+        for idx, info in enumerate(drivers):
+            name = f"{info.surname} ({info.abbreviation})"
+            self.drivers_listbox.insert(tk.END, f"{info.number:>3} - {name}")
+            self.driver_map[idx] = info
+            driver_names.append(f"{info.abbreviation} - {info.surname}")
 
         for slot in self.compare_slots:
             slot["driver_combo"].config(values=driver_names)
 
+    @timed("on_driver_selected")
     def on_driver_selected(self, event=None):
-        if self.session is None:
+        if self.service.session is None:
             return
 
         selection = self.drivers_listbox.curselection()
         if not selection:
             return
 
-        idx = selection[0]
-        drv_num, abbrev, name = self.driver_map.get(idx, (None, None, None))
-        if abbrev is None:
+        info = self.driver_map.get(selection[0])
+        if info is None:
             return
+        abbrev = info.abbreviation
+        name = f"{info.surname} ({abbrev})"
 
         self.selected_driver_abbrev = abbrev
 
         # Prendi tutti i giri di quel pilota
         try:
-            laps = self.session.laps.pick_driver(abbrev)
-        except Exception as e:
-            messagebox.showerror("Errore", f"Impossibile recuperare i giri per {name}:\n{e}")
+            laps = self.service.laps(abbrev)
+        except TelemetryError as e:
+            messagebox.showerror("Errore", str(e))
             return
 
         self.laps = laps
 
         # Popola lista giri
         self.laps_listbox.delete(0, tk.END)
-        if laps is None or len(laps) == 0:
+        if not laps:
             self.laps_listbox.insert(tk.END, "Nessun giro disponibile")
             self.status_var.set(f"Nessun giro trovato per {name}.")
             return
 
-        for lap in laps.iterlaps():
-            lap_number = lap[1]['LapNumber']
-            lap_time = lap[1]['LapTime']
-            compound = lap[1].get('Compound', '')
-            text_lap_time = str(lap_time) if lap_time is not None else "N/A"
-            line = f"Lap {lap_number:>2} - {text_lap_time} - {compound}"
-            self.laps_listbox.insert(tk.END, line)
-
-        self.status_var.set(f"Selezionato pilota: {name}. Giri disponibili: {len(laps)}.")
-
+        flagged = 0
+        for idx, lap in enumerate(laps):
+            text_lap_time = str(lap.lap_time) if lap.lap_time is not None else "N/A"
+            text = f"Lap {lap.number:>2} - {text_lap_time} - {lap.compound}"
+            # giri non confrontabili con un giro pulito: bandiere, SC/VSC, pioggia
+            conditions = lap.conditions
+            if conditions is not None and (conditions.status or conditions.rain):
+                flagged += 1
+                marks = [conditions.status] if conditions.status else []
+                if conditions.rain:
+                    marks.append("pioggia")
+                text += f"  ⚑ {' '.join(marks)}"
+            self.laps_listbox.insert(tk.END, text)
+            if conditions is not None and conditions.status:
+                self.laps_listbox.itemconfig(idx, foreground="#fdd835")
+            elif conditions is not None and conditions.rain:
+                self.laps_listbox.itemconfig(idx, foreground="#4fc3f7")
+
+        flagged_desc = f" ({flagged} con bandiere/SC/VSC o pioggia)" if flagged else ""
+        self.status_var.set(f"Selezionato pilota: {name}. Giri disponibili: {len(laps)}{flagged_desc}.")
+        self._refresh_thumbnails()
+
+    @timed("on_lap_selected")
     def on_lap_selected(self, event=None):
-        if self.laps is None or self.session is None:
+        if self.laps is None or self.service.session is None:
             return
 
         selection = self.laps_listbox.curselection()
@@ -459,12 +950,7 @@ class F1TelemetryApp:
         if idx >= len(self.laps):
             return  # potrebbe essere la riga "Nessun giro disponibile"
 
-        try:
-            lap_row = self.laps.iloc[idx]
-            lap_number = int(lap_row['LapNumber'])
-        except Exception:
-            return
-
+        lap_number = self.laps[idx].number
         if self.selected_driver_abbrev:
             self.plot_single_driver_lap(self.selected_driver_abbrev, lap_number)
 
@@ -512,63 +998,35 @@ class F1TelemetryApp:
         self.circuit_canvas.draw_idle()
         self.status_var.set(message)
 
+    @timed("plot_circuit_layout")
     def plot_circuit_layout(self):
-        if self.session is None:
+        if self.service.session is None:
             self._show_circuit_unavailable("Carica una sessione per visualizzare il layout del circuito.")
             return
 
-        self.ax_circuit.clear()
-        self._apply_circuit_axes_style()
+        self.circuit_layout = None
 
         try:
-            drivers = list(self.session.drivers)
-            if not drivers:
-                raise ValueError("Nessun pilota disponibile nella sessione.")
-
-            base_driver = drivers[0]
-            laps = self.session.laps.pick_driver(base_driver)
-            if laps is None or len(laps) == 0:
-                raise ValueError("Nessun giro disponibile per il pilota selezionato per il layout.")
-
-            lap = laps.pick_fastest()
-            if lap is None:
-                raise ValueError("Impossibile individuare un giro valido per il layout.")
-
-            tel = lap.get_telemetry()
-            if tel is None or tel.empty:
-                raise ValueError("Telemetria del giro non disponibile.")
-
-            coord_candidates = [
-                ("X", "Y"),
-                ("PositionX", "PositionY"),
-                ("posX", "posY"),
-                ("PosX", "PosY"),
-            ]
-            x_col = y_col = None
-            for cand_x, cand_y in coord_candidates:
-                if cand_x in tel.columns and cand_y in tel.columns:
-                    x_col, y_col = cand_x, cand_y
-                    break
-
-            if x_col is None or y_col is None:
-                raise ValueError("Telemetria priva di coordinate X/Y per il layout.")
-
-            self.ax_circuit.plot(tel[x_col], tel[y_col], color=self.accent_color, linewidth=1.5)
-
-            event_name = None
-            try:
-                event_name = self.session.event.get("EventName") or self.session.event.get("OfficialEventName")
-            except Exception:
-                event_name = None
-            title = event_name or "Layout circuito"
-
-            self._finalize_circuit_axes(title)
-            self.circuit_canvas.draw_idle()
-            self.status_var.set("Layout circuito aggiornato.")
-        except Exception as exc:
+            layout = self.service.circuit_layout()
+        except TelemetryError as exc:
             self._show_circuit_unavailable(f"Layout circuito non disponibile: {exc}")
+            return
+        self._draw_circuit_layout(layout.x, layout.y, layout.title)
+        self.status_var.set("Layout circuito aggiornato.")
+
+    def _draw_circuit_layout(self, x, y, title: str | None):
+        self.ax_circuit.clear()
+        self._apply_circuit_axes_style()
+        self.circuit_hover_markers = []
+        self.event_artists = [a for a in self.event_artists if a.axes is not self.ax_circuit]
+        self.ax_circuit.plot(x, y, color=self.accent_color, linewidth=1.5)
+        self._finalize_circuit_axes(title)
+        self.circuit_canvas.draw_idle()
+        self.circuit_layout = (x, y, title)
 
     def _clear_axes(self):
+        self._remove_event_artists()
+        self._remove_status_artists()
         self.ax_speed.clear()
         self.ax_throttle.clear()
         self.ax_brake.clear()
@@ -576,6 +1034,7 @@ class F1TelemetryApp:
         self.ax_drs.clear()
         self.ax_gap.clear()
         self._apply_axes_style()
+        self.ghost = None
 
     def _configure_axes_labels(self):
         self.ax_speed.set_ylabel("Velocità\n[km/h]")
@@ -586,24 +1045,12 @@ class F1TelemetryApp:
         self.ax_gear.set_ylabel("Marcia")
         self.ax_drs.set_ylabel("DRS")
         self.ax_drs.set_xlabel("")
-        self.ax_gap.set_ylabel("Gap tempo\n[s]")
+        self.ax_gap.set_ylabel(self._gap_ylabel())
         self.ax_gap.set_xlabel("Distanza [m]")
         for ax in [self.ax_speed, self.ax_throttle, self.ax_brake, self.ax_gear, self.ax_drs, self.ax_gap]:
             ax.yaxis.label.set_color(self.fg_color)
         self.ax_gap.xaxis.label.set_color(self.fg_color)
 
-    def _get_coordinate_columns(self, telemetry):
-        coord_candidates = [
-            ("X", "Y"),
-            ("PositionX", "PositionY"),
-            ("posX", "posY"),
-            ("PosX", "PosY"),
-        ]
-        for cand_x, cand_y in coord_candidates:
-            if cand_x in telemetry.columns and cand_y in telemetry.columns:
-                return cand_x, cand_y
-        return None, None
-
     def _clear_circuit_hover_markers(self):
         if not self.circuit_hover_markers:
             return False
@@ -615,36 +1062,53 @@ class F1TelemetryApp:
         self.circuit_hover_markers = []
         return True
 
-    def _get_fastest_lap_number(self, laps):
-        if laps is None or len(laps) == 0:
-            return None
-        try:
-            fastest_lap = laps.pick_fastest()
-            if fastest_lap is not None:
-                return int(fastest_lap['LapNumber'])
-        except Exception:
-            pass
+    def _read_filter_config(self) -> dict:
+        from f1_filters import validate_config
+
+        return validate_config(
+            {
+                "grid": FILTER_GRIDS.get(self.filter_grid_var.get(), "raw"),
+                "step": self.filter_step_var.get().strip().replace(",", "."),
+                "filter": FILTER_KINDS.get(self.filter_kind_var.get(), "none"),
+                "window": self.filter_window_var.get().strip(),
+                "order": self.filter_order_var.get().strip(),
+            }
+        )
+
+    def on_filter_grid_changed(self, event=None):
+        # metri e secondi non condividono un passo sensato: si riparte dal default della griglia
+        self.filter_step_var.set(default_filter_step(self.filter_grid_var.get()))
+
+    def _get_processed_telemetry(self, driver_abbrev: str, lap_number: int, session_key=None):
         try:
-            filtered = laps.dropna(subset=['LapTime'])
-            if not filtered.empty:
-                lap_num = int(filtered.loc[filtered['LapTime'].idxmin()]['LapNumber'])
-                return lap_num
-        except Exception:
+            return self.service.processed_telemetry(driver_abbrev, lap_number, session_key)
+        except TelemetryError as e:
+            messagebox.showerror("Errore", str(e))
             return None
-        return None
 
-    def _get_lap_telemetry(self, driver_abbrev: str, lap_number: int):
+    def apply_filter_config(self):
+        if self._defer_until_ready(self.apply_filter_config):
+            return
         try:
-            laps = self.session.laps.pick_driver(driver_abbrev)
-            lap = laps.pick_lap(lap_number)
-            tel = lap.get_telemetry().add_distance()
-            return tel
-        except Exception as e:
-            messagebox.showerror(
-                "Errore",
-                f"Impossibile ottenere la telemetria di {driver_abbrev} giro {lap_number}:\n{e}",
-            )
-            return None
+            self.service.set_filter(self._read_filter_config())
+        except ValueError as e:
+            messagebox.showerror("Errore", f"Configurazione filtro non valida:\n{e}")
+            return
+
+        selections = [
+            {"driver": item["driver"], "lap": item["lap"], "color": item["color"], "session_key": item["session_key"]}
+            for item in self.current_telemetry
+        ]
+        if len(selections) > 1:
+            self.plot_multi_driver_telemetry(selections)
+        elif selections:
+            sel = selections[0]
+            self.plot_single_driver_lap(sel["driver"], sel["lap"], sel["session_key"])
+        self.status_var.set("Elaborazione segnale aggiornata.")
+
+    def _tight_layout(self):
+        with span("tight_layout"):
+            self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
 
     def _plot_telemetry_series(self, driver_abbrev: str, lap_number: int, telemetry, color: str, add_label: bool):
         x = telemetry['Distance']
@@ -657,91 +1121,62 @@ class F1TelemetryApp:
         self.ax_drs.step(x, telemetry['DRS'], where='post', color=color)
         return speed_line
 
-    def _plot_time_gap(self):
-        if len(self.multi_telemetry) < 2:
-            self.ax_gap.clear()
-            self._apply_axes_style()
-            self.ax_gap.set_ylabel("Gap tempo\n[s]")
-            self.ax_gap.set_xlabel("Distanza [m]")
-            self.ax_gap.text(
-                0.5,
-                0.5,
-                "Gap disponibile solo con 2 o 3 piloti",
-                ha="center",
-                va="center",
-                transform=self.ax_gap.transAxes,
-                color=self.fg_color,
-            )
-            self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-            self.canvas.draw_idle()
-            return
+    def _gap_ylabel(self) -> str:
+        return "Distacco\n[m]" if self.gap_mode_var.get() == "time" else "Gap tempo\n[s]"
+
+    def _gap_message(self, text: str):
+        self.ax_gap.text(
+            0.5,
+            0.5,
+            text,
+            ha="center",
+            va="center",
+            transform=self.ax_gap.transAxes,
+            color=self.fg_color,
+        )
+        self._tight_layout()
+        self.canvas.draw_idle()
 
+    @timed("_plot_time_gap")
+    def _plot_time_gap(self):
+        self.ghost = None
         self.ax_gap.clear()
         self._apply_axes_style()
-        self.ax_gap.set_ylabel("Gap tempo\n[s]")
+        self.ax_gap.set_ylabel(self._gap_ylabel())
         self.ax_gap.set_xlabel("Distanza [m]")
+        if len(self.multi_telemetry) < 2:
+            self._gap_message("Gap disponibile solo con 2 o 3 piloti")
+            return
 
-        telemetry_entries = []
-        for item in self.multi_telemetry:
-            tel = item.get("telemetry")
-            if tel is None or "Distance" not in tel.columns:
-                continue
-
-            if "Time" in tel.columns:
-                time_series = tel["Time"]
-            elif "SessionTime" in tel.columns:
-                time_series = tel["SessionTime"]
+        # liste parallele, non un dict: lo stesso giro può essere in due slot
+        refs = [
+            self.service.lap_ref(item["driver"], item["lap"], item.get("session_key"))
+            for item in self.multi_telemetry
+        ]
+        try:
+            if self.gap_mode_var.get() == "time":
+                # a pari tempo trascorso: x = distanza del riferimento, y = metri di distacco
+                alignment = self.service.time_alignment(refs)
+                distance, gaps, kept = alignment.distance[0], list(alignment.gaps), alignment.indices
             else:
-                continue
-
-            try:
-                time_seconds = (time_series - time_series.iloc[0]).dt.total_seconds()
-            except Exception:
-                try:
-                    time_seconds = time_series - time_series.iloc[0]
-                except Exception:
-                    continue
-
-            telemetry_entries.append(
-                {
-                    "driver": item.get("driver"),
-                    "color": item.get("color", self.accent_color),
-                    "distance": tel["Distance"].values,
-                    "time": np.asarray(time_seconds, dtype=float),
-                }
-            )
-
-        if len(telemetry_entries) < 2:
-            self.ax_gap.text(
-                0.5,
-                0.5,
-                "Gap disponibile solo con dati completi",
-                ha="center",
-                va="center",
-                transform=self.ax_gap.transAxes,
-                color=self.fg_color,
-            )
-            self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-            self.canvas.draw_idle()
+                result = self.service.time_gaps(refs)
+                distance, gaps, kept = result.distance, result.gaps, result.indices
+        except TelemetryError as e:
+            self._gap_message(str(e))
             return
 
-        d_max = min(np.max(entry["distance"]) for entry in telemetry_entries)
-        dist_common = np.linspace(0, d_max, num=1000)
+        # i giri senza dati vengono saltati dal servizio
+        items = [self.multi_telemetry[i] for i in kept]
+        if self.gap_mode_var.get() == "time":
+            self.ghost = (alignment, items)
 
-        # Usa il primo pilota selezionato come riferimento per il calcolo del gap
-        reference_entry = telemetry_entries[0]
-        t_ref = np.interp(dist_common, reference_entry["distance"], reference_entry["time"])
-
-        for entry in telemetry_entries:
-            t_interp = np.interp(dist_common, entry["distance"], entry["time"])
-            gap = t_interp - t_ref
-
-            if entry is reference_entry:
-                label = f"{entry['driver']} (riferimento)"
+        for i, (item, gap) in enumerate(zip(items, gaps)):
+            if i == 0:
+                label = f"{self._item_name(item)} (riferimento)"
             else:
-                label = f"{entry['driver']} vs ref"
+                label = f"{self._item_name(item)} vs ref"
 
-            self.ax_gap.plot(dist_common, gap, color=entry["color"], label=label)
+            self.ax_gap.plot(distance, gap, color=item.get("color", self.accent_color), label=label)
 
         self.ax_gap.axhline(0, color=self.grid_color, linestyle="--", linewidth=1)
 
@@ -754,12 +1189,24 @@ class F1TelemetryApp:
         for text in gap_legend.get_texts():
             text.set_color(self.fg_color)
 
-        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self._tight_layout()
         self.canvas.draw_idle()
 
+    def on_gap_mode_changed(self):
+        if not self.ready:
+            return
+        self._clear_circuit_hover_markers()
+        self.circuit_canvas.draw_idle()
+        if len(self.multi_telemetry) < 2:
+            # nessun confronto a schermo: cambia solo l'etichetta del pannello
+            self.ax_gap.set_ylabel(self._gap_ylabel())
+            self.canvas.draw_idle()
+            return
+        self._plot_time_gap()
+
     def _highlight_lap_in_list(self, lap_number: int):
         try:
-            laps_numbers = list(self.laps['LapNumber']) if self.laps is not None else []
+            laps_numbers = [lap.number for lap in self.laps] if self.laps is not None else []
             if lap_number in laps_numbers:
                 idx = laps_numbers.index(lap_number)
                 self.laps_listbox.selection_clear(0, tk.END)
@@ -768,24 +1215,28 @@ class F1TelemetryApp:
         except Exception:
             pass
 
-    def plot_single_driver_lap(self, driver_abbrev: str, lap_number: int):
+    @timed("plot_single_driver_lap")
+    def plot_single_driver_lap(self, driver_abbrev: str, lap_number: int, session_key=None):
         self.current_telemetry = []
-        telemetry = self._get_lap_telemetry(driver_abbrev, lap_number)
+        telemetry = self._get_processed_telemetry(driver_abbrev, lap_number, session_key)
         if telemetry is None:
             return
+        # vista a giro singolo: il confronto precedente non vale più per gap e fantasma
+        self.multi_telemetry = []
 
-        self.current_telemetry.append(
-            {
-                "driver": driver_abbrev,
-                "lap": lap_number,
-                "color": self.accent_color,
-                "telemetry": telemetry,
-            }
-        )
+        item = {
+            "driver": driver_abbrev,
+            "lap": lap_number,
+            "color": self.accent_color,
+            "telemetry": telemetry,
+            "session_key": session_key or self.service.session_key,
+        }
+        self.current_telemetry.append(item)
+        name = self._item_name(item)
 
         self._clear_axes()
         self._configure_axes_labels()
-        self._plot_telemetry_series(driver_abbrev, lap_number, telemetry, self.accent_color, add_label=True)
+        self._plot_telemetry_series(name, lap_number, telemetry, self.accent_color, add_label=True)
         self.ax_speed.legend(
             loc="upper right",
             facecolor=self.panel_color,
@@ -794,23 +1245,31 @@ class F1TelemetryApp:
         )
 
         self.fig.suptitle(
-            f"{driver_abbrev} - Giro {lap_number} - Telemetria",
+            f"{name} - Giro {lap_number} - Telemetria",
             fontsize=12,
             color=self.fg_color,
         )
-        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self._annotate_lap_events()
+        conditions_note = self._shade_track_status()
+        self._tight_layout()
         self.canvas.draw()
         self.base_xlim = self.ax_speed.get_xlim()
 
+        self._refresh_corner_table()
         self._highlight_lap_in_list(lap_number)
-        self.status_var.set(f"Mostrata telemetria {driver_abbrev} - giro {lap_number}.")
+        self._highlight_thumbnail((item["session_key"], driver_abbrev), lap_number)
+        self.status_var.set(f"Mostrata telemetria {name} - giro {lap_number}. {conditions_note}".strip())
 
+    @timed("show_fastest_lap")
     def show_fastest_lap(self):
-        if self.session is None or self.laps is None or not self.selected_driver_abbrev:
+        if self.service.session is None or self.laps is None or not self.selected_driver_abbrev:
             messagebox.showinfo("Info", "Seleziona prima un pilota.")
             return
 
-        lap_number = self._get_fastest_lap_number(self.laps)
+        try:
+            lap_number = self.service.fastest_lap(self.selected_driver_abbrev)
+        except TelemetryError:
+            lap_number = None
         if lap_number is None:
             messagebox.showwarning("Nessun dato", "Impossibile trovare il giro più veloce per il pilota selezionato.")
             return
@@ -820,8 +1279,9 @@ class F1TelemetryApp:
             f"Mostrato il giro più veloce ({lap_number}) per {self.selected_driver_abbrev}."
         )
 
+    @timed("compare_telemetry")
     def compare_telemetry(self):
-        if self.session is None:
+        if self.service.session is None:
             messagebox.showinfo("Info", "Carica prima una sessione.")
             return
 
@@ -830,13 +1290,29 @@ class F1TelemetryApp:
             driver_label = slot["driver_var"].get().strip()
             if not driver_label:
                 continue
-            abbrev = driver_label.split(" - ")[0]
-            laps = self.session.laps.pick_driver(abbrev)
-            lap_number = None
+            abbrev = driver_label.split(" - ")[0].strip().upper()
 
-            if slot["fastest_var"].get():
-                lap_number = self._get_fastest_lap_number(laps)
-            else:
+            try:
+                session_ref = parse_session_ref(slot["session_ref_var"].get())
+            except ValueError as e:
+                messagebox.showwarning("Input non valido", f"Sessione del pilota {abbrev}: {e}")
+                return
+
+            try:
+                if session_ref is None:
+                    session_key = self.service.session_key
+                else:
+                    self.status_var.set(f"Caricamento sessione {session_ref[0]} {session_ref[1]} {session_ref[2]}...")
+                    self.root.update_idletasks()
+                    session_key, _ = self.service.get_session(*session_ref)
+                lap_number = None
+                if slot["fastest_var"].get():
+                    lap_number = self.service.fastest_lap(abbrev, session_key)
+            except TelemetryError as e:
+                messagebox.showerror("Errore", f"Impossibile caricare i giri di {abbrev}:\n{e}")
+                return
+
+            if not slot["fastest_var"].get():
                 lap_val = slot["lap_var"].get().strip()
                 if lap_val:
                     try:
@@ -860,6 +1336,7 @@ class F1TelemetryApp:
                     "driver": abbrev,
                     "lap": lap_number,
                     "color": slot["color"],
+                    "session_key": session_key,
                 }
             )
 
@@ -869,7 +1346,7 @@ class F1TelemetryApp:
 
         if len(selections) == 1:
             sel = selections[0]
-            self.plot_single_driver_lap(sel["driver"], sel["lap"])
+            self.plot_single_driver_lap(sel["driver"], sel["lap"], sel["session_key"])
             self.status_var.set(
                 f"Confronto non disponibile con un solo pilota. Mostrato {sel['driver']} giro {sel['lap']}."
             )
@@ -877,6 +1354,7 @@ class F1TelemetryApp:
 
         self.plot_multi_driver_telemetry(selections)
 
+    @timed("plot_multi_driver_telemetry")
     def plot_multi_driver_telemetry(self, selections):
         self.current_telemetry = []
         self.multi_telemetry = []
@@ -887,28 +1365,23 @@ class F1TelemetryApp:
         legend_labels = []
 
         for sel in selections[:3]:
-            telemetry = self._get_lap_telemetry(sel["driver"], sel["lap"])
+            session_key = sel.get("session_key") or self.service.session_key
+            telemetry = self._get_processed_telemetry(sel["driver"], sel["lap"], session_key)
             if telemetry is None:
                 continue
-            self.current_telemetry.append(
-                {
-                    "driver": sel["driver"],
-                    "lap": sel["lap"],
-                    "color": sel["color"],
-                    "telemetry": telemetry,
-                }
-            )
-            self.multi_telemetry.append(
-                {
-                    "driver": sel["driver"],
-                    "lap": sel["lap"],
-                    "color": sel["color"],
-                    "telemetry": telemetry,
-                }
-            )
-            line = self._plot_telemetry_series(sel["driver"], sel["lap"], telemetry, sel["color"], add_label=True)
+            item = {
+                "driver": sel["driver"],
+                "lap": sel["lap"],
+                "color": sel["color"],
+                "telemetry": telemetry,
+                "session_key": session_key,
+            }
+            self.current_telemetry.append(item)
+            self.multi_telemetry.append(dict(item))
+            name = self._item_name(item)
+            line = self._plot_telemetry_series(name, sel["lap"], telemetry, sel["color"], add_label=True)
             legend_lines.append(line)
-            legend_labels.append(f"{sel['driver']} Lap {sel['lap']}")
+            legend_labels.append(f"{name} Lap {sel['lap']}")
 
         if legend_lines:
             leg = self.ax_speed.legend(
@@ -922,19 +1395,22 @@ class F1TelemetryApp:
             for text in leg.get_texts():
                 text.set_color(self.fg_color)
 
-        title_parts = [f"{sel['driver']} Lap {sel['lap']}" for sel in selections[:3]]
+        title_parts = [f"{self._item_name(sel)} Lap {sel['lap']}" for sel in selections[:3]]
         self.fig.suptitle(
             "Confronto telemetria – " + " vs ".join(title_parts),
             fontsize=12,
             color=self.fg_color,
         )
         self._plot_time_gap()
-        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self._annotate_lap_events()
+        conditions_note = self._shade_track_status()
+        self._tight_layout()
         self.canvas.draw()
         self.base_xlim = self.ax_speed.get_xlim()
+        self._refresh_corner_table()
 
         drivers_desc = ", ".join(title_parts)
-        self.status_var.set(f"Confronto completato: {drivers_desc}.")
+        self.status_var.set(f"Confronto completato: {drivers_desc}. {conditions_note}".strip())
 
     def on_scroll(self, event):
         if event.inaxes is None or event.inaxes is not self.ax_speed:
@@ -978,6 +1454,8 @@ class F1TelemetryApp:
         if event.xdata is None or not self.current_telemetry:
             return
 
+        from f1_align import nearest_row
+
         x_hover = event.xdata
         hover_lines = []
         removed_markers = self._clear_circuit_hover_markers()
@@ -987,16 +1465,15 @@ class F1TelemetryApp:
             if tel is None or "Distance" not in tel:
                 continue
 
-            idx = (tel["Distance"] - x_hover).abs().idxmin()
-            row = tel.loc[idx]
+            row = nearest_row(tel, x_hover)
 
             distance = row.get("Distance")
             speed = row.get("Speed")
             lap_num = item.get("lap")
-            driver = item.get("driver")
+            driver = self._item_name(item)
             color = item.get("color", self.accent_color)
 
-            x_col, y_col = self._get_coordinate_columns(tel)
+            x_col, y_col = coordinate_columns(tel)
             if x_col and y_col and x_col in row and y_col in row:
                 x_pos = row.get(x_col)
                 y_pos = row.get(y_col)
@@ -1014,6 +1491,9 @@ class F1TelemetryApp:
                 hover_line = f"{driver} Lap {lap_num}: dati non disponibili"
             hover_lines.append(hover_line)
 
+        if self.ghost is not None:
+            hover_lines.extend(self._draw_ghost_markers(x_hover))
+
         if self.circuit_hover_markers or removed_markers:
             self.circuit_canvas.draw_idle()
 
@@ -1024,12 +1504,40 @@ class F1TelemetryApp:
                 "Passa il mouse sul grafico della velocità per vedere i valori."
             )
 
+    def _draw_ghost_markers(self, reference_distance: float) -> list:
+        """Marker vuoti sul circuito: dove sono gli altri giri quando il riferimento è a ``reference_distance``."""
+        import numpy as np
+
+        from f1_align import ghost_distances
+
+        alignment, items = self.ghost
+        elapsed, distances = ghost_distances(alignment.time, alignment.distance, reference_distance)
+        lines = []
+        for item, distance in zip(items[1:], distances[1:]):
+            tel = item.get("telemetry")
+            color = item.get("color", self.accent_color)
+            x_col, y_col = coordinate_columns(tel)
+            if x_col is not None:
+                track = tel["Distance"].to_numpy(dtype=float)
+                x_pos = np.interp(distance, track, tel[x_col].to_numpy(dtype=float))
+                y_pos = np.interp(distance, track, tel[y_col].to_numpy(dtype=float))
+                marker = self.ax_circuit.scatter(
+                    x_pos, y_pos, s=70, facecolors="none", edgecolors=color, linewidths=1.5, zorder=6
+                )
+                self.circuit_hover_markers.append(marker)
+            lines.append(
+                f"Fantasma {self._item_name(item)} a {elapsed:.2f} s: {distance - distances[0]:+.0f} m dal riferimento"
+            )
+        return lines
+
     def on_speed_click(self, event):
         if event.inaxes is None or event.inaxes is not self.ax_speed:
             return
         if event.xdata is None or not self.current_telemetry:
             return
 
+        from f1_align import nearest_row
+
         x_click = event.xdata
         lines = []
 
@@ -1037,9 +1545,7 @@ class F1TelemetryApp:
             tel = item.get("telemetry")
             if tel is None or "Distance" not in tel:
                 continue
-            distances = tel["Distance"]
-            idx = (distances - x_click).abs().idxmin()
-            row = tel.loc[idx]
+            row = nearest_row(tel, x_click)
 
             distance = row.get("Distance")
             speed = row.get("Speed")
@@ -1054,7 +1560,7 @@ class F1TelemetryApp:
                 gear_display = int(gear)
 
             line = (
-                f"{item['driver']} Lap {item['lap']}: "
+                f"{self._item_name(item)} Lap {item['lap']}: "
                 f"dist={distance:.1f} m, "
                 f"speed={speed:.1f} km/h, "
                 f"throttle={throttle:.1f} %, "
@@ -1062,6 +1568,9 @@ class F1TelemetryApp:
                 f"gear={gear_display}, "
                 f"DRS={drs}"
             )
+            accel = row.get("LongAccel")
+            if accel is not None and not math.isnan(accel):
+                line += f", acc. long.={accel:+.2f} g"
             lines.append(line)
 
         if lines:
@@ -1070,10 +1579,1182 @@ class F1TelemetryApp:
         else:
             self.point_detail_var.set("Clicca sul grafico della velocità per vedere il dettaglio.")
 
+    # ------------------------------------------------------------------
+    # FRENATE, APICI E CAMBI MARCIA
+    # ------------------------------------------------------------------
+    def _get_lap_events(self, item):
+        try:
+            return self.service.lap_events(item["driver"], item["lap"], item.get("session_key"))
+        except TelemetryError:
+            return None
+
+    def _remove_event_artists(self):
+        removed = bool(self.event_artists)
+        for artist in self.event_artists:
+            try:
+                artist.remove()
+            except Exception:
+                pass
+        self.event_artists = []
+        return removed
+
+    def _annotate_lap_events(self):
+        self._remove_event_artists()
+        if not self.show_events_var.get() or not self.current_telemetry:
+            return
+
+        marker_style = {"s": 28, "zorder": 6, "edgecolors": self.bg_color, "linewidths": 0.6}
+        n_corners = 0
+        for i, item in enumerate(self.current_telemetry):
+            events = self._get_lap_events(item)
+            if events is None:
+                continue
+            color = item.get("color", self.accent_color)
+            brake, apex, pickup = events["brake"], events["apex"], events["pickup"]
+            self.event_artists += [
+                self.ax_speed.scatter(brake["distance"], brake["speed"], marker="v", color=color, **marker_style),
+                self.ax_speed.scatter(apex["distance"], apex["speed"], marker="o", color=color, **marker_style),
+                self.ax_speed.scatter(pickup["distance"], pickup["speed"], marker="^", color=color, **marker_style),
+            ]
+            for name, marker in (("upshift", "^"), ("downshift", "v")):
+                shifts = events[name]
+                if len(shifts["idx"]):
+                    self.event_artists.append(
+                        self.ax_gear.scatter(shifts["distance"], shifts["gear"], marker=marker, s=12, color=color, zorder=6)
+                    )
+
+            if i == 0:
+                # Numeri di curva del riferimento su velocità e mappa
+                n_corners = len(apex["idx"])
+                for k in range(n_corners):
+                    self.event_artists.append(
+                        self.ax_speed.annotate(
+                            str(k + 1),
+                            (apex["distance"][k], apex["speed"][k]),
+                            textcoords="offset points",
+                            xytext=(0, -11),
+                            ha="center",
+                            fontsize=7,
+                            color=self.fg_color,
+                        )
+                    )
+                same_track = (item.get("session_key") or self.service.session_key) == self.service.session_key
+                if self.circuit_layout is not None and same_track and "x" in apex:
+                    self.event_artists.append(
+                        self.ax_circuit.scatter(apex["x"], apex["y"], marker="o", color=color, **marker_style)
+                    )
+                    for k in range(n_corners):
+                        self.event_artists.append(
+                            self.ax_circuit.annotate(
+                                str(k + 1),
+                                (apex["x"][k], apex["y"][k]),
+                                textcoords="offset points",
+                                xytext=(4, 4),
+                                fontsize=7,
+                                color=self.fg_color,
+                            )
+                        )
+        self.circuit_canvas.draw_idle()
+        self.point_detail_var.set(
+            f"{n_corners} curve rilevate: ▼ inizio frenata, ● apice (v minima), ▲ ripresa del gas."
+        )
+
+    def on_toggle_events(self):
+        if not self.ready:
+            return
+        self._annotate_lap_events()
+        self.canvas.draw_idle()
+        self.circuit_canvas.draw_idle()
+
+    def _remove_status_artists(self):
+        for artist in self.status_artists:
+            try:
+                artist.remove()
+            except Exception:
+                pass
+        self.status_artists = []
+
+    @timed("track_status_overlay")
+    def _shade_track_status(self) -> str:
+        """Ombreggia i tratti sotto bandiera/SC/VSC; restituisce le condizioni dei giri."""
+        from f1_align import telemetry_time_seconds
+        from f1_conditions import STATUS_COLORS, STATUS_SHORT, describe
+        import numpy as np
+
+        self._remove_status_artists()
+        notes = []
+        axes = [self.ax_speed, self.ax_throttle, self.ax_brake, self.ax_gear, self.ax_drs, self.ax_gap]
+        for item in self.current_telemetry:
+            try:
+                conditions = self.service.lap_conditions(item["driver"], item["lap"], item.get("session_key"))
+            except TelemetryError:
+                conditions = None  # tracce offline: niente dati di sessione
+            if conditions is None:
+                continue
+            summary = describe(conditions)
+            if summary:
+                notes.append(f"{self._item_name(item)} L{item['lap']}: {summary}")
+            if not self.show_status_var.get() or not conditions.spans:
+                continue
+
+            # tempi del giro -> distanza sulla traccia mostrata
+            tel = item["telemetry"]
+            time_s = telemetry_time_seconds(tel)
+            if time_s is None or "Distance" not in tel.columns:
+                continue
+            distance = tel["Distance"].to_numpy(dtype=float)
+            for start, end, code in conditions.spans:
+                d0, d1 = np.interp([start, end], time_s, distance)
+                color = STATUS_COLORS.get(code, "#fdd835")
+                for ax in axes:
+                    self.status_artists.append(ax.axvspan(d0, d1, color=color, alpha=0.15, linewidth=0, zorder=0))
+                label = STATUS_SHORT.get(code, code)
+                if len(self.current_telemetry) > 1:
+                    label = f"{label} {self._item_name(item)}"
+                self.status_artists.append(
+                    self.ax_speed.text(
+                        d0, 0.98, label, transform=self.ax_speed.get_xaxis_transform(),
+                        ha="left", va="top", fontsize=7, color=color,
+                    )
+                )
+        return "Condizioni: " + "; ".join(notes) + "." if notes else ""
+
+    def on_toggle_track_status(self):
+        if not self.ready:
+            return
+        note = self._shade_track_status()
+        self.canvas.draw_idle()
+        if note:
+            self.status_var.set(note)
+
+    def open_corner_table(self):
+        if self.corner_window is not None:
+            self.corner_window.lift()
+            self._refresh_corner_table()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("Differenze curva per curva")
+        win.geometry("760x420")
+        win.configure(background=self.bg_color)
+        win.protocol("WM_DELETE_WINDOW", self._close_corner_table)
+        win.rowconfigure(0, weight=1)
+        win.columnconfigure(0, weight=1)
+        self.corner_window = win
+
+        self.corner_tree = ttk.Treeview(win, show="headings")
+        self.corner_tree.grid(row=0, column=0, sticky="nsew")
+        self.corner_status_var = tk.StringVar()
+        ttk.Label(win, textvariable=self.corner_status_var, anchor="w", padding=(5, 2)).grid(
+            row=1, column=0, sticky="ew"
+        )
+        self._refresh_corner_table()
+
+    def _close_corner_table(self):
+        if self.corner_window is not None:
+            self.corner_window.destroy()
+        self.corner_window = None
+
+    @timed("corner_table")
+    def _refresh_corner_table(self):
+        if self.corner_window is None:
+            return
+        from f1_events import compare_corners
+
+        tree = self.corner_tree
+        tree.delete(*tree.get_children())
+        items = [item for item in self.current_telemetry if self._get_lap_events(item) is not None]
+        if not items:
+            tree.config(columns=())
+            self.corner_status_var.set("Visualizza uno o più giri per vedere le curve rilevate.")
+            return
+
+        columns = ["corner", "dist", "v_ref"]
+        headings = ["Curva", "Apice [m]", f"v apice {self._item_name(items[0])}"]
+        for n, item in enumerate(items[1:], start=1):
+            name = self._item_name(item)
+            columns += [f"brake{n}", f"v{n}", f"pickup{n}"]
+            headings += [f"Δ frenata {name} [m]", f"Δ v apice {name}", f"Δ gas {name} [m]"]
+        tree.config(columns=columns)
+        for col, heading in zip(columns, headings):
+            tree.heading(col, text=heading)
+            tree.column(col, width=60 if col in ("corner", "dist") else 110, anchor="e")
+
+        rows = compare_corners([self._get_lap_events(item) for item in items])
+        for row in rows:
+            values = [row["corner"], f"{row['distance']:.0f}", f"{row['laps'][0]['apex_speed']:.1f}"]
+            for lap in row["laps"][1:]:
+                if lap is None:
+                    values += ["-", "-", "-"]
+                else:
+                    values += [
+                        f"{lap['brake_delta_m']:+.0f}",
+                        f"{lap['apex_speed_delta']:+.1f}",
+                        f"{lap['pickup_delta_m']:+.0f}",
+                    ]
+            tree.insert("", tk.END, values=values)
+
+        ref = f"{self._item_name(items[0])} giro {items[0]['lap']}"
+        self.corner_status_var.set(
+            f"{len(rows)} curve del riferimento ({ref}). Δ positivo = più avanti sulla pista del riferimento."
+        )
+
+    # ------------------------------------------------------------------
+    # MINIATURE GIRI
+    # ------------------------------------------------------------------
+    def open_thumbnail_strip(self):
+        if self._defer_until_ready(self.open_thumbnail_strip):
+            return
+        if self.thumb_window is not None:
+            self.thumb_window.lift()
+            self._refresh_thumbnails()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("Miniature giri")
+        win.geometry("600x640")
+        win.configure(background=self.bg_color)
+        win.protocol("WM_DELETE_WINDOW", self._close_thumbnail_strip)
+        win.rowconfigure(0, weight=1)
+        win.columnconfigure(0, weight=1)
+        self.thumb_window = win
+
+        canvas = tk.Canvas(win, background=self.bg_color, highlightthickness=0)
+        canvas.grid(row=0, column=0, sticky="nsew")
+        scroll = ttk.Scrollbar(win, orient="vertical", command=canvas.yview)
+        scroll.grid(row=0, column=1, sticky="ns")
+        canvas.config(yscrollcommand=scroll.set)
+        canvas.bind("<Button-1>", self.on_thumbnail_click)
+        canvas.bind("<MouseWheel>", lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        canvas.bind("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
+        canvas.bind("<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
+        self.thumb_canvas = canvas
+
+        self.thumb_status_var = tk.StringVar()
+        ttk.Label(win, textvariable=self.thumb_status_var, anchor="w", padding=(5, 2)).grid(
+            row=1, column=0, columnspan=2, sticky="ew"
+        )
+        self._refresh_thumbnails()
+
+    def _close_thumbnail_strip(self):
+        if self.thumb_window is not None:
+            self.thumb_window.destroy()
+        self.thumb_window = None
+        self.thumb_canvas = None
+        self.thumb_key = None
+
+    def _thumbnail_color(self, lap, fastest) -> str:
+        conditions = lap.conditions
+        if lap.number == fastest:
+            return self.accent_color
+        if conditions is not None and conditions.status:
+            return "#fdd835"
+        if conditions is not None and conditions.rain:
+            return "#4fc3f7"
+        return "#9e9e9e"
+
+    def _refresh_thumbnails(self):
+        if self.thumb_window is None:
+            return
+        driver = self.selected_driver_abbrev
+        if driver is None or not self.laps:
+            self.thumb_canvas.delete("all")
+            self.thumb_key = None
+            self.thumb_status_var.set("Seleziona un pilota per vedere le miniature dei suoi giri.")
+            return
+
+        key = (self.service.session_key, driver)
+        if key in self.thumb_images:
+            self._draw_thumbnails(key)
+            return
+        self.thumb_canvas.delete("all")
+        self.thumb_key = key
+        self.thumb_status_var.set(f"Generazione miniature di {driver}...")
+        if key in self.thumb_pending:
+            return
+        self.thumb_pending.add(key)
+
+        laps = list(self.laps)
+        try:
+            fastest = self.service.fastest_lap(driver)
+        except TelemetryError:
+            fastest = None
+        colors = {lap.number: self._thumbnail_color(lap, fastest) for lap in laps}
+
+        def worker():
+            # un solo passaggio per tutti i giri, fuori dal thread della GUI;
+            # il risultato va sempre consegnato, altrimenti thumb_pending blocca il pilota
+            result = (None, None, "Miniature non disponibili")
+            try:
+                from f1_thumbnails import render_sparklines
+
+                with span("thumbnails.render", driver=driver):
+                    profiles = self.service.lap_profiles(driver, key[0])
+                    images = render_sparklines(
+                        profiles.speed, [colors.get(int(n), "#9e9e9e") for n in profiles.lap_numbers]
+                    )
+                result = (profiles.lap_numbers, images, None)
+            except (TelemetryError, ValueError) as e:
+                result = (None, None, e)
+            except Exception as e:
+                result = (None, None, f"Miniature non disponibili: {e}")
+            finally:
+                self._post_to_ui(lambda: self._store_thumbnails(key, laps, *result))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    @timed("thumbnails.store")
+    def _store_thumbnails(self, key, laps, lap_numbers, images, error):
+        self.thumb_pending.discard(key)
+        if error is not None:
+            if self.thumb_window is not None and self.thumb_key == key:
+                self.thumb_status_var.set(str(error))
+            return
+        info = {lap.number: lap for lap in laps}
+        self.thumb_images[key] = [
+            (int(number), tk.PhotoImage(master=self.root, data=ppm, format="PPM"), info.get(int(number)))
+            for number, ppm in zip(lap_numbers, images)
+        ]
+        if self.thumb_window is not None and self.thumb_key == key:
+            self._draw_thumbnails(key)
+
+    def _draw_thumbnails(self, key):
+        from f1_thumbnails import THUMB_SIZE
+
+        canvas = self.thumb_canvas
+        canvas.delete("all")
+        self.thumb_key = key
+        width, height = THUMB_SIZE
+        cell_w, cell_h = width + 24, height + 24
+        thumbs = self.thumb_images[key]
+        for i, (number, image, lap) in enumerate(thumbs):
+            x = 10 + (i % THUMB_COLUMNS) * cell_w
+            y = 8 + (i // THUMB_COLUMNS) * cell_h
+            tag = f"lap{number}"
+            canvas.create_image(x, y, image=image, anchor="nw", tags=("thumb", tag))
+            text = f"L{number}"
+            if lap is not None:
+                seconds = lap.lap_time.total_seconds() if lap.lap_time is not None else float("nan")
+                if seconds == seconds:
+                    text += f"  {self._format_seconds(seconds)}"
+                if lap.conditions is not None and lap.conditions.status:
+                    text += f"  {lap.conditions.status}"
+            canvas.create_text(
+                x, y + height + 2, text=text, anchor="nw", fill=self.fg_color, font=("Segoe UI", 8), tags=("thumb", tag)
+            )
+        rows = (len(thumbs) + THUMB_COLUMNS - 1) // THUMB_COLUMNS
+        self.thumb_height = 8 + rows * cell_h
+        canvas.config(scrollregion=(0, 0, 10 + THUMB_COLUMNS * cell_w, self.thumb_height))
+        self.thumb_status_var.set(
+            f"{key[1]}: {len(thumbs)} giri sulla stessa scala di velocità. Clicca una miniatura per aprire il giro."
+        )
+        shown = [item for item in self.current_telemetry if (item.get("session_key"), item["driver"]) == key]
+        if shown:
+            self._highlight_thumbnail(key, shown[0]["lap"])
+
+    def _highlight_thumbnail(self, key, lap_number: int):
+        if self.thumb_canvas is None or self.thumb_key != key:
+            return
+        canvas = self.thumb_canvas
+        canvas.delete("selection")
+        items = canvas.find_withtag(f"lap{lap_number}")
+        if not items:
+            return
+        x0, y0, x1, y1 = canvas.bbox(*items)
+        canvas.create_rectangle(x0 - 3, y0 - 3, x1 + 3, y1 + 3, outline=self.accent_color, tags=("selection",))
+        canvas.yview_moveto(max(y0 - 20, 0) / self.thumb_height)
+
+    def on_thumbnail_click(self, event):
+        if self.thumb_key is None:
+            return
+        canvas = self.thumb_canvas
+        x, y = canvas.canvasx(event.x), canvas.canvasy(event.y)
+        for item in canvas.find_overlapping(x, y, x, y):
+            for tag in canvas.gettags(item):
+                if tag.startswith("lap") and tag[3:].isdigit():
+                    session_key, driver = self.thumb_key
+                    self.plot_single_driver_lap(driver, int(tag[3:]), session_key)
+                    return
+
+    # ------------------------------------------------------------------
+    # PANORAMICA GARA
+    # ------------------------------------------------------------------
+    def open_race_overview(self):
+        if self._defer_until_ready(self.open_race_overview):
+            return
+        if self.service.session is None:
+            messagebox.showinfo("Info", "Carica prima una sessione.")
+            return
+        if self.race_window is not None:
+            self.race_window.lift()
+            self._draw_race_overview()
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        win = tk.Toplevel(self.root)
+        win.title("Panoramica gara")
+        win.geometry("1100x760")
+        win.configure(background=self.bg_color)
+        win.protocol("WM_DELETE_WINDOW", self._close_race_overview)
+        win.rowconfigure(0, weight=1)
+        win.columnconfigure(0, weight=1)
+        self.race_window = win
+
+        self.race_fig = Figure(figsize=(11, 7), dpi=100)
+        self.race_fig.patch.set_facecolor(self.bg_color)
+        self.ax_race_pos = self.race_fig.add_subplot(211)
+        self.ax_race_gap = self.race_fig.add_subplot(212, sharex=self.ax_race_pos)
+        self.race_canvas = FigureCanvasTkAgg(self.race_fig, master=win)
+        self.race_canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        self.race_canvas.mpl_connect("button_press_event", self.on_race_click)
+
+        controls = ttk.Frame(win, padding=(5, 2))
+        controls.grid(row=1, column=0, sticky="ew")
+        self.race_gap_var = tk.StringVar(value="leader")
+        for col, (value, text) in enumerate((("leader", "Distacco dal leader"), ("ahead", "Distacco da chi precede"))):
+            ttk.Radiobutton(
+                controls, text=text, value=value, variable=self.race_gap_var, command=self._draw_race_overview
+            ).grid(row=0, column=col, sticky="w", padx=(0, 10))
+
+        self.race_status_var = tk.StringVar()
+        ttk.Label(win, textvariable=self.race_status_var, anchor="w", padding=(5, 2)).grid(
+            row=2, column=0, sticky="ew"
+        )
+        self._draw_race_overview()
+
+    def _close_race_overview(self):
+        if self.race_window is not None:
+            self.race_window.destroy()
+        self.race_window = None
+        self.race_data = None
+
+    def _race_gaps(self):
+        if self.race_gap_var.get() == "ahead":
+            return self.race_data.gap_ahead
+        return self.race_data.gap_leader
+
+    @timed("race_overview_draw")
+    def _draw_race_overview(self):
+        if self.race_window is None:
+            return
+        import matplotlib
+        import numpy as np
+
+        from f1_race import RACE_SESSIONS
+
+        ax_pos, ax_gap = self.ax_race_pos, self.ax_race_gap
+        for ax in (ax_pos, ax_gap):
+            ax.clear()
+            ax.set_facecolor(self.panel_color)
+            ax.grid(True, color=self.grid_color, alpha=0.6)
+            ax.tick_params(colors=self.fg_color, labelcolor=self.fg_color)
+
+        try:
+            overview = self.service.race_overview()
+        except TelemetryError as e:
+            self.race_data = None
+            self.race_status_var.set(str(e))
+            self.race_canvas.draw_idle()
+            return
+        self.race_data = overview
+
+        # una linea per pilota e per asse: 20 × 70 punti restano leggeri da ridisegnare
+        cmap = matplotlib.colormaps["tab20"]
+        laps = overview.lap_numbers
+        gaps = self._race_gaps()
+        self.race_lines = []
+        for i, driver in enumerate(overview.drivers):
+            color = cmap(i % cmap.N)
+            (pos_line,) = ax_pos.plot(laps, overview.position[i], color=color, linewidth=1.2)
+            (gap_line,) = ax_gap.plot(laps, gaps[i], color=color, linewidth=1.0)
+            self.race_lines.append((pos_line, gap_line))
+            last = np.flatnonzero(~np.isnan(overview.position[i]))
+            if len(last):
+                ax_pos.text(laps[last[-1]] + 0.4, overview.position[i, last[-1]], driver,
+                            color=color, fontsize=7, va="center")
+
+        # soste ai box: un solo scatter per tutti i piloti
+        rows, cols = np.nonzero(overview.pit)
+        if len(rows):
+            ax_pos.scatter(
+                laps[cols], overview.position[rows, cols], s=14, marker="o",
+                facecolors="none", edgecolors=[cmap(r % cmap.N) for r in rows], linewidths=0.8, zorder=3,
+            )
+
+        self.race_marker = ax_pos.axvline(np.nan, color=self.fg_color, linewidth=0.8, alpha=0.6)
+        ax_pos.set_ylim(len(overview.drivers) + 0.5, 0.5)
+        ax_pos.set_yticks(range(1, len(overview.drivers) + 1))
+        ax_pos.tick_params(labelbottom=False, labelsize=7)
+        ax_pos.set_ylabel("Posizione", color=self.fg_color)
+        ax_gap.set_ylabel(
+            "Distacco da chi precede [s]" if self.race_gap_var.get() == "ahead" else "Distacco dal leader [s]",
+            color=self.fg_color,
+        )
+        ax_gap.set_xlabel("Giro", color=self.fg_color)
+        ax_gap.set_xlim(0.5, laps[-1] + 2)
+
+        key = self.service.session_key
+        self.race_fig.suptitle(f"{key[0]} {key[1]} - {key[2]}", fontsize=12, color=self.fg_color)
+        self.race_fig.tight_layout(rect=[0, 0, 1, 0.96])
+        self.race_canvas.draw_idle()
+        note = "" if key[2] in RACE_SESSIONS else " Attenzione: la sessione non è una gara."
+        self.race_status_var.set(
+            f"{len(overview.drivers)} piloti, {len(laps)} giri. Clicca una linea per vedere la telemetria di quel giro.{note}"
+        )
+
+    def on_race_click(self, event):
+        from f1_race import nearest_driver
+
+        overview = self.race_data
+        if overview is None or event.button != 1 or event.xdata is None:
+            return
+        if event.inaxes is self.ax_race_pos:
+            values = overview.position
+        elif event.inaxes is self.ax_race_gap:
+            values = self._race_gaps()
+        else:
+            return
+        lap = int(round(event.xdata))
+        if not 1 <= lap <= len(overview.lap_numbers):
+            return
+        idx = nearest_driver(values, lap, event.ydata)
+        if idx is None:
+            return
+
+        for i, lines in enumerate(self.race_lines):
+            for line in lines:
+                line.set_linewidth(2.6 if i == idx else 1.0)
+                line.set_alpha(1.0 if i == idx else 0.45)
+        self.race_marker.set_xdata([lap, lap])
+        self.race_canvas.draw_idle()
+
+        driver = overview.drivers[idx]
+        col = lap - 1
+        detail = f"{driver} giro {lap}: P{overview.position[idx, col]:.0f}, +{overview.gap_leader[idx, col]:.1f} s dal leader"
+        if overview.laps_down[idx, col] >= 1:
+            detail += f" ({overview.laps_down[idx, col]:.0f} giri di ritardo)"
+        if overview.pit[idx, col]:
+            detail += " - giro ai box"
+        self.race_status_var.set(detail)
+        self.plot_single_driver_lap(driver, lap)
+
+    # ------------------------------------------------------------------
+    # WORKSPACE
+    # ------------------------------------------------------------------
+    @timed("save_workspace")
+    def save_workspace(self):
+        if self._defer_until_ready(self.save_workspace):
+            return
+        import f1_workspace
+
+        path = filedialog.asksaveasfilename(
+            title="Salva workspace",
+            defaultextension=".npz",
+            filetypes=[("Workspace F1", "*.npz")],
+        )
+        if not path:
+            return
+
+        year, event, sess_name = self.service.session_key or (
+            self.year_var.get().strip(),
+            self.event_var.get().strip(),
+            self._session_identifier(),
+        )
+        state = {
+            "year": year,
+            "event": event,
+            "session": sess_name,
+            "selected_driver": self.selected_driver_abbrev,
+            "mode": "multi" if len(self.current_telemetry) > 1 else "single",
+            "slots": [
+                {
+                    "driver": slot["driver_var"].get(),
+                    "lap": slot["lap_var"].get(),
+                    "fastest": bool(slot["fastest_var"].get()),
+                    "session_ref": slot["session_ref_var"].get(),
+                }
+                for slot in self.compare_slots
+            ],
+            "filter": {
+                "grid": self.filter_grid_var.get(),
+                "step": self.filter_step_var.get(),
+                "kind": self.filter_kind_var.get(),
+                "window": self.filter_window_var.get(),
+                "order": self.filter_order_var.get(),
+            },
+            "base_xlim": list(self.base_xlim) if self.base_xlim is not None else None,
+            "xlim": list(self.ax_speed.get_xlim()) if self.current_telemetry else None,
+        }
+        traces = [
+            {
+                "driver": item["driver"],
+                "lap": item["lap"],
+                "color": item["color"],
+                "session_key": item.get("session_key"),
+                # traccia grezza: il filtro viene riapplicato all'apertura
+                "arrays": f1_workspace.compact_trace(
+                    self.service.telemetry_cache.get((item["session_key"], item["driver"], item["lap"]), item["telemetry"])
+                ),
+            }
+            for item in self.current_telemetry
+        ]
+
+        try:
+            f1_workspace.save_workspace(path, state, traces, self.circuit_layout)
+        except OSError as e:
+            messagebox.showerror("Errore", f"Impossibile salvare il workspace:\n{e}")
+            return
+        self.status_var.set(f"Workspace salvato: {path}")
+
+    @timed("export_aligned")
+    def export_aligned_telemetry(self):
+        if not self.current_telemetry:
+            messagebox.showinfo("Info", "Visualizza prima uno o più giri da esportare.")
+            return
+        from f1_export import ExportError, export_aligned, parquet_available
+
+        filetypes = [("CSV", "*.csv")]
+        if parquet_available():
+            filetypes.append(("Parquet", "*.parquet"))
+        path = filedialog.asksaveasfilename(
+            title="Esporta telemetria allineata",
+            defaultextension=".csv",
+            filetypes=filetypes,
+        )
+        if not path:
+            return
+
+        laps = []
+        used = set()
+        for item in self.current_telemetry:
+            name = f"{self._item_name(item).replace(' ', '_')}_L{item['lap']}"
+            while name in used:
+                name += "b"
+            used.add(name)
+            laps.append({"name": name, "telemetry": item["telemetry"]})
+
+        metadata = {
+            "session": list(self.service.session_key) if self.service.session_key else None,
+            "laps": [
+                {
+                    "column_prefix": lap["name"],
+                    "driver": item["driver"],
+                    "lap": int(item["lap"]),
+                    "session": list(item["session_key"]) if item.get("session_key") else None,
+                }
+                for lap, item in zip(laps, self.current_telemetry)
+            ],
+            "step_m": 1.0,
+        }
+        try:
+            rows = export_aligned(path, laps, step_m=1.0, metadata=metadata)
+        except (ExportError, OSError) as e:
+            messagebox.showerror("Errore", f"Impossibile esportare la telemetria:\n{e}")
+            return
+        self.status_var.set(f"Esportate {rows} righe ({len(laps)} giri, passo 1 m): {path}")
+
+    @timed("open_workspace")
+    def open_workspace(self):
+        if self._defer_until_ready(self.open_workspace):
+            return
+        import f1_workspace
+
+        path = filedialog.askopenfilename(
+            title="Apri workspace",
+            filetypes=[("Workspace F1", "*.npz")],
+        )
+        if not path:
+            return
+
+        try:
+            state, traces, circuit = f1_workspace.load_workspace(path)
+        except f1_workspace.WorkspaceError as e:
+            messagebox.showerror("Errore", str(e))
+            return
+
+        self.year_var.set(str(state.get("year", "")))
+        self.event_var.set(state.get("event", ""))
+        self.session_var.set(state.get("session", ""))
+        for slot, saved in zip(self.compare_slots, state.get("slots", [])):
+            slot["driver_var"].set(saved.get("driver", ""))
+            slot["lap_var"].set(saved.get("lap", ""))
+            slot["fastest_var"].set(saved.get("fastest", False))
+            slot["session_ref_var"].set(saved.get("session_ref", ""))
+
+        saved_filter = state.get("filter")
+        if saved_filter:
+            self.filter_grid_var.set(saved_filter.get("grid", "Grezza"))
+            self.filter_step_var.set(saved_filter.get("step", default_filter_step(self.filter_grid_var.get())))
+            self.filter_kind_var.set(saved_filter.get("kind", "Nessuno"))
+            self.filter_window_var.set(saved_filter.get("window", "11"))
+            self.filter_order_var.set(saved_filter.get("order", "3"))
+        try:
+            self.service.set_filter(self._read_filter_config())
+        except ValueError:
+            self.service.filter_config = None
+
+        key = (state.get("year"), state.get("event"), state.get("session"))
+        if key != self.service.session_key:
+            # Il workspace si riferisce a un'altra sessione: niente dati FastF1 in memoria
+            self.service.open_offline(key)
+            self.populate_drivers()
+            slot_drivers = sorted({saved.get("driver") for saved in state.get("slots", []) if saved.get("driver")})
+            for slot in self.compare_slots:
+                slot["driver_combo"].config(values=slot_drivers)
+
+        for trace in traces:
+            trace["session_key"] = trace["session_key"] or key
+            # sostituisce anche le tracce elaborate con la stessa chiave
+            self.service.put_telemetry(
+                (trace["session_key"], trace["driver"], trace["lap"]), f1_workspace.trace_frame(trace["arrays"])
+            )
+
+        if circuit is not None:
+            self._draw_circuit_layout(*circuit)
+
+        selections = [
+            {"driver": t["driver"], "lap": t["lap"], "color": t["color"], "session_key": t["session_key"]}
+            for t in traces
+        ]
+        if state.get("mode") == "multi" and len(selections) > 1:
+            self.plot_multi_driver_telemetry(selections)
+        elif selections:
+            sel = selections[0]
+            self.plot_single_driver_lap(sel["driver"], sel["lap"], sel["session_key"])
+
+        if selections:
+            if state.get("base_xlim"):
+                self.base_xlim = tuple(state["base_xlim"])
+            if state.get("xlim"):
+                for ax in [self.ax_speed, self.ax_throttle, self.ax_brake, self.ax_gear, self.ax_drs, self.ax_gap]:
+                    ax.set_xlim(*state["xlim"])
+                self.canvas.draw_idle()
+
+        self.status_var.set(f"Workspace aperto: {path}")
+
+    # ------------------------------------------------------------------
+    # DATABASE GIRI VELOCI
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _format_seconds(value):
+        if value is None:
+            return ""
+        minutes, seconds = divmod(value, 60)
+        return f"{int(minutes)}:{seconds:06.3f}" if minutes else f"{seconds:.3f}"
+
+    def open_lap_index(self):
+        if self._defer_until_ready(self.open_lap_index):
+            return
+        if self.index_window is not None:
+            self.index_window.lift()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("Database giri più veloci")
+        win.geometry("900x500")
+        win.configure(background=self.bg_color)
+        win.protocol("WM_DELETE_WINDOW", self._close_lap_index)
+        win.rowconfigure(1, weight=1)
+        win.columnconfigure(0, weight=1)
+        self.index_window = win
+
+        query_frame = ttk.Frame(win, padding=5)
+        query_frame.grid(row=0, column=0, sticky="ew")
+
+        ttk.Label(query_frame, text="Anno").grid(row=0, column=0, sticky="w")
+        self.index_year_var = tk.StringVar(value=self.year_var.get())
+        ttk.Entry(query_frame, textvariable=self.index_year_var, width=6).grid(row=0, column=1, padx=(3, 10))
+
+        ttk.Label(query_frame, text="Sessione").grid(row=0, column=2, sticky="w")
+        self.index_session_var = tk.StringVar(value="Q")
+        ttk.Entry(query_frame, textvariable=self.index_session_var, width=6).grid(row=0, column=3, padx=(3, 10))
+
+        ttk.Label(query_frame, text="Piloti (es. VER,LEC)").grid(row=0, column=4, sticky="w")
+        self.index_drivers_var = tk.StringVar()
+        ttk.Entry(query_frame, textvariable=self.index_drivers_var, width=16).grid(row=0, column=5, padx=(3, 10))
+
+        ttk.Button(query_frame, text="Cerca", command=self.run_lap_index_query).grid(row=0, column=6)
+        ttk.Button(query_frame, text="Indicizza cache", command=self.populate_lap_index).grid(row=0, column=7, padx=(5, 0))
+        ttk.Button(query_frame, text="Report per evento", command=self.generate_event_report).grid(
+            row=0, column=8, padx=(5, 0)
+        )
+
+        columns = ("event", "session", "driver", "lap", "time", "s1", "s2", "s3", "compound", "trap", "stored")
+        headings = ("Evento", "Sess.", "Pilota", "Giro", "Tempo", "S1", "S2", "S3", "Mescola", "Speed trap", "Traccia")
+        self.index_tree = ttk.Treeview(win, columns=columns, show="headings")
+        for col, heading in zip(columns, headings):
+            self.index_tree.heading(col, text=heading)
+            self.index_tree.column(col, width=180 if col == "event" else 70, anchor="w")
+        self.index_tree.grid(row=1, column=0, sticky="nsew")
+        self.index_tree.bind("<Double-1>", self.on_lap_index_activate)
+
+        self.index_status_var = tk.StringVar(value="Doppio clic su una riga per confrontare i piloti in quell'evento.")
+        ttk.Label(win, textvariable=self.index_status_var, anchor="w", padding=(5, 2)).grid(row=2, column=0, sticky="ew")
+
+        self.index_rows = {}
+
+    def _close_lap_index(self):
+        if self.index_window is not None:
+            self.index_window.destroy()
+        self.index_window = None
+
+    def _index_query_params(self):
+        year_str = self.index_year_var.get().strip()
+        year = int(year_str) if year_str else None
+        session_name = self.index_session_var.get().strip() or None
+        drivers = [d.strip().upper() for d in self.index_drivers_var.get().split(",") if d.strip()]
+        return year, session_name, drivers
+
+    @timed("lap_index.query")
+    def run_lap_index_query(self):
+        try:
+            year, session_name, drivers = self._index_query_params()
+        except ValueError:
+            messagebox.showerror("Errore", "L'anno deve essere un numero intero.", parent=self.index_window)
+            return
+
+        try:
+            rows = self.lap_index.query(drivers=drivers, year=year, session_name=session_name)
+        except sqlite3.Error as e:
+            messagebox.showerror("Errore", f"Query non riuscita:\n{e}", parent=self.index_window)
+            return
+
+        self.index_tree.delete(*self.index_tree.get_children())
+        self.index_rows = {}
+        for row in rows:
+            item = self.index_tree.insert(
+                "",
+                tk.END,
+                values=(
+                    row["event"],
+                    row["session"],
+                    row["driver"],
+                    row["lap_number"],
+                    self._format_seconds(row["lap_time_s"]),
+                    self._format_seconds(row["sector1_s"]),
+                    self._format_seconds(row["sector2_s"]),
+                    self._format_seconds(row["sector3_s"]),
+                    row["compound"] or "",
+                    f"{row['speed_st']:.0f}" if row["speed_st"] is not None else "",
+                    "sì" if row["telemetry_ref"] else "",
+                ),
+            )
+            self.index_rows[item] = row
+        self.index_status_var.set(f"{len(rows)} giri trovati.")
+
+    def populate_lap_index(self):
+        try:
+            year, session_name, _ = self._index_query_params()
+        except ValueError:
+            year = None
+        if year is None:
+            messagebox.showwarning("Input mancante", "Inserisci l'anno da indicizzare.", parent=self.index_window)
+            return
+
+        session_names = (session_name,) if session_name else ("Q", "R")
+        self.index_status_var.set(f"Indicizzazione {year} dalla cache in corso...")
+
+        from f1_lapindex import LapIndex
+
+        def worker():
+            try:
+                # Connessione dedicata: sqlite3 non va condiviso tra thread in scrittura
+                index = LapIndex(self.lap_index_path)
+                try:
+                    total = index.populate_from_cache([year], CACHE_DIR, session_names, trace_store=self.trace_store)
+                finally:
+                    index.close()
+            except Exception as e:
+                self._post_to_ui(lambda error=e: self._lap_index_failed(error))
+                return
+            self._post_to_ui(lambda: self.index_status_var.set(f"Indicizzati {total} giri per il {year}."))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _lap_index_failed(self, error):
+        self.index_status_var.set("Indicizzazione non riuscita.")
+        messagebox.showerror("Errore", f"Indicizzazione non riuscita:\n{error}", parent=self.index_window)
+
+    def on_lap_index_activate(self, event=None):
+        selection = self.index_tree.selection()
+        if not selection:
+            return
+        clicked = self.index_rows.get(selection[0])
+        if clicked is None:
+            return
+
+        _, _, drivers = self._index_query_params()
+        if not drivers:
+            drivers = [clicked["driver"]]
+        rows = []
+        for drv in drivers[: len(self.compare_slots)]:
+            row = self.lap_index.fastest_lap(clicked["year"], clicked["event"], clicked["session"], drv)
+            if row is not None:
+                rows.append(row)
+        if not rows:
+            return
+
+        self._compare_indexed_laps(rows)
+
+    @timed("compare_indexed_laps")
+    def _compare_indexed_laps(self, rows):
+        from f1_workspace import trace_frame
+
+        first = rows[0]
+        key = (first["year"], first["event"], first["session"])
+
+        self.year_var.set(str(first["year"]))
+        self.event_var.set(first["event"])
+        self.session_var.set(first["session"])
+        for slot in self.compare_slots:
+            slot["driver_var"].set("")
+            slot["lap_var"].set("")
+            slot["fastest_var"].set(False)
+            slot["session_ref_var"].set("")
+        for slot, row in zip(self.compare_slots, rows):
+            slot["driver_var"].set(row["driver"])
+            slot["lap_var"].set(str(row["lap_number"]))
+
+        stored = [self.trace_store.load(row["telemetry_ref"]) if row["telemetry_ref"] else None for row in rows]
+        if key != self.service.session_key and all(arrays is not None for arrays in stored):
+            # Tutte le tracce sono già elaborate su disco: nessun caricamento FastF1
+            self.service.open_offline(key)
+            self.populate_drivers()
+            for slot in self.compare_slots:
+                slot["driver_combo"].config(values=[row["driver"] for row in rows])
+            for row, arrays in zip(rows, stored):
+                self.service.put_telemetry((key, row["driver"], int(row["lap_number"])), trace_frame(arrays))
+        elif key != self.service.session_key:
+            self.load_session()
+            if self.service.session_key != key:
+                return
+
+        selections = [
+            {"driver": row["driver"], "lap": int(row["lap_number"]), "color": slot["color"], "session_key": key}
+            for slot, row in zip(self.compare_slots, rows)
+        ]
+        if len(selections) > 1:
+            self.plot_multi_driver_telemetry(selections)
+        else:
+            self.plot_single_driver_lap(selections[0]["driver"], selections[0]["lap"])
+
+    # ------------------------------------------------------------------
+    # REPORT
+    # ------------------------------------------------------------------
+    def generate_report(self):
+        if not self.current_telemetry:
+            messagebox.showinfo("Info", "Visualizza prima uno o più giri da mettere nel report.")
+            return
+        from itertools import combinations
+        from f1_workspace import compact_trace
+
+        traces = [
+            {
+                "name": self._item_name(item),
+                "lap": item["lap"],
+                "color": item["color"],
+                "arrays": compact_trace(item["telemetry"]),
+            }
+            for item in self.current_telemetry
+        ]
+        circuit = self.circuit_layout[:2] if self.circuit_layout is not None else None
+        year, event, sess_name = self.service.session_key or ("", "", "")
+        header = f"{event} {year} {sess_name}".strip()
+
+        # Una pagina per il confronto completo e una per ogni coppia di piloti
+        groups = [traces] if len(traces) != 2 else []
+        groups += [list(pair) for pair in combinations(traces, 2)]
+        pages = [
+            {
+                "title": f"{header} – " + " vs ".join(f"{t['name']} giro {t['lap']}" for t in group),
+                "traces": group,
+                "circuit": circuit,
+            }
+            for group in groups
+        ]
+        self._start_report(pages)
+
+    def generate_event_report(self):
+        try:
+            year, session_name, drivers = self._index_query_params()
+        except ValueError:
+            messagebox.showerror("Errore", "L'anno deve essere un numero intero.", parent=self.index_window)
+            return
+        if year is None or not session_name or len(drivers) < 2:
+            messagebox.showinfo(
+                "Info", "Indica anno, sessione e almeno due piloti (es. VER,LEC).", parent=self.index_window
+            )
+            return
+
+        try:
+            events = self.lap_index.head_to_head(year, session_name, drivers)
+        except sqlite3.Error as e:
+            messagebox.showerror("Errore", f"Query non riuscita:\n{e}", parent=self.index_window)
+            return
+
+        # Solo tracce già elaborate su disco: nessun caricamento FastF1
+        pages = []
+        skipped = 0
+        for event, rows in events:
+            stored = [self.trace_store.load(row["telemetry_ref"]) if row["telemetry_ref"] else None for row in rows]
+            if any(arrays is None for arrays in stored):
+                skipped += 1
+                continue
+            traces = [
+                {"name": row["driver"], "lap": int(row["lap_number"]), "color": color, "arrays": arrays}
+                for row, arrays, color in zip(rows, stored, self.slot_colors * 2)
+            ]
+            first = stored[0]
+            circuit = (first["X"], first["Y"]) if "X" in first and "Y" in first else None
+            title = f"{event} {year} {session_name} – giro più veloce " + " vs ".join(drivers)
+            pages.append({"title": title, "traces": traces, "circuit": circuit})
+
+        if not pages:
+            messagebox.showinfo(
+                "Info",
+                "Nessun evento con tutte le tracce salvate: apri prima i confronti dal database.",
+                parent=self.index_window,
+            )
+            return
+        if skipped:
+            self.index_status_var.set(f"{skipped} eventi esclusi dal report (tracce non ancora elaborate).")
+        self._start_report(pages)
+
+    def _start_report(self, pages):
+        if self.report_thread is not None and self.report_thread.is_alive():
+            messagebox.showinfo("Info", "Un report è già in generazione.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Salva report",
+            defaultextension=".pdf",
+            filetypes=[("PDF multipagina", "*.pdf"), ("Immagini PNG (una per pagina)", "*.png")],
+        )
+        if not path:
+            return
+
+        def progress(done, total):
+            self._post_to_ui(lambda: self.status_var.set(f"Report: {done}/{total} pagine renderizzate..."))
+
+        def worker():
+            from f1_report import render_report
+
+            try:
+                with span("render_report", pages=len(pages)):
+                    written = render_report(path, pages, progress=progress)
+            except Exception as e:
+                error = e
+                self._post_to_ui(lambda: messagebox.showerror("Errore", f"Report non generato:\n{error}"))
+                return
+            self._post_to_ui(lambda: self.status_var.set(f"Report salvato ({len(pages)} pagine): {written[0]}"))
+
+        self.status_var.set(f"Generazione report in background ({len(pages)} pagine)...")
+        self.report_thread = threading.Thread(target=worker, daemon=True)
+        self.report_thread.start()
+
+    # ------------------------------------------------------------------
+    # SERVER LOCALE
+    # ------------------------------------------------------------------
+    def toggle_server(self):
+        if self._defer_until_ready(self.toggle_server):
+            return
+        from f1_server import DEFAULT_PORT, HOST, TelemetryProvider, TelemetryServer
+
+        if self.telemetry_server is not None:
+            self.stop_server()
+            self.status_var.set("Server locale fermato.")
+            return
+
+        # Stesso servizio della GUI: pool di sessioni e cache condivisi
+        provider = TelemetryProvider(self.service)
+        server = TelemetryServer(provider, port=DEFAULT_PORT)
+        try:
+            server.start_in_thread()
+        except OSError as e:
+            messagebox.showerror("Errore", f"Impossibile avviare il server sulla porta {DEFAULT_PORT}:\n{e}")
+            return
+        self.telemetry_server = server
+        self.server_btn_var.set(f"Ferma server locale ({HOST}:{DEFAULT_PORT})")
+        self.status_var.set(f"Server locale attivo su http://{HOST}:{DEFAULT_PORT} (endpoint /laps, /telemetry, /aligned, /gaps).")
+
+    def stop_server(self):
+        if self.telemetry_server is None:
+            return
+        self.telemetry_server.stop()
+        self.telemetry_server = None
+        self.server_btn_var.set("Avvia server locale")
+
+    # ------------------------------------------------------------------
+    # PRESTAZIONI
+    # ------------------------------------------------------------------
+    def toggle_perf_panel(self):
+        if self.perf_window is not None:
+            self.perf_window.destroy()
+            self.perf_window = None
+            self.perf_text = None
+            return
+
+        self.perf_window = tk.Toplevel(self.root)
+        self.perf_window.title("Prestazioni - ultime azioni")
+        self.perf_window.geometry("520x640")
+        self.perf_window.configure(background=self.bg_color)
+        self.perf_window.protocol("WM_DELETE_WINDOW", self.toggle_perf_panel)
+        self.perf_window.rowconfigure(0, weight=1)
+        self.perf_window.columnconfigure(0, weight=1)
+
+        self.perf_text = tk.Text(
+            self.perf_window,
+            background=self.panel_color,
+            foreground=self.fg_color,
+            font=("Consolas", 9),
+            wrap="none",
+        )
+        self.perf_text.grid(row=0, column=0, columnspan=2, sticky="nsew")
+
+        ttk.Button(self.perf_window, text="Esporta trace JSON", command=self.export_perf_trace).grid(
+            row=1, column=0, sticky="ew"
+        )
+        ttk.Button(self.perf_window, text="Azzera", command=profiler.reset).grid(row=1, column=1, sticky="ew")
+
+        self.perf_version = -1
+        self._refresh_perf_panel()
+
+    def _refresh_perf_panel(self):
+        if self.perf_window is None or self.perf_text is None:
+            return
+        # Aggiorna solo se sono state registrate nuove azioni
+        if profiler.version != self.perf_version:
+            self.perf_version = profiler.version
+            self.perf_text.delete("1.0", tk.END)
+            self.perf_text.insert(tk.END, profiler.format_recent(15))
+        self.root.after(500, self._refresh_perf_panel)
+
+    def export_perf_trace(self):
+        path = filedialog.asksaveasfilename(
+            title="Esporta trace prestazioni",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")],
+        )
+        if not path:
+            return
+        try:
+            n_events = profiler.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("Errore", f"Impossibile esportare il trace:\n{e}")
+            return
+        self.status_var.set(f"Trace esportato ({n_events} eventi): {path}")
+
+
 def main():
     root = tk.Tk()
     app = F1TelemetryApp(root)
     root.mainloop()
+    app.stop_server()
+
+    # Esportazione automatica del trace a fine sessione di analisi
+    trace_path = os.environ.get("F1_TELEMETRY_TRACE")
+    if trace_path:
+        profiler.export_chrome_trace(trace_path)
 
 
 if __name__ == "__main__":
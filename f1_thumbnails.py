@@ -0,0 +1,91 @@
+"""Miniature (sparkline) della velocità di tutti i giri di un pilota.
+
+Un solo passaggio sui car data del pilota: distanza integrata su tutto il
+flusso, un unico ``np.interp`` su una griglia di distanza comune a tutti i
+giri e rasterizzazione vettoriale delle sparkline in un array immagine
+(giri × altezza × larghezza). Ogni miniatura diventa un PPM che Tk carica
+con una sola ``PhotoImage``.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+GRID_POINTS = 240
+THUMB_SIZE = (160, 36)   # larghezza, altezza in pixel
+BACKGROUND = "#1e1e1e"
+
+
+class LapProfiles(NamedTuple):
+    lap_numbers: np.ndarray
+    distance: np.ndarray     # griglia comune [m]
+    speed: np.ndarray        # giri × punti [km/h], NaN oltre la fine del giro
+
+
+def lap_speed_profiles(car_data, lap_numbers, lap_starts, lap_ends, points: int = GRID_POINTS) -> LapProfiles:
+    """Velocità di ogni giro sulla stessa griglia di distanza.
+
+    ``car_data`` è il flusso di un pilota (SessionTime, Speed); inizio e fine
+    dei giri sono in secondi di sessione.
+    """
+    t = car_data["SessionTime"].dt.total_seconds().to_numpy(dtype=float, na_value=np.nan)
+    v = car_data["Speed"].to_numpy(dtype=float, na_value=np.nan)
+    ok = ~(np.isnan(t) | np.isnan(v))
+    order = np.argsort(t[ok], kind="stable")
+    t, v = t[ok][order], v[ok][order]
+    if len(t) < 2:
+        raise ValueError("Car data insufficienti per le miniature")
+
+    # distanza cumulata (trapezi): non decrescente, quindi interpolabile per tutti i giri insieme
+    s = np.r_[0.0, np.cumsum((v[1:] + v[:-1]) / 2 / 3.6 * np.diff(t))]
+    starts = np.asarray(lap_starts, dtype=float)
+    ends = np.asarray(lap_ends, dtype=float)
+    s_start = np.interp(starts, t, s, left=np.nan, right=np.nan)
+    lengths = np.interp(ends, t, s, left=np.nan, right=np.nan) - s_start
+    valid = lengths > 0
+    if not valid.any():
+        raise ValueError("Nessun giro con inizio e fine validi")
+
+    grid = np.linspace(0.0, float(np.median(lengths[valid])), points)
+    speed = np.interp(s_start[:, None] + grid[None, :], s, v)
+    speed[~valid] = np.nan
+    speed[grid[None, :] > lengths[:, None]] = np.nan
+    return LapProfiles(np.asarray(lap_numbers, dtype=int), grid, speed)
+
+
+def _rgb(color: str):
+    color = color.lstrip("#")
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+
+
+def render_sparklines(speed, colors, size=THUMB_SIZE, background: str = BACKGROUND) -> list:
+    """PPM (bytes) di una sparkline per riga di ``speed``, tutte sulla stessa scala."""
+    width, height = size
+    n = len(speed)
+    # una colonna di pixel per punto: interpolazione lineare della griglia sulla larghezza
+    pos = np.linspace(0, speed.shape[1] - 1, width)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, speed.shape[1] - 1)
+    frac = pos - lo
+    values = speed[:, lo] * (1 - frac) + speed[:, hi] * frac
+
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        vmin, vmax = 0.0, 1.0
+    else:
+        vmin, vmax = float(finite.min()), float(finite.max())
+    span = max(vmax - vmin, 1e-9)
+    y = (height - 2) - (values - vmin) / span * (height - 3)
+
+    # ogni colonna riempie i pixel fra il proprio valore e quello della successiva
+    y_next = np.concatenate([y[:, 1:], y[:, -1:]], axis=1)
+    top = np.floor(np.fmin(y, y_next))
+    bottom = np.ceil(np.fmax(y, y_next))
+    rows = np.arange(height)[None, :, None]
+    mask = (rows >= top[:, None, :]) & (rows <= bottom[:, None, :])
+
+    line = np.array([_rgb(c) for c in colors], dtype=np.uint8)[:, None, None, :]
+    images = np.where(mask[..., None], line, np.array(_rgb(background), dtype=np.uint8))
+    header = f"P6 {width} {height} 255\n".encode("ascii")
+    return [header + images[i].tobytes() for i in range(n)]
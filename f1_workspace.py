@@ -0,0 +1,127 @@
+"""Salvataggio e riapertura di workspace di analisi in un unico file .npz compresso.
+
+Il file contiene l'identità della sessione, gli slot di confronto, i limiti di
+zoom e le tracce compatte già calcolate, così il workspace si riapre senza
+caricare la sessione FastF1.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from f1_align import telemetry_time_seconds
+
+
+WORKSPACE_VERSION = 1
+
+# canali conservati nelle tracce compatte e relativo dtype
+TRACE_CHANNELS = {
+    "Distance": np.float32,
+    "Speed": np.float32,
+    "Throttle": np.float32,
+    "Brake": np.bool_,
+    "nGear": np.int8,
+    "DRS": np.int8,
+    "RPM": np.float32,
+    "X": np.float32,
+    "Y": np.float32,
+}
+
+
+class WorkspaceError(Exception):
+    pass
+
+
+def compact_trace(tel) -> dict:
+    arrays = {}
+    for col, dtype in TRACE_CHANNELS.items():
+        if col not in tel.columns:
+            continue
+        values = pd.to_numeric(tel[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        if dtype in (np.int8, np.bool_):
+            values = np.nan_to_num(values)
+        arrays[col] = values.astype(dtype)
+
+    time_seconds = telemetry_time_seconds(tel)
+    if time_seconds is not None:
+        arrays["Time"] = time_seconds.astype(np.float64)
+    return arrays
+
+
+def trace_frame(arrays: dict) -> pd.DataFrame:
+    data = {}
+    for col, values in arrays.items():
+        if col == "Time":
+            data[col] = pd.to_timedelta(values, unit="s")
+        elif values.dtype == np.float32:
+            data[col] = values.astype(np.float64)
+        else:
+            data[col] = values
+    return pd.DataFrame(data)
+
+
+def save_workspace(path, state: dict, traces: list, circuit=None):
+    """``traces``: lista di dict con "driver", "lap", "color", "arrays" e
+    opzionalmente "session_key" (anno, evento, sessione) per i confronti tra sessioni."""
+    arrays = {}
+    trace_meta = []
+    for i, trace in enumerate(traces):
+        channels = sorted(trace["arrays"])
+        for ch in channels:
+            arrays[f"trace{i}__{ch}"] = trace["arrays"][ch]
+        trace_meta.append(
+            {
+                "driver": trace["driver"],
+                "lap": int(trace["lap"]),
+                "color": trace["color"],
+                "session": list(trace["session_key"]) if trace.get("session_key") else None,
+                "channels": channels,
+            }
+        )
+
+    circuit_meta = None
+    if circuit is not None:
+        x, y, title = circuit
+        arrays["circuit__x"] = np.asarray(x, dtype=np.float32)
+        arrays["circuit__y"] = np.asarray(y, dtype=np.float32)
+        circuit_meta = {"title": title}
+
+    meta = {
+        "version": WORKSPACE_VERSION,
+        "state": state,
+        "traces": trace_meta,
+        "circuit": circuit_meta,
+    }
+    # meta come stringa JSON 0-d: niente pickle in lettura
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_workspace(path):
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != WORKSPACE_VERSION:
+                raise WorkspaceError(f"Versione workspace non supportata: {meta.get('version')}")
+
+            traces = []
+            for i, trace in enumerate(meta["traces"]):
+                arrays = {ch: data[f"trace{i}__{ch}"] for ch in trace["channels"]}
+                session_key = trace.get("session")
+                traces.append(
+                    {
+                        "driver": trace["driver"],
+                        "lap": trace["lap"],
+                        "color": trace["color"],
+                        "session_key": tuple(session_key) if session_key else None,
+                        "arrays": arrays,
+                    }
+                )
+
+            circuit = None
+            if meta.get("circuit") is not None:
+                circuit = (data["circuit__x"], data["circuit__y"], meta["circuit"].get("title"))
+    except (KeyError, ValueError, OSError) as e:
+        raise WorkspaceError(f"File workspace non valido: {e}") from e
+
+    return meta["state"], traces, circuit